@@ -53,6 +53,21 @@ def _create_app(for_testing: bool = False) -> Flask:
 
     init_with_app(_app)
 
+    from app.services import cache, ingestion, hashids_codec, qr, expiry
+
+    from app.services.request import sso
+
+    hashids_codec.init_with_app(_app)
+    sso.init_with_app(_app)
+    cache.init_with_app(_app)
+    qr.init_with_app(_app)
+    ingestion.init_with_app(_app)
+    expiry.init_with_app(_app)
+
+    from app import commands
+
+    commands.init_with_app(_app)
+
     from app.views.utils import bp_utils
     from app.views.urls import bp_urls
     from app.views.pastes import bp_pastes
@@ -0,0 +1,351 @@
+"""
+    Async (ASGI) serving mode: hot read methods are served with async database driver.
+    Other methods are served by the sync app in threads.
+
+    Usage: uvicorn app.asgi:app --workers 4
+
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+import sys
+from dataclasses import replace
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Iterable
+
+from flask import Flask, Response, redirect
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from werkzeug.exceptions import HTTPException
+
+from app.database import crud, db
+from app.database.async_core import (
+    create_async_database_engine,
+    create_async_sessionmaker,
+)
+from app.database.transaction import commit_async, on_commit_async
+from app.serializers.paste import serialize_paste
+from app.serializers.url import serialize_url
+from app.services.api.errors import ApiErrorCode, ApiErrorException
+from app.services.api.response import api_success
+from app.services.ingestion import OVERFLOW_POLICY_BLOCK, get_views_ingestion_buffer
+from app.services.request.auth import is_authorized, try_query_auth_data_from_request
+from app.services.stats import ViewRecord, get_stats, is_accessed_to_stats
+from app.services.url_mixin import validate_short_url
+
+AsyncView = Callable[..., Awaitable[Any]]
+
+
+async def open_short_url(session: AsyncSession, url_hash: str) -> Response:
+    """
+    Async version of `urls.open_short_url` view.
+    """
+    short_url = validate_short_url(
+        await crud.redirect_url.get_snapshot_by_hash_async(session, url_hash)
+    )
+    await _add_views(session, [ViewRecord(stats=get_stats(), url_id=short_url.id)])
+    return redirect(short_url.redirect)
+
+
+async def get_info_about_url(session: AsyncSession, url_hash: str):
+    """
+    Async version of `urls.get_info_about_url` view.
+    """
+    short_url = validate_short_url(
+        await crud.redirect_url.get_snapshot_by_hash_async(session, url_hash)
+    )
+    auth_data = await _try_query_auth_data()
+    include_stats = is_accessed_to_stats(
+        url=short_url, owner_id=auth_data.user_id if auth_data else None
+    )
+    return api_success(serialize_url(short_url, include_stats=include_stats))
+
+
+async def get_paste_info(session: AsyncSession, url_hash: str):
+    """
+    Async version of `pastes.get_paste_info` view.
+    """
+    auth_data = await _try_query_auth_data()
+    short_url = validate_short_url(
+        await crud.paste_url.get_snapshot_by_hash_async(session, url_hash)
+    )
+    include_stats = is_accessed_to_stats(
+        url=short_url, owner_id=auth_data.user_id if auth_data else None
+    )
+
+    if short_url.burn_after_read:
+        # Paste may be read concurrently, only one reader gets it.
+        if not await crud.paste_url.burn_async(session, [short_url.id]):
+            raise ApiErrorException(
+                ApiErrorCode.API_ITEM_NOT_FOUND, "Url hash is invalid/not specified"
+            )
+        short_url = replace(short_url, is_deleted=True)
+    await _add_views(session, [ViewRecord(stats=get_stats(), paste_id=short_url.id)])
+
+    return api_success(serialize_paste(short_url, include_stats=include_stats))
+
+
+# Endpoints of sync app that are served by async views.
+ASYNC_VIEWS: dict[str, AsyncView] = {
+    "urls.open_short_url": open_short_url,
+    "urls.get_info_about_url": get_info_about_url,
+    "pastes.get_paste_info": get_paste_info,
+}
+
+
+async def _try_query_auth_data():
+    """
+    Returns auth data of request or None.
+    Token is checked in thread, as SSO server and users table are queried synchronously.
+    """
+    if not is_authorized():
+        return None
+    _, auth_data = await asyncio.to_thread(try_query_auth_data_from_request, db=db)
+    return auth_data
+
+
+async def _add_views(session: AsyncSession, records: list[ViewRecord]) -> None:
+    """
+    Puts views to the ingestion buffer (never blocks event loop), or writes them
+    in thread if ingestion is disabled (or may block when buffer is full).
+    Views are written after async session is committed (with sync session),
+    so they do not wait for locks of request (e.g. burned paste).
+    """
+    buffer = get_views_ingestion_buffer()
+    if buffer is None:
+        on_commit_async(
+            session, lambda: crud.url_view.create_many(db=db, records=records)
+        )
+    elif buffer.overflow_policy == OVERFLOW_POLICY_BLOCK:
+        await asyncio.to_thread(lambda: [buffer.put(record) for record in records])
+    else:
+        for record in records:
+            buffer.put(record)
+
+
+class AsgiApp:
+    """
+    ASGI application. Requests are routed by url map of sync (Flask) app:
+    views from `ASYNC_VIEWS` are awaited in event loop with the same request
+    context (config, caches, serializers and error handling are shared),
+    other views are called in threads by WSGI interface of the sync app.
+    """
+
+    def __init__(self, flask_app: Flask) -> None:
+        """
+        :param Flask flask_app: sync app
+        """
+        self.flask_app = flask_app
+        self.engine: AsyncEngine | None = None
+        self.sessionmaker = None
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        environ = _get_environ(scope, await _read_body(receive))
+        view, view_args = self._match(environ)
+        if view is None:
+            await self._call_sync_app(environ, send)
+            return
+
+        if self.engine is None:
+            self.startup()
+        response = await self._dispatch(environ, view, view_args)
+        await _send_response(
+            send, response.status_code, response.headers, [response.get_data()]
+        )
+
+    def startup(self) -> None:
+        """
+        Creates async database engine (in every worker process).
+        """
+        self.engine = create_async_database_engine(self.flask_app)
+        self.flask_app.extensions["async_database_engine"] = self.engine
+        self.sessionmaker = create_async_sessionmaker(self.engine)
+
+    async def shutdown(self) -> None:
+        """
+        Closes database connections.
+        """
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+            self.flask_app.extensions.pop("async_database_engine", None)
+
+    def _match(self, environ: dict) -> tuple[AsyncView | None, dict[str, Any]]:
+        """
+        Returns async view for request (None if there is no one) and its arguments.
+        """
+        adapter = self.flask_app.url_map.bind_to_environ(environ)
+        try:
+            endpoint, view_args = adapter.match()
+        except HTTPException:
+            # Redirects and errors are returned by sync app.
+            return None, {}
+        return ASYNC_VIEWS.get(endpoint), view_args
+
+    async def _dispatch(
+        self, environ: dict, view: AsyncView, view_args: dict[str, Any]
+    ) -> Response:
+        """
+        Awaits async view in request context of sync app, request is processed
+        the same way as by sync app (`before_request`, error handlers, `after_request`).
+        Async session is committed once, after view. Response is finalized in thread,
+        as `after_request` commits sync session (e.g. user created by auth).
+        """
+        flask_app = self.flask_app
+        with flask_app.request_context(environ):
+            try:
+                try:
+                    response = flask_app.preprocess_request()
+                    if response is None:
+                        async with self.sessionmaker() as session:
+                            response = await view(session, **view_args)
+                            await commit_async(session)
+                except Exception as e:  # pylint: disable=broad-except
+                    response = flask_app.handle_user_exception(e)
+                return await asyncio.to_thread(flask_app.finalize_request, response)
+            except Exception as e:  # pylint: disable=broad-except
+                return flask_app.handle_exception(e)
+
+    async def _call_sync_app(self, environ: dict, send: Callable) -> None:
+        """
+        Calls sync app in thread. Response body is iterated in the same thread,
+        so streamed responses are not buffered.
+        """
+        loop = asyncio.get_running_loop()
+
+        def send_from_thread(message: dict) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def call() -> None:
+            started: dict[str, Any] = {}
+
+            def start_response(status: str, headers: list, _exc_info=None) -> None:
+                started["status"] = int(status.split(" ", 1)[0])
+                started["headers"] = headers
+
+            body = self.flask_app(environ, start_response)
+            try:
+                send_from_thread(
+                    _get_response_start(started["status"], started["headers"])
+                )
+                for chunk in body:
+                    if chunk:
+                        send_from_thread(_get_response_body(chunk, more_body=True))
+            finally:
+                if hasattr(body, "close"):
+                    body.close()
+            send_from_thread(_get_response_body(b"", more_body=False))
+
+        await asyncio.to_thread(call)
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def _read_body(receive: Callable) -> bytes:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+def _get_environ(scope: dict, body: bytes) -> dict[str, Any]:
+    """
+    Returns WSGI environ for ASGI HTTP request.
+    """
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    client_host, client_port = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client_host,
+        "REMOTE_PORT": str(client_port),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _send_response(
+    send: Callable, status: int, headers: Iterable, body: Iterable[bytes]
+) -> None:
+    await send(_get_response_start(status, headers))
+    for chunk in body:
+        await send(_get_response_body(chunk, more_body=True))
+    await send(_get_response_body(b"", more_body=False))
+
+
+def _get_response_start(status: int, headers: Iterable) -> dict[str, Any]:
+    return {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ],
+    }
+
+
+def _get_response_body(chunk: bytes, more_body: bool) -> dict[str, Any]:
+    return {"type": "http.response.body", "body": chunk, "more_body": more_body}
+
+
+def create_asgi_app(flask_app: Flask | None = None) -> AsgiApp:
+    """
+    Creates ASGI app.
+    :param Flask|None flask_app: sync app (created by default)
+    :rtype: AsgiApp
+    """
+    if flask_app is None:
+        from app.app import app as flask_app  # pylint: disable=import-outside-toplevel
+
+    return AsgiApp(flask_app)
+
+
+app: AsgiApp = create_asgi_app()
@@ -0,0 +1,32 @@
+"""
+    CLI commands of the app (`flask <group> <command>`).
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from flask import Flask
+
+from app.commands.urls import urls_cli
+from app.commands.views import views_cli
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Registers CLI commands of the app.
+    """
+    app.cli.add_command(urls_cli)
+    app.cli.add_command(views_cli)
+
+
+__all__ = ["init_with_app"]
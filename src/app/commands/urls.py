@@ -0,0 +1,58 @@
+"""
+    CLI commands for short urls and pastes maintenance.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import click
+from flask.cli import AppGroup
+
+from app.services.expiry import get_expiry_sweeper
+
+urls_cli = AppGroup("urls", help="Short urls and pastes maintenance.")
+
+
+@urls_cli.command("sweep")
+@click.option(
+    "--batch-size",
+    type=int,
+    default=None,
+    help="Count of urls (pastes) marked by one transaction "
+    "(EXPIRY_SWEEPER_BATCH_SIZE by default).",
+)
+@click.option(
+    "--max-batches",
+    type=int,
+    default=None,
+    help="Max count of batches for urls and pastes each "
+    "(EXPIRY_SWEEPER_MAX_BATCHES by default, 0 is unlimited).",
+)
+def sweep(batch_size: int | None, max_batches: int | None) -> None:
+    """
+    Marks expired urls and pastes as swept and evicts them from url cache.
+    Urls are marked in short transactions (batches), rows locked by other
+    transactions are skipped, so it may be run at any time (e.g. from cron).
+    """
+    sweeper = get_expiry_sweeper()
+    if batch_size is not None:
+        sweeper.batch_size = batch_size
+    if max_batches is not None:
+        sweeper.max_batches = max_batches or None
+
+    stats = sweeper.sweep()
+    click.echo(
+        f"Swept {stats['urls']} urls and {stats['pastes']} pastes "
+        f"in {stats['batches']} batches, {stats['duration']:.2f}s "
+        f"({stats['rate']:.0f}/s)."
+    )
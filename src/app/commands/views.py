@@ -0,0 +1,168 @@
+"""
+    CLI commands for url views.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.database import crud, db, partitions
+from app.services.hashids_codec import get_hashids_codec
+from app.services.views_export import (
+    EXPORT_FORMATS,
+    format_view_events,
+    get_view_events,
+)
+
+views_cli = AppGroup("views", help="Url views maintenance.")
+
+
+@views_cli.command("rollup")
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Rebuild only rollups from this day (YYYY-MM-DD), "
+    "all rollups of not dropped views by default.",
+)
+def rollup(since: datetime | None) -> None:
+    """
+    Rebuilds daily views rollups from url views.
+    Used to backfill rollups of existing views, or as periodic compaction job.
+    """
+    rows_count = crud.url_view_daily.rebuild(
+        db=db, since=since.date() if since else None
+    )
+    click.echo(f"Rebuilt {rows_count} daily rollups.")
+
+
+@views_cli.command("export")
+@click.option("--url-hash", default=None, help="Export only views of this short url.")
+@click.option("--paste-hash", default=None, help="Export only views of this paste.")
+@click.option(
+    "--owner-id",
+    type=int,
+    default=None,
+    help="Export only views of urls and pastes of this user.",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]),
+    default=None,
+    help="Export only views created at this time (UTC) or later.",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(formats=["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]),
+    default=None,
+    help="Export only views created before this time (UTC).",
+)
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(list(EXPORT_FORMATS)),
+    default="ndjson",
+    show_default=True,
+)
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="File to write views to, stdout by default.",
+)
+def export(  # pylint: disable=too-many-arguments
+    url_hash: str | None,
+    paste_hash: str | None,
+    owner_id: int | None,
+    since: datetime | None,
+    until: datetime | None,
+    export_format: str,
+    output,
+) -> None:
+    """
+    Exports raw url views (with user agents and referers) as NDJSON or CSV.
+    Views are streamed, so export of any count of views uses constant memory.
+    """
+    codec = get_hashids_codec()
+    ids = {}
+    for name, url_hash_ in (("url_id", url_hash), ("paste_id", paste_hash)):
+        if url_hash_ is None:
+            continue
+        ids[name] = codec.decode(url_hash_)
+        if ids[name] is None:
+            raise click.BadParameter(f"Invalid hash `{url_hash_}`!")
+
+    events = get_view_events(
+        db=db,
+        owner_id=owner_id,
+        since=since,
+        until=until,
+        batch_size=current_app.config["EXPORT_BATCH_SIZE"],
+        **ids,
+    )
+    for chunk in format_view_events(events, export_format):
+        output.write(chunk)
+
+
+@views_cli.command("partitions")
+@click.option(
+    "--months-ahead",
+    type=int,
+    default=None,
+    help="Create partitions for this count of months ahead "
+    "(VIEWS_PARTITIONS_MONTHS_AHEAD by default).",
+)
+@click.option(
+    "--retention-months",
+    type=int,
+    default=None,
+    help="Drop partitions older than this count of months, 0 keeps all partitions "
+    "(VIEWS_RETENTION_MONTHS by default).",
+)
+@click.option(
+    "--detach-only",
+    is_flag=True,
+    help="Detach expired partitions from url views but keep their tables.",
+)
+def partitions_(
+    months_ahead: int | None, retention_months: int | None, detach_only: bool
+) -> None:
+    """
+    Creates monthly partitions of url views ahead and drops expired ones (PostgreSQL).
+    Should be run periodically (e.g. daily from cron).
+    Stats of dropped views are kept in daily rollups (`views rollup` does not
+    rebuild rollups of dropped months).
+    """
+    if not partitions.is_partitioned(db):
+        raise click.UsageError("Url views table is not partitioned!")
+    if months_ahead is None:
+        months_ahead = current_app.config["VIEWS_PARTITIONS_MONTHS_AHEAD"]
+    if retention_months is None:
+        retention_months = current_app.config["VIEWS_RETENTION_MONTHS"]
+
+    # Views are created in UTC, so partitions are of UTC months.
+    today = datetime.utcnow().date()
+    created = partitions.create_partitions(db, months_ahead=months_ahead, today=today)
+    click.echo(f"Created partitions: {', '.join(created) or 'none'}.")
+    if retention_months <= 0:
+        return
+    dropped = partitions.drop_expired_partitions(
+        db, retention_months=retention_months, today=today, detach_only=detach_only
+    )
+    action = "Detached" if detach_only else "Dropped"
+    click.echo(f"{action} partitions: {', '.join(dropped) or 'none'}.")
@@ -34,11 +34,40 @@ class Config:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_DSN")
+    # Pool of database connections per worker process.
+    DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+    DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+    # Seconds to wait for free connection, then request fails.
+    DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+    # Connections are reopened after this count of seconds, -1 disables recycling.
+    DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+    # Connections are checked (and reopened if closed) before use.
+    DATABASE_POOL_PRE_PING = bool(int(os.getenv("DATABASE_POOL_PRE_PING", "1")))
+    # Prepared statements cached per connection of async engine (asyncpg).
+    DATABASE_STATEMENT_CACHE_SIZE = int(
+        os.getenv("DATABASE_STATEMENT_CACHE_SIZE", "100")
+    )
+    # Database is accessed via PgBouncer in transaction pooling mode: statements cache
+    # is disabled, and connections are always checked before use.
+    DATABASE_PGBOUNCER_MODE = bool(int(os.getenv("DATABASE_PGBOUNCER_MODE", "0")))
+    # Read-only queries (stats, lists, urls by hash) are executed on replica if set.
+    DATABASE_REPLICA_DSN = os.getenv("DATABASE_REPLICA_DSN", "")
+    # Replica lagging more (in seconds) or not available is not used, reads fall back
+    # to primary. Lag is checked once per interval (seconds) by every worker.
+    DATABASE_REPLICA_MAX_LAG = float(os.getenv("DATABASE_REPLICA_MAX_LAG", "5"))
+    DATABASE_REPLICA_CHECK_INTERVAL = float(
+        os.getenv("DATABASE_REPLICA_CHECK_INTERVAL", "5")
+    )
+    # Pool of async serving mode (`uvicorn app.asgi:app`) per worker process.
+    ASYNC_DATABASE_POOL_SIZE = int(os.getenv("ASYNC_DATABASE_POOL_SIZE", "20"))
+    ASYNC_DATABASE_MAX_OVERFLOW = int(os.getenv("ASYNC_DATABASE_MAX_OVERFLOW", "80"))
 
     HASHIDS_SALT = os.getenv(
         "HASHIDS_SALT",
         "gij5uy58yurhgirhigujewiohgihgdjh48ty684yu93tui3hithivhfk3kfm4khni3h4ijiojfuhug3n4ggflorgonojfikdjsigsbhduig",
     )
+    # Max count of memoized hashes of hot urls.
+    HASHIDS_MEMO_SIZE = int(os.getenv("HASHIDS_MEMO_SIZE", "65536"))
     PROXY_PREFIX = os.getenv("PROXY_PREFIX", "/v1")
 
     GATEY_IS_ENABLED = bool(int(os.getenv("GATEY_IS_ENABLED", "0")))
@@ -48,6 +77,99 @@ class Config:
 
     SSO_API_URL = "https://api.florgon.com/v1"
     SSO_API_METHOD = "tokens/check"
+    SSO_POOL_SIZE = int(os.getenv("SSO_POOL_SIZE", "10"))
+    SSO_CONNECT_TIMEOUT = float(os.getenv("SSO_CONNECT_TIMEOUT", "1"))
+    SSO_READ_TIMEOUT = float(os.getenv("SSO_READ_TIMEOUT", "3"))
+    SSO_RETRIES = int(os.getenv("SSO_RETRIES", "2"))
+    SSO_RETRY_BACKOFF = float(os.getenv("SSO_RETRY_BACKOFF", "0.1"))
+    # Requests to SSO fail fast for recovery timeout after this count of failures.
+    SSO_BREAKER_FAILURE_THRESHOLD = int(os.getenv("SSO_BREAKER_FAILURE_THRESHOLD", "5"))
+    SSO_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("SSO_BREAKER_RECOVERY_TIMEOUT", "30"))
+    # Results of tokens checks are cached (valid tokens - not longer than token expires).
+    SSO_TOKEN_CACHE_MAX_SIZE = int(os.getenv("SSO_TOKEN_CACHE_MAX_SIZE", "10000"))
+    SSO_TOKEN_CACHE_TTL = int(os.getenv("SSO_TOKEN_CACHE_TTL", "60"))
+    SSO_TOKEN_CACHE_NEGATIVE_TTL = int(os.getenv("SSO_TOKEN_CACHE_NEGATIVE_TTL", "5"))
+    # Shared cache for all workers and nodes, may be redis://host:6379/0.
+    SSO_TOKEN_CACHE_BACKEND_URL = os.getenv("SSO_TOKEN_CACHE_BACKEND_URL", "")
+
+    # Cache of short urls resolved by hash (per worker).
+    # Cache is disabled if max size is 0.
+    URL_CACHE_MAX_SIZE = int(os.getenv("URL_CACHE_MAX_SIZE", "10000"))
+    URL_CACHE_TTL = int(os.getenv("URL_CACHE_TTL", "60"))
+    # Shared cache for all workers and nodes, may be redis://host:6379/0.
+    # Workers are notified about changed urls via this backend.
+    URL_CACHE_BACKEND_URL = os.getenv("URL_CACHE_BACKEND_URL", "")
+    URL_CACHE_BACKEND_TTL = int(os.getenv("URL_CACHE_BACKEND_TTL", "3600"))
+    # Changed urls are not cached again for this count of seconds.
+    URL_CACHE_TOMBSTONE_TTL = float(os.getenv("URL_CACHE_TOMBSTONE_TTL", "10"))
+    # Ids of user agents and referers cached per worker (for each dimension).
+    DIMENSIONS_CACHE_MAX_SIZE = int(os.getenv("DIMENSIONS_CACHE_MAX_SIZE", "10000"))
+
+    # Lists of user's urls and pastes are paginated (`limit` GET param).
+    LIST_DEFAULT_LIMIT = int(os.getenv("LIST_DEFAULT_LIMIT", "100"))
+    LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "1000"))
+    # Count of urls (pastes) fetched from the database at once by export methods.
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    # Max count of urls (pastes) created or fetched by single batch request.
+    URLS_BATCH_MAX_SIZE = int(os.getenv("URLS_BATCH_MAX_SIZE", "1000"))
+
+    # Rendered QR codes cached per worker (size in bytes, 0 disables cache).
+    QR_CACHE_MAX_BYTES = int(os.getenv("QR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    # Directory for QR codes evicted from memory (shared by workers), disabled if empty.
+    QR_CACHE_SPILL_DIR = os.getenv("QR_CACHE_SPILL_DIR", "")
+    # Max size of spill directory in bytes (LRU QR codes are removed), 0 is unlimited.
+    QR_CACHE_SPILL_MAX_BYTES = int(
+        os.getenv("QR_CACHE_SPILL_MAX_BYTES", str(512 * 1024 * 1024))
+    )
+    # Backend of PNG QR codes rendering: `zlib` or `pypng` (same output, slower).
+    QR_PNG_BACKEND = os.getenv("QR_PNG_BACKEND", "zlib")
+    # QR codes of new urls are rendered in background and cached, so the first
+    # request of QR code is a cache hit. Default of `prerender_qr` param of new urls.
+    QR_PRERENDER_ENABLED = bool(int(os.getenv("QR_PRERENDER_ENABLED", "0")))
+    # Comma separated `result_type:scale` pairs (with default quiet zone).
+    QR_PRERENDER_VARIANTS = os.getenv("QR_PRERENDER_VARIANTS", "svg:3,png:3")
+    # Threads waiting for rendering processes (`QR_RENDER_PROCESSES`) per worker.
+    QR_PRERENDER_WORKERS = int(os.getenv("QR_PRERENDER_WORKERS", "1"))
+    QR_PRERENDER_MAX_PENDING = int(os.getenv("QR_PRERENDER_MAX_PENDING", "1000"))
+    # QR codes are rendered in separate processes (per worker), so rendering does not
+    # block redirects. 0 renders QR codes in request thread.
+    QR_RENDER_PROCESSES = int(os.getenv("QR_RENDER_PROCESSES", "2"))
+    # Requests of QR codes are rejected with 429 when too many QR codes are rendering.
+    QR_RENDER_MAX_PENDING = int(os.getenv("QR_RENDER_MAX_PENDING", "16"))
+
+    # Views are written to the database in batches by background flusher
+    # (disabled by default: buffered views may be lost if worker is killed).
+    VIEWS_INGESTION_ENABLED = bool(int(os.getenv("VIEWS_INGESTION_ENABLED", "0")))
+    VIEWS_INGESTION_BUFFER_SIZE = int(os.getenv("VIEWS_INGESTION_BUFFER_SIZE", "10000"))
+    VIEWS_INGESTION_BATCH_SIZE = int(os.getenv("VIEWS_INGESTION_BATCH_SIZE", "500"))
+    VIEWS_INGESTION_FLUSH_INTERVAL_MS = int(
+        os.getenv("VIEWS_INGESTION_FLUSH_INTERVAL_MS", "500")
+    )
+    # What to do when buffer is full. May be drop, block, spill.
+    VIEWS_INGESTION_OVERFLOW_POLICY = os.getenv("VIEWS_INGESTION_OVERFLOW_POLICY", "drop")
+    VIEWS_INGESTION_BLOCK_TIMEOUT_MS = int(
+        os.getenv("VIEWS_INGESTION_BLOCK_TIMEOUT_MS", "1000")
+    )
+    # Spilled views (and views that failed to be written) are stored here.
+    VIEWS_INGESTION_SPILL_DIR = os.getenv("VIEWS_INGESTION_SPILL_DIR", "/tmp/cc-api-views")
+    # Url views are partitioned by month on PostgreSQL (`flask views partitions`).
+    # Partitions are created for this count of months ahead.
+    VIEWS_PARTITIONS_MONTHS_AHEAD = int(os.getenv("VIEWS_PARTITIONS_MONTHS_AHEAD", "3"))
+    # Partitions older than this count of months are dropped, 0 keeps views forever.
+    VIEWS_RETENTION_MONTHS = int(os.getenv("VIEWS_RETENTION_MONTHS", "0"))
+
+    # Expired urls and pastes are marked as swept by `flask urls sweep` or by
+    # background sweeper in every worker (every `EXPIRY_SWEEPER_INTERVAL` seconds).
+    EXPIRY_SWEEPER_ENABLED = bool(int(os.getenv("EXPIRY_SWEEPER_ENABLED", "0")))
+    EXPIRY_SWEEPER_INTERVAL = float(os.getenv("EXPIRY_SWEEPER_INTERVAL", "300"))
+    # Count of urls (pastes) marked by one short transaction.
+    EXPIRY_SWEEPER_BATCH_SIZE = int(os.getenv("EXPIRY_SWEEPER_BATCH_SIZE", "500"))
+    # Max count of batches of one sweep (for urls and pastes each), 0 is unlimited.
+    EXPIRY_SWEEPER_MAX_BATCHES = int(os.getenv("EXPIRY_SWEEPER_MAX_BATCHES", "0"))
+
+    # Metrics of workers are returned by `/metrics` method (should be available
+    # only from internal network).
+    METRICS_ENABLED = bool(int(os.getenv("METRICS_ENABLED", "0")))
 
     # If you are deploying API on other domain, you should change it
     API_HOSTNAME = os.getenv("API_HOSTNAME", "api-cc.florgon.com")
@@ -62,4 +184,12 @@ class ConfigTesting(Config):
 
     TESTING = True
 
+    # Views are written synchronously in tests.
+    VIEWS_INGESTION_ENABLED = False
+    EXPIRY_SWEEPER_ENABLED = False
+    # QR codes are rendered in request thread in tests (pool is tested separately).
+    QR_RENDER_PROCESSES = 0
+
     SQLALCHEMY_DATABASE_URI = os.getenv("TEST_DATABASE_DSN")  # noqa
+    # Replica is tested separately.
+    DATABASE_REPLICA_DSN = ""
@@ -20,14 +20,20 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask import Flask
 
+from app.database import replicas, transaction
+from app.database.pool import get_engine_options
+
 
 def init_with_app(app: Flask) -> None:
     """
     Initializes database requirements with Flask app by connecting ORM and running migrations if required.
     """
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", get_engine_options(app.config))
     db.init_app(app)
     migrate.init_app(app, db)
+    replicas.init_with_app(app)
+    transaction.init_with_app(app)
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": replicas.RoutingSession})
 migrate = Migrate()
@@ -15,6 +15,24 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-from . import redirect_url, url_view, user_agent, referer, user, paste_url
+from . import (
+    redirect_url,
+    url_view,
+    url_view_daily,
+    dimension,
+    user_agent,
+    referer,
+    user,
+    paste_url,
+)
 
-__all__ = ["redirect_url", "url_view", "user_agent", "referer", "user", "paste_url"]
+__all__ = [
+    "redirect_url",
+    "url_view",
+    "url_view_daily",
+    "dimension",
+    "user_agent",
+    "referer",
+    "user",
+    "paste_url",
+]
@@ -0,0 +1,122 @@
+"""
+    Interned lookup of dimensions (user agents and referers) values ids.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import hashlib
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.database.dialects import get_insert
+from app.database.models.referer import Referer
+from app.database.models.user_agent import UserAgent
+from app.database.transaction import on_commit
+from app.services.cache.lru import LruTtlCache
+
+
+def get_digest(value: str) -> str:
+    """
+    Returns digest of dimension value, used as unique key of value.
+    :rtype: str
+    """
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def get_or_create_ids(
+    db: SQLAlchemy,
+    model: type[UserAgent] | type[Referer],
+    value_column: InstrumentedAttribute,
+    cache: LruTtlCache[int],
+    values: set[str],
+) -> dict[str, int]:
+    """
+    Returns ids of dimension values, creates missing ones.
+    Ids are taken from cache (keyed by value digest), so cached values cost no queries.
+    Missing values are inserted with `INSERT ... ON CONFLICT DO NOTHING RETURNING`,
+    values inserted concurrently by other workers are selected after that.
+    :param SQLAlchemy db: database object
+    :param model: UserAgent or Referer
+    :param value_column: column with value of dimension
+    :param LruTtlCache[int] cache: cache of ids by values digests
+    :param set[str] values: values of dimension
+    :return: dict like {value: id}
+    :rtype: dict[str, int]
+    """
+    ids: dict[str, int] = {}
+    missing: dict[str, str] = {}
+    for value in values:
+        digest = get_digest(value)
+        value_id = cache.get(digest)
+        if value_id is None:
+            missing[digest] = value
+        else:
+            ids[value] = value_id
+    if not missing:
+        return ids
+
+    # Rows are inserted in the same order by all workers, so they do not deadlock.
+    digests = sorted(missing)
+    statement = (
+        get_insert(db)(model)
+        .values(
+            [
+                {value_column.key: missing[digest], "value_digest": digest}
+                for digest in digests
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=["value_digest"])
+        .returning(model.value_digest, model.id)
+    )
+    created_ids = dict(db.session.execute(statement).all())
+    existing_digests = missing.keys() - created_ids.keys()
+    if existing_digests:
+        created_ids.update(
+            db.session.query(model.value_digest, model.id)
+            .filter(model.value_digest.in_(existing_digests))
+            .all()
+        )
+
+    def cache_ids() -> None:
+        for digest, value_id in created_ids.items():
+            cache.set(digest, value_id)
+
+    # Ids are cached only after commit, so cache never has ids of rolled back rows.
+    on_commit(db, cache_ids)
+    for digest, value_id in created_ids.items():
+        ids[missing[digest]] = value_id
+    return ids
+
+
+def get_values(
+    db: SQLAlchemy,
+    model: type[UserAgent] | type[Referer],
+    value_column: InstrumentedAttribute,
+    ids: set[int],
+) -> dict[int, str]:
+    """
+    Returns values of dimension objects by their ids with one query.
+    :param SQLAlchemy db: database object
+    :param type model: UserAgent or Referer
+    :param InstrumentedAttribute value_column: column with value
+    :param set[int] ids: ids of dimension objects
+    :return: dict like {id: value}
+    :rtype: dict[int, str]
+    """
+    if not ids:
+        return {}
+    statement = select(model.id, value_column).where(model.id.in_(ids))
+    return dict(db.session.execute(statement).all())
@@ -15,11 +15,23 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-from hashids import Hashids
+from collections import defaultdict
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Iterable, Iterator
+
 from flask_sqlalchemy import SQLAlchemy
-from flask import current_app
+from sqlalchemy import func, insert, select, update as update_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
+from app.database import crud
 from app.database.models.url import PasteUrl
+from app.database.replicas import use_replica
+from app.database.transaction import on_commit, on_commit_async
+from app.database.snapshots import PasteUrlSnapshot
+from app.services.cache import get_url_cache
+from app.services.hashids_codec import get_hashids_codec
 
 
 def create_url(
@@ -31,7 +43,7 @@ def create_url(
     owner_id: int | None = None,
 ) -> PasteUrl:
     """
-    Creates new shortened paste url in database.
+    Creates new shortened paste url in database (committed with request transaction).
     :param SQLAlchemy db: database object
     :param str content: paste text content
     :param bool stats_is_public: makes url stats public to all users
@@ -49,22 +61,102 @@ def create_url(
     )
 
     db.session.add(url)
-    db.session.commit()
-    db.session.refresh(url)
+    # INSERT ... RETURNING id, defaults are computed by the app and already set.
+    db.session.flush()
 
     return url
 
 
-def get_by_owner_id(owner_id: int) -> list[PasteUrl]:
+def create_urls(
+    db: SQLAlchemy,
+    pastes: list[dict[str, Any]],
+    owner_id: int | None = None,
+) -> list[PasteUrlSnapshot]:
+    """
+    Creates many paste urls in database with single multi-row INSERT.
+    :param SQLAlchemy db: database object
+    :param list[dict[str, Any]] pastes: pastes fields (`content`, `language`,
+                                       `stats_is_public`, `burn_after_read`)
+    :param int | None owner_id: id of local user
+    :return: snapshots of created pastes in the same order
+    :rtype: list[PasteUrlSnapshot]
     """
-    Returns PasteUrls with specified owner_id.
+    if not pastes:
+        return []
+
+    rows = [{**paste, "owner_id": owner_id} for paste in pastes]
+    # Order of returned rows is not guaranteed, so pastes are matched with rows
+    # by their values: pastes with the same values are interchangeable.
+    created: dict[tuple, list[PasteUrlSnapshot]] = defaultdict(list)
+    for url in db.session.scalars(insert(PasteUrl).returning(PasteUrl), rows):
+        snapshot = PasteUrlSnapshot.from_model(url)
+        created[_get_paste_values(asdict(snapshot))].append(snapshot)
+
+    return [created[_get_paste_values(row)].pop() for row in rows]
+
+
+def _get_paste_values(paste: dict[str, Any]) -> tuple:
+    return (
+        paste["content"],
+        paste["language"],
+        paste["stats_is_public"],
+        paste["burn_after_read"],
+    )
+
+
+@use_replica()
+def get_by_owner_id(
+    owner_id: int,
+    limit: int | None = None,
+    before_id: int | None = None,
+    columns: Iterable[str] | None = None,
+) -> list[PasteUrl]:
+    """
+    Returns pastes with specified owner_id, newest first.
+    Paginated by keyset: next page is requested with id of last paste as `before_id`.
     :param int owner_id: id of owner
-    :return: List with URLs.
+    :param int|None limit: max count of pastes, all pastes if not passed
+    :param int|None before_id: return only pastes with lower ids
+    :param Iterable[str]|None columns: load only these columns (and id)
     :rtype: list[PasteUrl]
     """
-    return PasteUrl.query.filter_by(owner_id=owner_id)
+    query = PasteUrl.query.filter_by(owner_id=owner_id)
+    if before_id is not None:
+        query = query.filter(PasteUrl.id < before_id)
+    if columns is not None:
+        query = query.options(
+            load_only(*(getattr(PasteUrl, column) for column in {"id", *columns}))
+        )
+    return query.order_by(PasteUrl.id.desc()).limit(limit).all()
+
+
+def get_with_views_by_owner_id(
+    db: SQLAlchemy, owner_id: int, batch_size: int = 1000
+) -> Iterator[tuple[PasteUrl, int]]:
+    """
+    Yields all pastes with specified owner_id and their total views counts
+    (from rollups). Pastes are fetched by server-side cursor in batches,
+    so memory does not grow with count of pastes.
+    :param SQLAlchemy db: database object
+    :param int owner_id: id of owner
+    :param int batch_size: count of pastes fetched at once
+    :rtype: Iterator[tuple[PasteUrl, int]]
+    """
+    views = crud.url_view_daily.get_totals_subquery(PasteUrl, owner_id)
+    statement = (
+        select(PasteUrl, func.coalesce(views.c.views_count, 0))
+        .outerjoin(views, views.c.id == PasteUrl.id)
+        .where(PasteUrl.owner_id == owner_id)
+        .order_by(PasteUrl.id)
+        .execution_options(yield_per=batch_size)
+    )
+    with use_replica():
+        result = db.session.execute(statement)
+    for url, views_count in result:
+        yield url, views_count
 
 
+@use_replica()
 def get_by_hash(url_hash: str, only_active: bool = True) -> PasteUrl | None:
     """
     Get paste url from database by hash generated by hashids.
@@ -75,25 +167,187 @@ def get_by_hash(url_hash: str, only_active: bool = True) -> PasteUrl | None:
     :return: url object
     :rtype: PasteUrl or None if hash is invalid
     """
-    hashids = Hashids(salt=current_app.config["HASHIDS_SALT"], min_length=6)
-    url_ids: tuple[int] = hashids.decode(url_hash)
-    if len(url_ids) != 1:
+    url_id = get_hashids_codec().decode(url_hash)
+    if url_id is None:
         return None
-    url_id = url_ids[0]
     url = PasteUrl.query.filter_by(id=url_id)
     if only_active:
         url = url.filter_by(is_deleted=False)
     return url.first()
 
 
-def delete(db: SQLAlchemy, url: PasteUrl) -> None:
+def get_snapshot_by_hash(
+    url_hash: str, only_active: bool = True
+) -> PasteUrlSnapshot | None:
+    """
+    Get snapshot of paste url by hash generated by hashids.
+    Snapshot is taken from url cache, database is queried only on cache miss
+    (always primary, as lagging replica may return paste changed just now).
+    Should be used by views that only read paste.
+    :param str url_hash: hashids hash
+    :param bool only_active: search url from active (with is_deleted = False) urls
+    :return: paste snapshot
+    :rtype: PasteUrlSnapshot or None if hash is invalid
+    """
+    url_id = get_hashids_codec().decode(url_hash)
+    if url_id is None:
+        return None
+
+    cache = get_url_cache()
+    snapshot = cache.get(PasteUrlSnapshot, url_id)
+    if snapshot is None:
+        url = PasteUrl.query.filter_by(id=url_id).first()
+        if url is None:
+            return None
+        snapshot = PasteUrlSnapshot.from_model(url)
+        cache.set(snapshot)
+
+    if only_active and snapshot.is_deleted:
+        return None
+    return snapshot
+
+
+async def get_snapshot_by_hash_async(
+    session: AsyncSession, url_hash: str, only_active: bool = True
+) -> PasteUrlSnapshot | None:
+    """
+    Async version of `get_snapshot_by_hash` for async serving mode (see `app.asgi`),
+    database is queried by async driver only on cache miss.
+    :param AsyncSession session: async database session
+    :param str url_hash: hashids hash
+    :param bool only_active: search url from active (with is_deleted = False) urls
+    :rtype: PasteUrlSnapshot or None if hash is invalid
+    """
+    url_id = get_hashids_codec().decode(url_hash)
+    if url_id is None:
+        return None
+
+    cache = get_url_cache()
+    snapshot = await cache.get_async(PasteUrlSnapshot, url_id)
+    if snapshot is None:
+        url = await session.scalar(select(PasteUrl).where(PasteUrl.id == url_id))
+        if url is None:
+            return None
+        snapshot = PasteUrlSnapshot.from_model(url)
+        await cache.set_async(snapshot)
+
+    if only_active and snapshot.is_deleted:
+        return None
+    return snapshot
+
+
+def get_snapshots_by_hashes(
+    url_hashes: Iterable[str], only_active: bool = True
+) -> dict[str, PasteUrlSnapshot | None]:
+    """
+    Get snapshots of many paste urls by hashes generated by hashids.
+    Snapshots are taken from url cache, pastes missed in cache are queried at once
+    (on primary, see `get_snapshot_by_hash`).
+    :param Iterable[str] url_hashes: hashids hashes
+    :param bool only_active: search url from active (with is_deleted = False) urls
+    :return: paste snapshot (or None if hash is invalid) for every hash
+    :rtype: dict[str, PasteUrlSnapshot | None]
+    """
+    codec = get_hashids_codec()
+    cache = get_url_cache()
+    url_ids = {url_hash: codec.decode(url_hash) for url_hash in url_hashes}
+
+    snapshots: dict[int, PasteUrlSnapshot] = {}
+    missed_ids = []
+    for url_id in set(url_ids.values()) - {None}:
+        snapshot = cache.get(PasteUrlSnapshot, url_id)
+        if snapshot is None:
+            missed_ids.append(url_id)
+        else:
+            snapshots[url_id] = snapshot
+    if missed_ids:
+        for url in PasteUrl.query.filter(PasteUrl.id.in_(missed_ids)):
+            snapshot = PasteUrlSnapshot.from_model(url)
+            cache.set(snapshot)
+            snapshots[url.id] = snapshot
+
+    result = {}
+    for url_hash, url_id in url_ids.items():
+        snapshot = snapshots.get(url_id)
+        if snapshot is not None and only_active and snapshot.is_deleted:
+            snapshot = None
+        result[url_hash] = snapshot
+    return result
+
+
+def burn(db: SQLAlchemy, url_ids: Iterable[int]) -> set[int]:
+    """
+    Deletes burn after read pastes after reading.
+    Paste is deleted with single conditional UPDATE, so only one of concurrent readers
+    claims the paste and is allowed to read it.
+    :param SQLAlchemy db: database object
+    :param Iterable[int] url_ids: ids of read pastes
+    :return: ids of pastes that are deleted by this call (allowed to read)
+    :rtype: set[int]
+    """
+    url_ids = list(url_ids)
+    if not url_ids:
+        return set()
+
+    burned_ids = set(
+        db.session.scalars(
+            update_(PasteUrl)
+            .where(PasteUrl.id.in_(url_ids), PasteUrl.is_deleted.is_not(True))
+            .values(is_deleted=True)
+            .returning(PasteUrl.id)
+            .execution_options(synchronize_session=False)
+        )
+    )
+
+    def invalidate() -> None:
+        cache = get_url_cache()
+        for url_id in url_ids:
+            cache.invalidate(PasteUrlSnapshot, url_id)
+
+    on_commit(db, invalidate)
+    return burned_ids
+
+
+async def burn_async(session: AsyncSession, url_ids: Iterable[int]) -> set[int]:
+    """
+    Async version of `burn` for async serving mode (see `app.asgi`).
+    Does not commit, session is committed by `commit_async` after request.
+    :param AsyncSession session: async database session
+    :param Iterable[int] url_ids: ids of read pastes
+    :return: ids of pastes that are deleted by this call (allowed to read)
+    :rtype: set[int]
+    """
+    url_ids = list(url_ids)
+    if not url_ids:
+        return set()
+
+    burned_ids = set(
+        await session.scalars(
+            update_(PasteUrl)
+            .where(PasteUrl.id.in_(url_ids), PasteUrl.is_deleted.is_not(True))
+            .values(is_deleted=True)
+            .returning(PasteUrl.id)
+            .execution_options(synchronize_session=False)
+        )
+    )
+
+    def invalidate() -> None:
+        cache = get_url_cache()
+        for url_id in url_ids:
+            cache.invalidate(PasteUrlSnapshot, url_id)
+
+    on_commit_async(session, invalidate)
+    return burned_ids
+
+
+def delete(db: SQLAlchemy, url: PasteUrl | PasteUrlSnapshot) -> None:
     """
     Deletes paste url and views.
     :param SQLAlchemy db: database object
-    :param PasteUrl url: url object
+    :param PasteUrl|PasteUrlSnapshot url: url object
     """
-    url.is_deleted = True
-    db.session.commit()
+    PasteUrl.query.filter_by(id=url.id).update({"is_deleted": True})
+    on_commit(db, lambda: get_url_cache().invalidate(PasteUrlSnapshot, url.id))
 
 
 def update(db: SQLAlchemy, url: PasteUrl, text: str | None = None, language: str | None = None) -> PasteUrl:
@@ -107,6 +361,47 @@ def update(db: SQLAlchemy, url: PasteUrl, text: str | None = None, language: str
         url.content = text
     if language:
         url.language = language
-    db.session.commit()
-    db.session.refresh(url)
+    db.session.flush()
+    on_commit(db, lambda: get_url_cache().invalidate(PasteUrlSnapshot, url.id))
     return url
+
+
+def tombstone_expired(
+    db: SQLAlchemy, batch_size: int, now: datetime | None = None
+) -> list[int]:
+    """
+    Marks batch of expired pastes as swept and evicts them from url cache.
+    `is_deleted` is not changed, so swept pastes are still reported as expired.
+    Rows locked by other transactions (e.g. concurrent sweepers) are skipped,
+    so the batch never waits for locks and holds its own locks only until commit.
+    :param SQLAlchemy db: database object
+    :param int batch_size: max count of pastes marked at once
+    :param datetime|None now: pastes expired before it are marked
+                              (local now by default, as in `is_expired`)
+    :return: ids of marked pastes
+    :rtype: list[int]
+    """
+    expired = (
+        select(PasteUrl.id)
+        .where(
+            PasteUrl.is_swept.is_not(True),
+            PasteUrl.expiration_date <= (now or datetime.now()),
+        )
+        .order_by(PasteUrl.expiration_date)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    url_ids = list(
+        db.session.scalars(
+            update_(PasteUrl)
+            .where(PasteUrl.id.in_(expired))
+            .values(is_swept=True)
+            .returning(PasteUrl.id)
+            .execution_options(synchronize_session=False)
+        )
+    )
+    db.session.commit()
+    cache = get_url_cache()
+    for url_id in url_ids:
+        cache.invalidate(PasteUrlSnapshot, url_id)
+    return url_ids
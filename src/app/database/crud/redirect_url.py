@@ -15,11 +15,22 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-from flask import current_app
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Iterator
+
 from flask_sqlalchemy import SQLAlchemy
-from hashids import Hashids
+from sqlalchemy import func, insert, select, update as update_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
+from app.database import crud
 from app.database.models.url import RedirectUrl
+from app.database.replicas import use_replica
+from app.database.transaction import on_commit
+from app.database.snapshots import RedirectUrlSnapshot
+from app.services.cache import get_url_cache
+from app.services.hashids_codec import get_hashids_codec
 
 
 def create_url(
@@ -29,32 +40,75 @@ def create_url(
     owner_id: int | None = None,
 ) -> RedirectUrl:
     """
-    Creates new shortened url in database.
+    Creates new shortened url in database (committed with request transaction).
     :param SQLAlchemy db: database object
     :param str redirect_url: long url for redirecting
     :param int | None owner_id: id of local user
     :return: created url object
     :rtype: RedirectUrl
     """
-    if not redirect_url.startswith("http://") and not redirect_url.startswith(
-        "https://"
-    ):
-        # Add protocol for valid redirecting to an external domain
-        redirect_url = "https://" + redirect_url
-
     url = RedirectUrl(
-        redirect=redirect_url,
+        redirect=_add_protocol(redirect_url),
         stats_is_public=stats_is_public,
         owner_id=owner_id,
     )
 
     db.session.add(url)
-    db.session.commit()
-    db.session.refresh(url)
+    # INSERT ... RETURNING id, defaults are computed by the app and already set.
+    db.session.flush()
 
     return url
 
 
+def create_urls(
+    db: SQLAlchemy,
+    redirect_urls: list[tuple[str, bool]],
+    owner_id: int | None = None,
+) -> list[RedirectUrlSnapshot]:
+    """
+    Creates many shortened urls in database with single multi-row INSERT.
+    :param SQLAlchemy db: database object
+    :param list[tuple[str, bool]] redirect_urls: long urls and their `stats_is_public`
+    :param int | None owner_id: id of local user
+    :return: snapshots of created urls in the same order
+    :rtype: list[RedirectUrlSnapshot]
+    """
+    if not redirect_urls:
+        return []
+
+    rows = [
+        {
+            "redirect": _add_protocol(redirect_url),
+            "stats_is_public": stats_is_public,
+            "owner_id": owner_id,
+        }
+        for redirect_url, stats_is_public in redirect_urls
+    ]
+    # Order of returned rows is not guaranteed (and asking SQLAlchemy to sort them
+    # may split INSERT into many), so urls are matched with rows by their values:
+    # urls with the same values are interchangeable.
+    created: dict[tuple[str, bool], list[RedirectUrlSnapshot]] = defaultdict(list)
+    for url in db.session.scalars(insert(RedirectUrl).returning(RedirectUrl), rows):
+        # Snapshots are taken from returned rows, so urls are not loaded again.
+        snapshot = RedirectUrlSnapshot.from_model(url)
+        created[(snapshot.redirect, snapshot.stats_is_public)].append(snapshot)
+
+    return [created[(row["redirect"], row["stats_is_public"])].pop() for row in rows]
+
+
+def _add_protocol(redirect_url: str) -> str:
+    """
+    Adds protocol for valid redirecting to an external domain.
+    :rtype: str
+    """
+    if not redirect_url.startswith("http://") and not redirect_url.startswith(
+        "https://"
+    ):
+        return "https://" + redirect_url
+    return redirect_url
+
+
+@use_replica()
 def get_all() -> list[RedirectUrl]:
     """
     Returns all URLs from the database.
@@ -64,15 +118,60 @@ def get_all() -> list[RedirectUrl]:
     return RedirectUrl.query.all()
 
 
-def get_by_owner_id(owner_id: int) -> list[RedirectUrl]:
+@use_replica()
+def get_by_owner_id(
+    owner_id: int,
+    limit: int | None = None,
+    before_id: int | None = None,
+    columns: Iterable[str] | None = None,
+) -> list[RedirectUrl]:
     """
-    Returns all URLs with owner ID from the database.
-    :return: List with URLs.
-    :rtype: List of the urls.
+    Returns urls with specified owner_id, newest first.
+    Paginated by keyset: next page is requested with id of the last url as `before_id`.
+    :param int owner_id: id of owner
+    :param int|None limit: max count of urls, all urls if not passed
+    :param int|None before_id: return only urls with lower ids
+    :param Iterable[str]|None columns: load only these columns (and id)
+    :rtype: list[RedirectUrl]
+    """
+    query = RedirectUrl.query.filter_by(owner_id=owner_id)
+    if before_id is not None:
+        query = query.filter(RedirectUrl.id < before_id)
+    if columns is not None:
+        query = query.options(
+            load_only(*(getattr(RedirectUrl, column) for column in {"id", *columns}))
+        )
+    return query.order_by(RedirectUrl.id.desc()).limit(limit).all()
+
+
+def get_with_views_by_owner_id(
+    db: SQLAlchemy, owner_id: int, batch_size: int = 1000
+) -> Iterator[tuple[RedirectUrl, int]]:
+    """
+    Yields all urls with specified owner_id and their total views counts
+    (from rollups). Urls are fetched by server-side cursor in batches,
+    so memory does not grow with count of urls.
+    :param SQLAlchemy db: database object
+    :param int owner_id: id of owner
+    :param int batch_size: count of urls fetched at once
+    :rtype: Iterator[tuple[RedirectUrl, int]]
     """
-    return RedirectUrl.query.filter_by(owner_id=owner_id)
+    views = crud.url_view_daily.get_totals_subquery(RedirectUrl, owner_id)
+    statement = (
+        select(RedirectUrl, func.coalesce(views.c.views_count, 0))
+        .outerjoin(views, views.c.id == RedirectUrl.id)
+        .where(RedirectUrl.owner_id == owner_id)
+        .order_by(RedirectUrl.id)
+        .execution_options(yield_per=batch_size)
+    )
+    # Generator can not be decorated: rows are fetched after it is suspended.
+    with use_replica():
+        result = db.session.execute(statement)
+    for url, views_count in result:
+        yield url, views_count
 
 
+@use_replica()
 def get_by_hash(url_hash: str, only_active: bool = True) -> RedirectUrl | None:
     """
     Get shortened url from database by hash generated by hashids.
@@ -83,22 +182,121 @@ def get_by_hash(url_hash: str, only_active: bool = True) -> RedirectUrl | None:
     :return: url object
     :rtype: RedirectUrl or None if hash is invalid
     """
-    hashids = Hashids(salt=current_app.config["HASHIDS_SALT"], min_length=6)
-    url_ids: tuple[int] = hashids.decode(url_hash)
-    if len(url_ids) != 1:
+    url_id = get_hashids_codec().decode(url_hash)
+    if url_id is None:
         return None
-    url_id = url_ids[0]
     url = RedirectUrl.query.filter_by(id=url_id)
     if only_active:
         url = url.filter_by(is_deleted=False)
     return url.first()
 
 
-def delete(db: SQLAlchemy, url: RedirectUrl) -> None:
+def get_snapshot_by_hash(
+    url_hash: str, only_active: bool = True
+) -> RedirectUrlSnapshot | None:
+    """
+    Get snapshot of shortened url by hash generated by hashids.
+    Snapshot is taken from url cache, database is queried only on cache miss
+    (always primary, as lagging replica may return url changed just now).
+    Should be used by views that only read url.
+    :param str url_hash: hashids hash
+    :param bool only_active: search url from active (with is_deleted = False) urls
+    :return: url snapshot
+    :rtype: RedirectUrlSnapshot or None if hash is invalid
+    """
+    url_id = get_hashids_codec().decode(url_hash)
+    if url_id is None:
+        return None
+
+    cache = get_url_cache()
+    snapshot = cache.get(RedirectUrlSnapshot, url_id)
+    if snapshot is None:
+        url = RedirectUrl.query.filter_by(id=url_id).first()
+        if url is None:
+            return None
+        snapshot = RedirectUrlSnapshot.from_model(url)
+        cache.set(snapshot)
+
+    if only_active and snapshot.is_deleted:
+        return None
+    return snapshot
+
+
+async def get_snapshot_by_hash_async(
+    session: AsyncSession, url_hash: str, only_active: bool = True
+) -> RedirectUrlSnapshot | None:
+    """
+    Async version of `get_snapshot_by_hash` for async serving mode (see `app.asgi`),
+    database is queried by async driver only on cache miss.
+    :param AsyncSession session: async database session
+    :param str url_hash: hashids hash
+    :param bool only_active: search url from active (with is_deleted = False) urls
+    :rtype: RedirectUrlSnapshot or None if hash is invalid
+    """
+    url_id = get_hashids_codec().decode(url_hash)
+    if url_id is None:
+        return None
+
+    cache = get_url_cache()
+    snapshot = await cache.get_async(RedirectUrlSnapshot, url_id)
+    if snapshot is None:
+        url = await session.scalar(select(RedirectUrl).where(RedirectUrl.id == url_id))
+        if url is None:
+            return None
+        snapshot = RedirectUrlSnapshot.from_model(url)
+        await cache.set_async(snapshot)
+
+    if only_active and snapshot.is_deleted:
+        return None
+    return snapshot
+
+
+def delete(db: SQLAlchemy, url: RedirectUrl | RedirectUrlSnapshot) -> None:
     """
     Deletes url and views.
     :param SQLAlchemy db: database object
-    :param RedirectUrl url: url object
+    :param RedirectUrl|RedirectUrlSnapshot url: url object
     """
-    url.is_deleted = True
+    RedirectUrl.query.filter_by(id=url.id).update({"is_deleted": True})
+    on_commit(db, lambda: get_url_cache().invalidate(RedirectUrlSnapshot, url.id))
+
+
+def tombstone_expired(
+    db: SQLAlchemy, batch_size: int, now: datetime | None = None
+) -> list[int]:
+    """
+    Marks batch of expired urls as swept and evicts them from url cache.
+    `is_deleted` is not changed, so swept urls are still reported as expired.
+    Rows locked by other transactions (e.g. concurrent sweepers) are skipped,
+    so the batch never waits for locks and holds its own locks only until commit.
+    :param SQLAlchemy db: database object
+    :param int batch_size: max count of urls marked at once
+    :param datetime|None now: urls expired before it are marked
+                              (local now by default, as in `is_expired`)
+    :return: ids of marked urls
+    :rtype: list[int]
+    """
+    expired = (
+        select(RedirectUrl.id)
+        .where(
+            RedirectUrl.is_swept.is_not(True),
+            RedirectUrl.expiration_date <= (now or datetime.now()),
+        )
+        .order_by(RedirectUrl.expiration_date)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    url_ids = list(
+        db.session.scalars(
+            update_(RedirectUrl)
+            .where(RedirectUrl.id.in_(expired))
+            .values(is_swept=True)
+            .returning(RedirectUrl.id)
+            .execution_options(synchronize_session=False)
+        )
+    )
     db.session.commit()
+    cache = get_url_cache()
+    for url_id in url_ids:
+        cache.invalidate(RedirectUrlSnapshot, url_id)
+    return url_ids
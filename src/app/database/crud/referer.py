@@ -17,22 +17,48 @@
 """
 from flask_sqlalchemy import SQLAlchemy
 
+from app.database.crud import dimension
 from app.database.models.referer import Referer
+from app.services.cache.dimensions import get_dimensions_cache
 
 
-def get_or_create(db: SQLAlchemy, referer: str) -> Referer:
+def get_or_create_id(db: SQLAlchemy, referer: str) -> int:
     """
-    Returns Referer object if there is one in DB, else create it.
+    Returns id of Referer object, creates it if there is no one in DB.
+    Costs no queries if id is cached.
     :param SQLAlchemy db: database object
     :param str referer: referer from `Referer` header
-    :return: Referer object
-    :rtype: Referer
+    :return: id of Referer object
+    :rtype: int
     """
-    referer_object = Referer.query.filter_by(referer_value=referer).first()
-    if referer_object is None:
-        referer_object = Referer(referer_value=referer)
-        db.session.add(referer_object)
-        db.session.commit()
-        db.session.refresh(referer_object)
-
-    return referer_object
+    return get_or_create_ids(db=db, referers={referer})[referer]
+
+
+def get_or_create_ids(db: SQLAlchemy, referers: set[str]) -> dict[str, int]:
+    """
+    Returns ids of Referer objects for all passed values, creates missing ones.
+    :param SQLAlchemy db: database object
+    :param set[str] referers: referers from `Referer` headers
+    :return: dict like {referer: referer_id}
+    :rtype: dict[str, int]
+    """
+    return dimension.get_or_create_ids(
+        db=db,
+        model=Referer,
+        value_column=Referer.referer_value,
+        cache=get_dimensions_cache().referers,
+        values=referers,
+    )
+
+
+def get_values(db: SQLAlchemy, ids: set[int]) -> dict[int, str]:
+    """
+    Returns values of Referer objects by their ids.
+    :param SQLAlchemy db: database object
+    :param set[int] ids: ids of Referer objects
+    :return: dict like {referer_id: referer}
+    :rtype: dict[int, str]
+    """
+    return dimension.get_values(
+        db=db, model=Referer, value_column=Referer.referer_value, ids=ids
+    )
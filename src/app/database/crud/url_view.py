@@ -16,28 +16,33 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+from collections import Counter
+from datetime import datetime
+from typing import Iterator, Sequence
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.sql.expression import func
+from sqlalchemy import Row, insert, or_, select
 
 from app.database.models.url import RedirectUrl, PasteUrl
 from app.database.models.url_view import UrlView
-from app.database.models.referer import Referer
+from app.database.snapshots import RedirectUrlSnapshot, PasteUrlSnapshot
+from app.database.replicas import use_replica
 from app.database import crud
-from app.services.stats import Stats
+from app.services.stats import Stats, ViewRecord
 
 
 def create(  # pylint: disable=too-many-arguments
     db: SQLAlchemy,
     stats: Stats,
-    url: RedirectUrl | None = None,
-    paste: PasteUrl | None = None,
+    url: RedirectUrl | RedirectUrlSnapshot | None = None,
+    paste: PasteUrl | PasteUrlSnapshot | None = None,
 ) -> UrlView:
     """
-    Adds url view to `url` with passed params
+    Adds url view to `url` with passed params (committed with request transaction).
     :param SQLAlchemy db: database object
     :param Stats stats: Stats DTO
-    :param RedirectUrl|None url: viewed url
-    :param PasteUrl|None paste: viewed paste
+    :param RedirectUrl|RedirectUrlSnapshot|None url: viewed url
+    :param PasteUrl|PasteUrlSnapshot|None paste: viewed paste
     :return: created url view
     :rtype: UrlView
     :raises TypeError: if passed both url
@@ -45,142 +50,174 @@ def create(  # pylint: disable=too-many-arguments
     if (url, paste).count(None) != 1:
         raise TypeError("Pass only url or only paste (not both)!")
 
-    user_agent_object = crud.user_agent.get_or_create(
+    user_agent_id = crud.user_agent.get_or_create_id(
         db=db, user_agent=stats.user_agent
     )
-    referer_object_id = None
+    referer_id = None
     if stats.referer:
-        referer_object = crud.referer.get_or_create(db=db, referer=stats.referer)
-        referer_object_id = referer_object.id
+        referer_id = crud.referer.get_or_create_id(db=db, referer=stats.referer)
 
     url_view = UrlView(
         ip=stats.ip,
-        user_agent_id=user_agent_object.id,
-        url=url,
-        paste=paste,
-        referer_id=referer_object_id,
+        user_agent_id=user_agent_id,
+        url_id=url.id if url else None,
+        paste_id=paste.id if paste else None,
+        referer_id=referer_id,
     )
 
     db.session.add(url_view)
-    db.session.commit()
-    db.session.refresh(url_view)
+    db.session.flush()
+    crud.url_view_daily.add_views(
+        db=db,
+        counts=Counter(
+            [
+                crud.url_view_daily.get_key(
+                    url_view.url_id,
+                    url_view.paste_id,
+                    url_view.created_at,
+                    url_view.referer_id,
+                )
+            ]
+        ),
+    )
 
     return url_view
 
 
-def delete_by_url_id(db: SQLAlchemy, url_id: int) -> None:
+def create_many(db: SQLAlchemy, records: list[ViewRecord]) -> int:
     """
-    Deletes url views with specified url_id.
+    Adds many url views with one multi-row INSERT (committed with request transaction,
+    or by views ingestion that writes buffered views in batches).
     :param SQLAlchemy db: database object
-    :param int url_id: id of short url
+    :param list[ViewRecord] records: views to write
+    :return: count of created url views
+    :rtype: int
     """
-    UrlView.query.filter_by(url_id=url_id).delete()
-    db.session.commit()
+    if not records:
+        return 0
 
+    user_agent_ids = crud.user_agent.get_or_create_ids(
+        db=db, user_agents={record.stats.user_agent for record in records}
+    )
+    referer_ids = crud.referer.get_or_create_ids(
+        db=db,
+        referers={record.stats.referer for record in records if record.stats.referer},
+    )
 
-def delete_by_paste_id(db: SQLAlchemy, paste_id: int) -> None:
-    """
-    Deletes paste url views with specified paste_id.
-    :param SQLAlchemy db: database object
-    :param int paste_id: id of paste url
-    """
-    UrlView.query.filter_by(paste_id=paste_id).delete()
-    db.session.commit()
+    rows = [
+        {
+            "ip": record.stats.ip,
+            "user_agent_id": user_agent_ids[record.stats.user_agent],
+            "referer_id": referer_ids.get(record.stats.referer),
+            "url_id": record.url_id,
+            "paste_id": record.paste_id,
+            "created_at": record.created_at,
+            "updated_at": record.created_at,
+        }
+        for record in records
+    ]
+    db.session.execute(insert(UrlView).values(rows))
+    crud.url_view_daily.add_views(
+        db=db,
+        counts=Counter(
+            crud.url_view_daily.get_key(
+                row["url_id"], row["paste_id"], row["created_at"], row["referer_id"]
+            )
+            for row in rows
+        ),
+    )
+    db.session.flush()
+
+    return len(rows)
 
 
-def get_dates(
+def get_batches(  # pylint: disable=too-many-arguments
     db: SQLAlchemy,
     url_id: int | None = None,
     paste_id: int | None = None,
-    value_as: str = "percent",
-) -> dict[str, int]:
+    owner_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    batch_size: int = 1000,
+) -> Iterator[Sequence[Row]]:
     """
-    Returns url views count or percentage by dates.
+    Yields raw url views (without dimensions values) in batches, oldest first.
+    Views are fetched by server-side cursor, so memory does not depend
+    on count of views.
     :param SQLAlchemy db: database object
-    :param int url_id: id of short url
-    :param int paste_id: id of paste short url
-    :param str value_as: controls how to present value of views. Can be:
-        `percent` - (default) percentage of views. Return value can be from 1 to 100.
-        `number` - number of views.
-    :return: dict like {'23-09-2023': 23, '24-09-2023': 12, ...}
-    :rtype: dict[str, int]
+    :param int|None url_id: only views of this short url
+    :param int|None paste_id: only views of this paste
+    :param int|None owner_id: only views of urls and pastes of this user
+    :param datetime|None since: only views created at this time or later
+    :param datetime|None until: only views created before this time
+    :param int batch_size: count of views in batch
+    :return: batches of rows with id, created_at, ip, user_agent_id, referer_id,
+             url_id and paste_id columns
+    :rtype: Iterator[Sequence[Row]]
     """
-    if (url_id, paste_id).count(None) != 1:
-        raise TypeError("Pass only url_id or only paste_id (not both)!")
-
-    dates = (
-        db.session.query(func.date(UrlView.created_at), func.count())
-        .filter_by(url_id=url_id, paste_id=paste_id)
-        .group_by(func.date(UrlView.created_at))
-        .all()
+    statement = select(
+        UrlView.id,
+        UrlView.created_at,
+        UrlView.ip,
+        UrlView.user_agent_id,
+        UrlView.referer_id,
+        UrlView.url_id,
+        UrlView.paste_id,
     )
-    all_views_count = sum(x[1] for x in dates)
-    if value_as == "percent":
-        formatted_dates = {
-            str(date): _get_percentage(all_views_count, count) for date, count in dates
-        }
-    else:
-        formatted_dates = {str(date): count for date, count in dates}
-
-    return formatted_dates
+    if url_id is not None:
+        statement = statement.where(UrlView.url_id == url_id)
+    if paste_id is not None:
+        statement = statement.where(UrlView.paste_id == paste_id)
+    if owner_id is not None:
+        statement = statement.where(
+            or_(
+                UrlView.url_id.in_(
+                    select(RedirectUrl.id).where(RedirectUrl.owner_id == owner_id)
+                ),
+                UrlView.paste_id.in_(
+                    select(PasteUrl.id).where(PasteUrl.owner_id == owner_id)
+                ),
+            )
+        )
+    if since is not None:
+        statement = statement.where(UrlView.created_at >= since)
+    if until is not None:
+        statement = statement.where(UrlView.created_at < until)
+
+    with use_replica():
+        result = db.session.execute(
+            statement.order_by(UrlView.id).execution_options(yield_per=batch_size)
+        )
+    yield from result.partitions()
 
 
-def get_referers(
-    db: SQLAlchemy,
-    url_id: int | None = None,
-    paste_id: int | None = None,
-    value_as: str = "percent",
-) -> dict[str, int]:
+def delete_by_url_id(db: SQLAlchemy, url_id: int, since: datetime | None = None) -> None:
     """
-    Returns url views count or percentage by referers.
+    Deletes url views with specified url_id.
     :param SQLAlchemy db: database object
-    :param int|None url_id: id of short_url
-    :param int|None paste_id: id of paste url
-    :param str value_as: type of result dict's value. Can be:
-        `percent` - (default) percentage of clicks with referer.
-        Returned value is int and it is limited from 1 to 100.
-        `number` - number of clicks with referer. Returned value is int.
-    :return: dict like {'https://away.vk.com/': 45, ...} with value as specified in `value_as` parameter
-    :rtype: dict[str, int]
+    :param int url_id: id of short url
+    :param datetime|None since: creation time of url (views are never older), so
+                                partitions of older months are not scanned
     """
-    if (url_id, paste_id).count(None) != 1:
-        raise TypeError("Pass only url_id or only paste_id (not both)!")
-
-    # NOTE: Is there a better solution for this query?
-    referers = (
-        db.session.query(Referer.referer_value, func.count())
-        .filter(
-            UrlView.url_id == url_id,
-            UrlView.paste_id == paste_id,
-            UrlView.referer_id == Referer.id,
-        )
-        .group_by(UrlView.referer_id, Referer.referer_value)
-        .all()
-    )
-    all_views_count = UrlView.query.filter_by(url_id=url_id, paste_id=paste_id).count()
-    not_null_referer_views_count = sum(x[1] for x in referers)
-    null_referer_views_count = all_views_count - not_null_referer_views_count
-
-    if value_as == "percent":
-        formatted_referers = {
-            referer: _get_percentage(all_views_count, count)
-            for referer, count in referers
-        }
-    else:
-        formatted_referers = dict(referers)
-
-    if null_referer_views_count > 0:
-        formatted_referers["untracked"] = (
-            _get_percentage(all_views_count, null_referer_views_count)
-            if value_as == "percent"
-            else null_referer_views_count
-        )
+    views = UrlView.query.filter_by(url_id=url_id)
+    if since is not None:
+        views = views.filter(UrlView.created_at >= since)
+    views.delete()
+    crud.url_view_daily.delete_by_url_id(db=db, url_id=url_id)
 
-    return formatted_referers
 
-
-def _get_percentage(whole: int, part: int) -> int:
+def delete_by_paste_id(
+    db: SQLAlchemy, paste_id: int, since: datetime | None = None
+) -> None:
     """
-    Returns the percentage of a part of the whole.
+    Deletes paste url views with specified paste_id.
+    :param SQLAlchemy db: database object
+    :param int paste_id: id of paste url
+    :param datetime|None since: creation time of paste (views are never older), so
+                                partitions of older months are not scanned
     """
-    return round(part / whole * 100)
+    views = UrlView.query.filter_by(paste_id=paste_id)
+    if since is not None:
+        views = views.filter(UrlView.created_at >= since)
+    views.delete()
+    crud.url_view_daily.delete_by_paste_id(db=db, paste_id=paste_id)
@@ -0,0 +1,243 @@
+"""
+    CRUD for UrlViewDaily model (daily views rollups).
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from collections import Counter
+from datetime import date, datetime
+from typing import Any
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Subquery, func, insert, literal_column, select, text
+
+from app.database import partitions
+from app.database.dialects import get_insert
+from app.database.models.referer import Referer
+from app.database.models.url import PasteUrl, RedirectUrl
+from app.database.models.url_view import UrlView
+from app.database.models.url_view_daily import UrlViewDaily
+from app.database.replicas import use_replica
+
+# Key of rollup row: (url_id, paste_id, day, referer_id).
+RollupKey = tuple[int | None, int | None, date, int | None]
+
+
+def get_totals_subquery(
+    model: type[RedirectUrl] | type[PasteUrl], owner_id: int
+) -> Subquery:
+    """
+    Returns subquery of total views counts of all user's urls (or pastes).
+    Urls without views are not returned, so subquery should be outer joined.
+    :param type model: RedirectUrl or PasteUrl
+    :param int owner_id: id of owner
+    :return: subquery with `id` (of url or paste) and `views_count` columns
+    :rtype: Subquery
+    """
+    key = UrlViewDaily.url_id if model is RedirectUrl else UrlViewDaily.paste_id
+    return (
+        select(key.label("id"), func.sum(UrlViewDaily.views_count).label("views_count"))
+        .join(model, model.id == key)
+        .where(model.owner_id == owner_id)
+        .group_by(key)
+        .subquery()
+    )
+
+
+def add_views(db: SQLAlchemy, counts: Counter[RollupKey]) -> None:
+    """
+    Increments rollups counters with one multi-row upsert (INSERT ... ON CONFLICT DO UPDATE).
+    Does not commit, so rollups are written in the same transaction as url views.
+    :param SQLAlchemy db: database object
+    :param Counter[RollupKey] counts: views counts by rollup keys
+    """
+    if not counts:
+        return
+
+    rows = [
+        {
+            "url_id": url_id,
+            "paste_id": paste_id,
+            "day": day,
+            "referer_id": referer_id,
+            "views_count": views_count,
+        }
+        for (url_id, paste_id, day, referer_id), views_count in counts.items()
+    ]
+    statement = get_insert(db)(UrlViewDaily).values(rows)
+    # Conflict target must match expressions of unique index, so zero is not bound.
+    zero = literal_column("0")
+    statement = statement.on_conflict_do_update(
+        index_elements=[
+            func.coalesce(UrlViewDaily.url_id, zero),
+            func.coalesce(UrlViewDaily.paste_id, zero),
+            UrlViewDaily.day,
+            func.coalesce(UrlViewDaily.referer_id, zero),
+        ],
+        set_={"views_count": UrlViewDaily.views_count + statement.excluded.views_count},
+    )
+    db.session.execute(statement)
+
+
+def get_key(
+    url_id: int | None,
+    paste_id: int | None,
+    viewed_at: datetime,
+    referer_id: int | None,
+) -> RollupKey:
+    """
+    Returns rollup key of url view.
+    :rtype: RollupKey
+    """
+    return (url_id, paste_id, viewed_at.date(), referer_id)
+
+
+def rebuild(db: SQLAlchemy, since: date | None = None) -> int:
+    """
+    Recomputes rollups from url views (backfill of existing data or periodic compaction).
+    Rollups table is locked against writes until commit (reads are not blocked),
+    so views written concurrently increment rollups after they are rebuilt
+    and are never counted twice or lost.
+    Views of partitions dropped by retention can't be counted again, so rollups
+    older than the oldest partition are never rebuilt (and are kept).
+    :param SQLAlchemy db: database object
+    :param date|None since: rebuild only rollups from this day
+                            (all rollups of not dropped views when None)
+    :return: count of rollup rows
+    :rtype: int
+    """
+    if partitions.is_partitioned(db):
+        oldest_month = partitions.get_oldest_month(partitions.get_partitions(db))
+        if oldest_month is not None and (since is None or since < oldest_month):
+            since = oldest_month
+
+    view_day = func.date(UrlView.created_at)
+    views = select(
+        UrlView.url_id,
+        UrlView.paste_id,
+        view_day,
+        UrlView.referer_id,
+        func.count(),
+    ).group_by(UrlView.url_id, UrlView.paste_id, view_day, UrlView.referer_id)
+    rollups = UrlViewDaily.query
+    if since is not None:
+        views = views.where(
+            UrlView.created_at >= datetime.combine(since, datetime.min.time())
+        )
+        rollups = rollups.filter(UrlViewDaily.day >= since)
+
+    if db.engine.dialect.name == "postgresql":
+        # Writes of SQLite are serialized by database lock.
+        db.session.execute(
+            text(f"LOCK TABLE {UrlViewDaily.__tablename__} IN EXCLUSIVE MODE")
+        )
+    rollups.delete()
+    result = db.session.execute(
+        insert(UrlViewDaily).from_select(
+            ["url_id", "paste_id", "day", "referer_id", "views_count"], views
+        )
+    )
+    db.session.commit()
+
+    return result.rowcount
+
+
+def delete_by_url_id(db: SQLAlchemy, url_id: int) -> None:
+    """
+    Deletes rollups of short url. Does not commit.
+    :param SQLAlchemy db: database object
+    :param int url_id: id of short url
+    """
+    db.session.query(UrlViewDaily).filter_by(url_id=url_id).delete()
+
+
+def delete_by_paste_id(db: SQLAlchemy, paste_id: int) -> None:
+    """
+    Deletes rollups of paste url. Does not commit.
+    :param SQLAlchemy db: database object
+    :param int paste_id: id of paste url
+    """
+    db.session.query(UrlViewDaily).filter_by(paste_id=paste_id).delete()
+
+
+@use_replica()
+def get_summary(
+    db: SQLAlchemy,
+    url_id: int | None = None,
+    paste_id: int | None = None,
+    referer_views_value_as: str = "percent",
+    dates_views_value_as: str = "percent",
+) -> dict[str, Any]:
+    """
+    Returns total url views count, views by referers and views by dates.
+    All values are computed from one query (one scan of url rollups), grouped by day and referer.
+    :param SQLAlchemy db: database object
+    :param int|None url_id: id of short url
+    :param int|None paste_id: id of paste url
+    :param str referer_views_value_as: `percent` (default) or `number`
+    :param str dates_views_value_as: `percent` (default) or `number`
+    :return: dict like {
+        'total': 100,
+        'by_referers': {'https://away.vk.com/': 45, 'untracked': 55},
+        'by_dates': {'2023-09-23': 23, '2023-09-24': 77},
+    }
+    :rtype: dict[str, Any]
+    """
+    if (url_id, paste_id).count(None) != 1:
+        raise TypeError("Pass only url_id or only paste_id (not both)!")
+
+    rows = (
+        db.session.query(
+            UrlViewDaily.day,
+            Referer.referer_value,
+            func.sum(UrlViewDaily.views_count),
+        )
+        .select_from(UrlViewDaily)
+        .outerjoin(Referer, UrlViewDaily.referer_id == Referer.id)
+        .filter(UrlViewDaily.url_id == url_id, UrlViewDaily.paste_id == paste_id)
+        .group_by(UrlViewDaily.day, UrlViewDaily.referer_id, Referer.referer_value)
+        .all()
+    )
+
+    dates: Counter[str] = Counter()
+    referers: Counter[str] = Counter()
+    untracked_views_count = 0
+    for day, referer, views_count in rows:
+        dates[str(day)] += views_count
+        if referer is None:
+            untracked_views_count += views_count
+        else:
+            referers[referer] += views_count
+
+    by_referers = dict(referers.most_common())
+    if untracked_views_count > 0:
+        by_referers["untracked"] = untracked_views_count
+
+    total = sum(dates.values())
+    return {
+        "total": total,
+        "by_referers": _format_values(by_referers, total, referer_views_value_as),
+        "by_dates": _format_values(
+            dict(sorted(dates.items())), total, dates_views_value_as
+        ),
+    }
+
+
+def _format_values(values: dict[str, int], total: int, value_as: str) -> dict[str, int]:
+    """
+    Returns views by keys as numbers or percentages of all views.
+    """
+    if value_as != "percent":
+        return {key: int(count) for key, count in values.items()}
+    return {key: round(count / total * 100) for key, count in values.items()}
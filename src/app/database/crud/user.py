@@ -35,7 +35,8 @@ def get_or_create(db: SQLAlchemy, user_id: int) -> User:
 
 def create(db: SQLAlchemy, user_id: int) -> User:
     """
-    Creates local User with SSO User's user_id and returns created object.
+    Creates local User with SSO User's user_id and returns created object
+    (committed with request transaction).
     :param SQLAlchemy db: database object
     :param int user_id: SSO User's id
     :rtype: User
@@ -43,8 +44,7 @@ def create(db: SQLAlchemy, user_id: int) -> User:
     user = User(user_id=user_id)
 
     db.session.add(user)
-    db.session.commit()
-    db.session.refresh(user)
+    db.session.flush()
 
     return user
 
@@ -15,26 +15,50 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-
-
 from flask_sqlalchemy import SQLAlchemy
 
+from app.database.crud import dimension
 from app.database.models.user_agent import UserAgent
+from app.services.cache.dimensions import get_dimensions_cache
 
 
-def get_or_create(db: SQLAlchemy, user_agent: str) -> UserAgent:
+def get_or_create_id(db: SQLAlchemy, user_agent: str) -> int:
     """
-    Return UserAgent object if there is one in DB, else create it.
+    Returns id of UserAgent object, creates it if there is no one in DB.
+    Costs no queries if id is cached.
     :param SQLAlchemy db: database object
     :param str user_agent: user agent from `User-Agent` header
-    :return: UserAgent object
-    :rtype: UserAgent
+    :return: id of UserAgent object
+    :rtype: int
+    """
+    return get_or_create_ids(db=db, user_agents={user_agent})[user_agent]
+
+
+def get_or_create_ids(db: SQLAlchemy, user_agents: set[str]) -> dict[str, int]:
+    """
+    Returns ids of UserAgent objects for all passed values, creates missing ones.
+    :param SQLAlchemy db: database object
+    :param set[str] user_agents: user agents from `User-Agent` headers
+    :return: dict like {user_agent: user_agent_id}
+    :rtype: dict[str, int]
+    """
+    return dimension.get_or_create_ids(
+        db=db,
+        model=UserAgent,
+        value_column=UserAgent.user_agent_value,
+        cache=get_dimensions_cache().user_agents,
+        values=user_agents,
+    )
+
+
+def get_values(db: SQLAlchemy, ids: set[int]) -> dict[int, str]:
+    """
+    Returns values of UserAgent objects by their ids.
+    :param SQLAlchemy db: database object
+    :param set[int] ids: ids of UserAgent objects
+    :return: dict like {user_agent_id: user_agent}
+    :rtype: dict[int, str]
     """
-    user_agent_object = UserAgent.query.filter_by(user_agent_value=user_agent).first()
-    if user_agent_object is None:
-        user_agent_object = UserAgent(user_agent_value=user_agent)
-        db.session.add(user_agent_object)
-        db.session.commit()
-        db.session.refresh(user_agent_object)
-
-    return user_agent_object
+    return dimension.get_values(
+        db=db, model=UserAgent, value_column=UserAgent.user_agent_value, ids=ids
+    )
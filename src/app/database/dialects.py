@@ -0,0 +1,32 @@
+"""
+    Database dialect specific statements.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from typing import Callable
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def get_insert(db: SQLAlchemy) -> Callable:
+    """
+    Returns `insert` of database dialect, that supports ON CONFLICT clause.
+    Postgres is used in production, SQLite may be used in tests.
+    :param SQLAlchemy db: database object
+    """
+    if db.engine.dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
@@ -18,11 +18,10 @@
 import re
 from datetime import datetime, timedelta
 
-from hashids import Hashids
-from flask import current_app
 from sqlalchemy.orm import declared_attr
 
 from app.database import db
+from app.services.hashids_codec import get_hashids_codec
 
 
 class CommonMixin:
@@ -58,6 +57,8 @@ class UrlMixin:
         db.DateTime, default=lambda: datetime.utcnow() + timedelta(days=14)
     )
     is_deleted = db.Column(db.Boolean, default=False)
+    # Expired url is swept by expiry sweeper (see crud `tombstone_expired`).
+    is_swept = db.Column(db.Boolean, default=False, server_default=db.false())
     stats_is_public = db.Column(db.Boolean, default=False)
     owner_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=True)
 
@@ -67,8 +68,7 @@ class UrlMixin:
         Returns hash based on model id.
         :rtype: str
         """
-        hashids = Hashids(salt=current_app.config["HASHIDS_SALT"], min_length=6)
-        return hashids.encode(self.id)
+        return get_hashids_codec().encode(self.id)
 
     def is_expired(self) -> bool:
         """
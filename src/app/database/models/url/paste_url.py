@@ -25,6 +25,18 @@ class PasteUrl(db.Model, CommonMixin, TimestampMixin, UrlMixin):
     Shortened URL model with some text content.
     """
 
+    __table_args__ = (
+        # Lists of user's pastes are paginated by id (see crud `get_by_owner_id`).
+        db.Index("ix_paste_urls_owner_id_id", "owner_id", "id"),
+        # Expired pastes are found by sweeper (see crud `tombstone_expired`).
+        db.Index(
+            "ix_paste_urls_expiration_date",
+            "expiration_date",
+            postgresql_where=db.text("is_swept IS NOT true"),
+            sqlite_where=db.text("is_swept IS NOT true"),
+        ),
+    )
+
     content = db.Column(db.String(4096), nullable=False)
     burn_after_read = db.Column(db.Boolean, nullable=False, default=False)
     language = db.Column(db.String, nullable=False, server_default="plain")
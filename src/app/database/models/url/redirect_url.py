@@ -26,6 +26,18 @@ class RedirectUrl(db.Model, CommonMixin, TimestampMixin, UrlMixin):
     Shortened URL model with redirect to external url.
     """
 
+    __table_args__ = (
+        # Lists of user's redirects are paginated by id (see crud `get_by_owner_id`).
+        db.Index("ix_redirect_urls_owner_id_id", "owner_id", "id"),
+        # Expired urls are found by sweeper (see crud `tombstone_expired`).
+        db.Index(
+            "ix_redirect_urls_expiration_date",
+            "expiration_date",
+            postgresql_where=db.text("is_swept IS NOT true"),
+            sqlite_where=db.text("is_swept IS NOT true"),
+        ),
+    )
+
     redirect = db.Column(db.String, nullable=False)
 
     views = db.relationship("UrlView", backref="url", lazy="dynamic", uselist=True)
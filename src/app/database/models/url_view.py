@@ -24,8 +24,16 @@ from app.database.mixins import CommonMixin, TimestampMixin
 class UrlView(db.Model, CommonMixin, TimestampMixin):
     """
     UrlView model class.
+    On PostgreSQL table is partitioned by month of `created_at` (see
+    `app.database.partitions`), its primary key there is (id, created_at).
     """
 
+    __table_args__ = (
+        # Stats are filtered by url (or paste) and grouped by view date.
+        db.Index("ix_url_views_url_id_created_at", "url_id", "created_at"),
+        db.Index("ix_url_views_paste_id_created_at", "paste_id", "created_at"),
+    )
+
     url_id = db.Column(db.Integer, db.ForeignKey("redirect_urls.id"), nullable=True)
     paste_id = db.Column(db.Integer, db.ForeignKey("paste_urls.id"), nullable=True)
     ip = db.Column(db.String(15), nullable=False)
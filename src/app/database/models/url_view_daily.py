@@ -0,0 +1,50 @@
+"""
+    Daily URL views rollup database model.
+    Provides UrlViewDaily class with pre-aggregated views counts for stats.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from sqlalchemy import func
+
+from app.database import db
+from app.database.mixins import CommonMixin
+
+
+class UrlViewDaily(db.Model, CommonMixin):
+    """
+    UrlViewDaily model class.
+    Count of url (or paste) views per day and referer, maintained together with UrlView rows,
+    so stats are computed without scanning all views of url.
+    """
+
+    __tablename__ = "url_view_daily"
+    __table_args__ = (
+        # Nullable columns are coalesced, as NULLs are never equal in unique index.
+        db.Index(
+            "ix_url_view_daily_key",
+            func.coalesce(db.literal_column("url_id"), 0),
+            func.coalesce(db.literal_column("paste_id"), 0),
+            db.literal_column("day"),
+            func.coalesce(db.literal_column("referer_id"), 0),
+            unique=True,
+        ),
+    )
+
+    url_id = db.Column(db.Integer, db.ForeignKey("redirect_urls.id"), nullable=True)
+    paste_id = db.Column(db.Integer, db.ForeignKey("paste_urls.id"), nullable=True)
+    day = db.Column(db.Date, nullable=False)
+    referer_id = db.Column(db.Integer, db.ForeignKey("referers.id"), nullable=True)
+    views_count = db.Column(db.Integer, nullable=False, default=0)
@@ -26,6 +26,8 @@ class UserAgent(db.Model, CommonMixin):
     """
 
     user_agent_value = db.Column(db.String(4096), nullable=False)
+    # sha256 of value, unique key of value (value itself is too long for unique index).
+    value_digest = db.Column(db.String(64), nullable=False, unique=True)
     url_views = db.relationship(
         "UrlView", backref="user_agent", lazy="dynamic", uselist=True
     )
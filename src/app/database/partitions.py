@@ -0,0 +1,230 @@
+"""
+    Monthly range partitions of url views table (PostgreSQL).
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+import re
+from datetime import date
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLE = "url_views"
+DEFAULT_PARTITION = f"{PARTITIONED_TABLE}_default"
+PARTITION_NAME_PATTERN = re.compile(rf"^{PARTITIONED_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """
+    Returns first day of month shifted by count of months (may be negative).
+    :rtype: date
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def get_partition_name(month: date) -> str:
+    """
+    Returns name of partition with views of month.
+    :rtype: str
+    """
+    return f"{PARTITIONED_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def get_partition_month(name: str) -> date | None:
+    """
+    Returns first day of month of partition by its name.
+    :rtype: date | None
+    :return: None for partitions not named by `get_partition_name` (e.g. default one)
+    """
+    match = PARTITION_NAME_PATTERN.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def get_oldest_month(names: list[str]) -> date | None:
+    """
+    Returns first day of month of the oldest monthly partition
+    (views of older months are dropped by retention).
+    :param list[str] names: names of partitions
+    :rtype: date | None
+    :return: None if there are no monthly partitions
+    """
+    months = (get_partition_month(name) for name in names)
+    return min((month for month in months if month is not None), default=None)
+
+
+def get_expired_partitions(
+    names: list[str], retention_months: int, today: date
+) -> list[str]:
+    """
+    Returns partitions with views older than retention window, oldest first.
+    Current month is never expired, so retention of 1 month keeps current
+    and previous months.
+    :param list[str] names: names of partitions
+    :param int retention_months: count of full months to keep
+    :param date today: current date
+    :rtype: list[str]
+    """
+    oldest_kept_month = add_months(today.replace(day=1), -retention_months)
+    months = {name: get_partition_month(name) for name in names}
+    return sorted(
+        (
+            name
+            for name, month in months.items()
+            if month is not None and month < oldest_kept_month
+        ),
+        key=months.get,
+    )
+
+
+def is_partitioned(db: SQLAlchemy) -> bool:
+    """
+    Returns True if url views table is partitioned (PostgreSQL after migration).
+    :rtype: bool
+    """
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return bool(
+        db.session.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"
+            ),
+            {"table": PARTITIONED_TABLE},
+        ).scalar()
+    )
+
+
+def get_partitions(db: SQLAlchemy) -> list[str]:
+    """
+    Returns names of partitions of url views table.
+    :param SQLAlchemy db: database object
+    :rtype: list[str]
+    """
+    return list(
+        db.session.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+            ),
+            {"table": PARTITIONED_TABLE},
+        ).scalars()
+    )
+
+
+def create_partitions(db: SQLAlchemy, months_ahead: int, today: date) -> list[str]:
+    """
+    Creates partitions for current month and months ahead (if they do not exist),
+    so new views are never written to default partition.
+    Every partition is committed separately: partition that can't be created
+    is logged and skipped, so it does not abort next ones.
+    :param SQLAlchemy db: database object
+    :param int months_ahead: count of future months to create partitions for
+    :param date today: current date
+    :return: names of created partitions
+    :rtype: list[str]
+    """
+    existing = set(get_partitions(db))
+    has_default = DEFAULT_PARTITION in existing
+    created = []
+    for months in range(months_ahead + 1):
+        month = add_months(today.replace(day=1), months)
+        name = get_partition_name(month)
+        if name in existing:
+            continue
+        try:
+            _create_partition(db, name, month, has_default=has_default)
+            db.session.commit()
+        except DBAPIError:
+            db.session.rollback()
+            logger.exception("Unable to create partition %s, skipping!", name)
+            continue
+        created.append(name)
+    return created
+
+
+def _create_partition(
+    db: SQLAlchemy, name: str, month: date, has_default: bool
+) -> None:
+    """
+    Creates partition of month. PostgreSQL rejects partition if default one
+    has views of its month, so then default partition is detached, views are
+    moved to created partition and default one is attached back
+    (in the same transaction, url views are locked until commit).
+    """
+    bounds = {"since": month, "until": add_months(month, 1)}
+    create_statement = text(
+        f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') "
+        f"TO ('{add_months(month, 1).isoformat()}')"
+    )
+    in_month = "created_at >= :since AND created_at < :until"
+    if not has_default or not db.session.execute(
+        text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month} LIMIT 1"), bounds
+    ).scalar():
+        db.session.execute(create_statement)
+        return
+
+    logger.warning("Moving views of %s from default partition.", name)
+    db.session.execute(
+        text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+    )
+    db.session.execute(create_statement)
+    db.session.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_month} "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ),
+        bounds,
+    )
+    db.session.execute(
+        text(
+            f"ALTER TABLE {PARTITIONED_TABLE} "
+            f"ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"
+        )
+    )
+
+
+def drop_expired_partitions(
+    db: SQLAlchemy, retention_months: int, today: date, detach_only: bool = False
+) -> list[str]:
+    """
+    Detaches and drops partitions with views older than retention window.
+    Whole partitions are dropped, so it is cheap unlike DELETE of old views.
+    Daily rollups are kept, so stats of old views are not lost.
+    :param SQLAlchemy db: database object
+    :param int retention_months: count of full months to keep
+    :param date today: current date
+    :param bool detach_only: only detach partitions (keep tables, e.g. to archive them)
+    :return: names of detached (dropped) partitions
+    :rtype: list[str]
+    """
+    expired = get_expired_partitions(get_partitions(db), retention_months, today)
+    for name in expired:
+        db.session.execute(
+            text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}")
+        )
+        if not detach_only:
+            db.session.execute(text(f"DROP TABLE {name}"))
+        # Every partition is committed separately, so locks are short.
+        db.session.commit()
+    return expired
@@ -0,0 +1,167 @@
+"""
+    Database connections pools with checkout metrics and engine options.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import threading
+import time
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection, QueuePool
+
+
+class PoolMetrics:
+    """
+    Counters of connections checkouts from pool.
+    """
+
+    def __init__(self) -> None:
+        self.checkouts_count = 0
+        self.timeouts_count = 0
+        self.checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_checkout(self, seconds: float, timed_out: bool = False) -> None:
+        """
+        Records checkout of connection.
+        :param float seconds: time waited for connection (with connecting and pre-ping)
+        :param bool timed_out: True if there was no free connection until pool timeout
+        """
+        with self._lock:
+            self.checkouts_count += 1
+            self.timeouts_count += timed_out
+            self.checkout_time += seconds
+            self.max_checkout_time = max(self.max_checkout_time, seconds)
+
+
+class MeteredPoolMixin:
+    """
+    Mixin of queue pool that measures checkouts of connections.
+    """
+
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self) -> PoolProxiedConnection:
+        """
+        Checks out connection from pool, recording time waited for it.
+        :rtype: PoolProxiedConnection
+        """
+        started_at = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.add_checkout(time.perf_counter() - started_at, timed_out=True)
+            raise
+        self.metrics.add_checkout(time.perf_counter() - started_at)
+        return connection
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    """
+    Pool of sync engine with checkout metrics.
+    """
+
+
+class MeteredAsyncQueuePool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    """
+    Pool of async engine with checkout metrics.
+    """
+
+
+def get_pool_stats(engine: Engine) -> dict[str, Any]:
+    """
+    Returns pool saturation (checked out connections of max count) and checkout latency
+    metrics, times are in milliseconds.
+    :param Engine engine: sync engine (or `sync_engine` of async engine)
+    :rtype: dict[str, Any]
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+
+    # pylint: disable=protected-access
+    max_connections = pool.size() + max(pool._max_overflow, 0)
+    stats: dict[str, Any] = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "saturation": pool.checkedout() / max_connections if max_connections else 0,
+    }
+    if isinstance(pool, MeteredPoolMixin):
+        metrics = pool.metrics
+        checkouts_count = metrics.checkouts_count or 1
+        stats.update(
+            {
+                "checkouts": metrics.checkouts_count,
+                "timeouts": metrics.timeouts_count,
+                "avg_checkout_time_ms": metrics.checkout_time / checkouts_count * 1000,
+                "max_checkout_time_ms": metrics.max_checkout_time * 1000,
+            }
+        )
+    return stats
+
+
+def get_engine_options(
+    config: dict[str, Any], is_async: bool = False
+) -> dict[str, Any]:
+    """
+    Returns options of database engine (pool and driver) from config.
+    :param dict[str, Any] config: app config
+    :param bool is_async: options for async engine (see `app.database.async_core`)
+    :rtype: dict[str, Any]
+    """
+    if make_url(config["SQLALCHEMY_DATABASE_URI"]).get_backend_name() == "sqlite":
+        # SQLite (tests) is used with default pool.
+        return {}
+
+    prefix = "ASYNC_DATABASE" if is_async else "DATABASE"
+    pgbouncer_mode = config["DATABASE_PGBOUNCER_MODE"]
+    options: dict[str, Any] = {
+        "poolclass": MeteredAsyncQueuePool if is_async else MeteredQueuePool,
+        "pool_size": config[f"{prefix}_POOL_SIZE"],
+        "max_overflow": config[f"{prefix}_MAX_OVERFLOW"],
+        "pool_timeout": config["DATABASE_POOL_TIMEOUT"],
+        "pool_recycle": config["DATABASE_POOL_RECYCLE"],
+        # PgBouncer closes idle server connections, so they are checked before use.
+        "pool_pre_ping": config["DATABASE_POOL_PRE_PING"] or pgbouncer_mode,
+    }
+    if is_async:
+        # Prepared statements (asyncpg caches them per connection) are bound to server
+        # connection, which is changed by PgBouncer in transaction pooling mode.
+        statement_cache_size = config["DATABASE_STATEMENT_CACHE_SIZE"]
+        if pgbouncer_mode:
+            statement_cache_size = 0
+        options["connect_args"] = {
+            "statement_cache_size": statement_cache_size,
+            "prepared_statement_cache_size": statement_cache_size,
+        }
+        if pgbouncer_mode:
+            # Server connections are shared by clients, so names of statements
+            # (still prepared for every query) must be unique.
+            options["connect_args"]["prepared_statement_name_func"] = _get_name
+    return options
+
+
+def _get_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
@@ -0,0 +1,246 @@
+"""
+    Routing of read-only queries to database replica.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from flask import Flask, Response, current_app, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.database.pool import get_engine_options
+
+# Keys of session info (session lives as long as app context, e.g. request).
+USE_REPLICA = "use_replica"
+PINNED_TO_PRIMARY = "pinned_to_primary"
+HAS_WRITES = "has_writes"
+
+# Methods that do not modify data (but may write url views).
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Cookie of client that made writes, its next requests read primary until it expires.
+PIN_COOKIE = "cc-api-primary"
+
+# Replication lag of PostgreSQL standby (zero if all received WAL is replayed).
+POSTGRESQL_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+
+class ReplicaRouter:
+    """
+    Holds engine of database replica and decides whether it may serve reads:
+    replica is not used while it lags more than `max_lag` seconds or is not available.
+    Lag is checked at most once per `check_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_lag: float,
+        check_interval: float = 5.0,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param Engine engine: engine of replica
+        :param float max_lag: max replication lag in seconds
+        :param float check_interval: seconds between checks of lag
+        :param Callable timer: clock (for tests)
+        """
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._checked_at: float | None = None
+        self.is_available = False
+        self.lag: float | None = None
+        self.reads_count = 0
+        self.fallbacks_count = 0
+        self.check_errors_count = 0
+
+    def get_engine(self) -> Engine | None:
+        """
+        Returns engine of replica for read, or None if read should fall back to primary.
+        :rtype: Engine | None
+        """
+        now = self._timer()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            # Only one thread checks lag, others use previous result.
+            if self._lock.acquire(blocking=self._checked_at is None):
+                try:
+                    self._check()
+                    self._checked_at = now
+                finally:
+                    self._lock.release()
+
+        if not self.is_available:
+            self.fallbacks_count += 1
+            return None
+        self.reads_count += 1
+        return self.engine
+
+    def _check(self) -> None:
+        """
+        Updates lag and availability of replica.
+        """
+        try:
+            self.lag = self._get_lag()
+        except exc.SQLAlchemyError as e:
+            current_app.logger.warning("Database replica is not available: %s", e)
+            self.check_errors_count += 1
+            self.lag = None
+            self.is_available = False
+            return
+        self.is_available = self.lag <= self.max_lag
+
+    def _get_lag(self) -> float:
+        """
+        Returns replication lag in seconds (other databases are just pinged).
+        :rtype: float
+        """
+        with self.engine.connect() as connection:
+            if self.engine.dialect.name != "postgresql":
+                connection.execute(text("SELECT 1"))
+                return 0.0
+            return float(connection.scalar(POSTGRESQL_LAG_QUERY))
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Returns state of replica and counters of reads routed to it (or to primary).
+        :rtype: dict[str, Any]
+        """
+        return {
+            "available": self.is_available,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "reads": self.reads_count,
+            "fallbacks": self.fallbacks_count,
+            "check_errors": self.check_errors_count,
+        }
+
+
+class RoutingSession(Session):
+    """
+    Session that executes reads marked with `use_replica` on replica (if configured).
+    Session is pinned to primary after any write, so the rest of request reads its
+    own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info[PINNED_TO_PRIMARY] = True
+                self.info[HAS_WRITES] = True
+            elif self.info.get(USE_REPLICA) and not self.info.get(PINNED_TO_PRIMARY):
+                router = get_replica_router()
+                replica = router.get_engine() if router is not None else None
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def use_replica() -> Iterator[None]:
+    """
+    Routes reads of current session to replica (used as context manager or decorator
+    of read-only CRUD functions). Does nothing without replica or app context.
+    """
+    if not has_app_context():
+        yield
+        return
+    info = current_app.extensions["sqlalchemy"].session.info
+    previous = info.get(USE_REPLICA, False)
+    info[USE_REPLICA] = True
+    try:
+        yield
+    finally:
+        info[USE_REPLICA] = previous
+
+
+def pin_to_primary() -> None:
+    """
+    Routes all queries of current session (request) to primary.
+    """
+    current_app.extensions["sqlalchemy"].session.info[PINNED_TO_PRIMARY] = True
+
+
+def _pin_request() -> None:
+    """
+    Pins requests that modify data to primary, so they never read stale rows,
+    and requests of client that made writes recently, so it reads its writes.
+    """
+    is_unsafe = request.method not in SAFE_METHODS
+    if is_unsafe or PIN_COOKIE in request.cookies:
+        pin_to_primary()
+
+
+def _set_pin_cookie(response: Response) -> Response:
+    """
+    Pins next requests of client to primary after writes, until replica catches up
+    (writes of failed requests are rolled back). Writes of safe requests are url views
+    and rollups, which client does not read back, so they do not pin it (and responses
+    like redirects of short urls stay cacheable).
+    """
+    router = get_replica_router()
+    if router is None or response.status_code >= 400:
+        return response
+    if request.method in SAFE_METHODS:
+        return response
+    if current_app.extensions["sqlalchemy"].session.info.get(HAS_WRITES):
+        response.set_cookie(
+            PIN_COOKIE,
+            "1",
+            max_age=max(1, math.ceil(router.max_lag)),
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates replica router for the app if replica is configured.
+    """
+    app.before_request(_pin_request)
+    app.after_request(_set_pin_cookie)
+    dsn = app.config["DATABASE_REPLICA_DSN"]
+    if not dsn:
+        return
+    engine = create_engine(
+        dsn, **get_engine_options({**app.config, "SQLALCHEMY_DATABASE_URI": dsn})
+    )
+    app.extensions["database_replica"] = ReplicaRouter(
+        engine,
+        max_lag=app.config["DATABASE_REPLICA_MAX_LAG"],
+        check_interval=app.config["DATABASE_REPLICA_CHECK_INTERVAL"],
+    )
+
+
+def get_replica_router() -> ReplicaRouter | None:
+    """
+    Returns replica router of current app (None if replica is not configured).
+    :rtype: ReplicaRouter | None
+    """
+    return current_app.extensions.get("database_replica")
@@ -0,0 +1,125 @@
+"""
+    Immutable snapshots of short url models, safe to be cached between requests.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any
+
+from app.database.models.url import RedirectUrl, PasteUrl
+from app.services.hashids_codec import get_hashids_codec
+
+
+@dataclass(frozen=True)
+class UrlSnapshot:
+    """
+    Common fields of short url (see UrlMixin).
+    """
+
+    id: int  # pylint: disable=invalid-name
+    expiration_date: datetime
+    is_deleted: bool
+    stats_is_public: bool
+    owner_id: int | None
+
+    @property
+    def hash(self) -> str:  # pylint: disable=redefined-builtin
+        """
+        Returns hash based on model id.
+        :rtype: str
+        """
+        return get_hashids_codec().encode(self.id)
+
+    def is_expired(self) -> bool:
+        """
+        Checks if url is expired.
+        :rtype: bool
+        """
+        return self.expiration_date <= datetime.now()
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns JSON-serializable dict with snapshot data.
+        :rtype: dict[str, Any]
+        """
+        data = asdict(self)
+        data["expiration_date"] = self.expiration_date.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "UrlSnapshot":
+        """
+        Builds snapshot from dict returned by `to_dict`.
+        :rtype: UrlSnapshot
+        """
+        return cls(
+            **{
+                **data,
+                "expiration_date": datetime.fromisoformat(data["expiration_date"]),
+            }
+        )
+
+
+@dataclass(frozen=True)
+class RedirectUrlSnapshot(UrlSnapshot):
+    """
+    Snapshot of RedirectUrl.
+    """
+
+    redirect: str
+
+    @classmethod
+    def from_model(cls, url: RedirectUrl) -> "RedirectUrlSnapshot":
+        """
+        Builds snapshot from database model.
+        :rtype: RedirectUrlSnapshot
+        """
+        return cls(
+            id=url.id,
+            expiration_date=url.expiration_date,
+            is_deleted=url.is_deleted,
+            stats_is_public=url.stats_is_public,
+            owner_id=url.owner_id,
+            redirect=url.redirect,
+        )
+
+
+@dataclass(frozen=True)
+class PasteUrlSnapshot(UrlSnapshot):
+    """
+    Snapshot of PasteUrl.
+    """
+
+    content: str
+    language: str
+    burn_after_read: bool
+
+    @classmethod
+    def from_model(cls, url: PasteUrl) -> "PasteUrlSnapshot":
+        """
+        Builds snapshot from database model.
+        :rtype: PasteUrlSnapshot
+        """
+        return cls(
+            id=url.id,
+            expiration_date=url.expiration_date,
+            is_deleted=url.is_deleted,
+            stats_is_public=url.stats_is_public,
+            owner_id=url.owner_id,
+            content=url.content,
+            language=url.language,
+            burn_after_read=url.burn_after_read,
+        )
@@ -0,0 +1,102 @@
+"""
+    Request transaction: all writes of request are committed once.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from typing import Callable
+
+from flask import Flask, Response, current_app
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database.replicas import RoutingSession
+
+# Key of session info with callbacks waiting for commit.
+ON_COMMIT = "on_commit"
+
+
+def on_commit(db: SQLAlchemy, callback: Callable[[], None]) -> None:
+    """
+    Runs callback after current transaction is committed (it is dropped on rollback).
+    Used for side effects that must not see uncommitted rows (e.g. caches).
+    :param SQLAlchemy db: database object
+    :param Callable[[], None] callback: function without arguments
+    """
+    db.session.info.setdefault(ON_COMMIT, []).append(callback)
+
+
+def on_commit_async(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Async version of `on_commit`: callback is run after `commit_async` of session.
+    :param AsyncSession session: async database session
+    :param Callable[[], None] callback: function without arguments
+    """
+    session.info.setdefault(ON_COMMIT, []).append(callback)
+
+
+async def commit_async(session: AsyncSession) -> None:
+    """
+    Commits async session (once per request, see `app.asgi`), then runs its
+    callbacks in thread, as they may block (e.g. shared cache invalidations).
+    :param AsyncSession session: async database session
+    """
+    await session.commit()
+    callbacks = session.info.pop(ON_COMMIT, [])
+    if callbacks:
+        await asyncio.to_thread(lambda: [callback() for callback in callbacks])
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _run_on_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop(ON_COMMIT, []):
+        callback()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _drop_on_commit_callbacks(session: Session) -> None:
+    session.info.pop(ON_COMMIT, None)
+
+
+def _commit_request(response: Response) -> Response:
+    """
+    Commits writes of request (CRUD functions only flush them) before response is
+    sent, so failed commit is returned as error. Writes of failed requests are
+    rolled back.
+    """
+    session = current_app.extensions["sqlalchemy"].session
+    if response.status_code < 400:
+        session.commit()
+    else:
+        session.rollback()
+    return response
+
+
+def _rollback_request(error: BaseException | None) -> None:
+    """
+    Rolls back writes of request if it is failed by unhandled exception.
+    """
+    if error is not None:
+        current_app.extensions["sqlalchemy"].session.rollback()
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Makes requests commit their writes once, at the end of request.
+    """
+    app.after_request(_commit_request)
+    app.teardown_request(_rollback_request)
@@ -20,38 +20,86 @@ from typing import Any
 from flask import url_for
 
 from app.database.models.url import PasteUrl
+from app.database.snapshots import PasteUrlSnapshot
+from app.services.hashids_codec import get_hashids_codec
+
+
+# Fields of serialized paste and columns required for them (for fields projection).
+PASTE_FIELDS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "hash": ("id",),
+    "text": ("content",),
+    "language": ("language",),
+    "expires_at": ("expiration_date",),
+    "is_expired": ("expiration_date",),
+    "stats_is_public": ("stats_is_public",),
+    "burn_after_read": ("burn_after_read",),
+    "is_deleted": ("is_deleted",),
+}
+
+
+def get_paste_columns(fields: set[str] | None) -> set[str] | None:
+    """
+    Returns columns required to serialize fields.
+    :param set[str]|None fields: serialized fields, None for all fields
+    :rtype: set[str] | None
+    :return: column names, None for all columns
+    """
+    if fields is None:
+        return None
+    return {column for field in fields for column in PASTE_FIELDS[field]}
 
 
 def serialize_paste(
-    url: PasteUrl, *, include_stats: bool = False, in_list: bool = False
+    url: PasteUrl | PasteUrlSnapshot,
+    *,
+    include_stats: bool = False,
+    in_list: bool = False,
+    url_hash: str | None = None,
+    fields: set[str] | None = None,
 ) -> dict[str, Any]:
     """
     Serializes PasteUrl object to dict for the response.
+    :param str|None url_hash: already encoded hash of paste, encoded here if not passed
+    :param set[str]|None fields: serialize only these fields (see PASTE_FIELDS),
+                                 other columns may be not loaded
     """
-    serialized_url = {
-        "id": url.id,
-        "hash": url.hash,
-        "text": url.content,
-        "language": url.language,
-        "expires_at": url.expiration_date.timestamp(),
-        "is_expired": url.is_expired(),
-        "stats_is_public": url.stats_is_public,
-        "burn_after_read": url.burn_after_read,
-        "is_deleted": url.is_deleted,
-        "_links": {},
-    }
+    if fields is None:
+        fields = PASTE_FIELDS.keys()
+    if url_hash is None:
+        url_hash = url.hash
+
+    serialized_url = {}
+    if "id" in fields:
+        serialized_url["id"] = url.id
+    if "hash" in fields:
+        serialized_url["hash"] = url_hash
+    if "text" in fields:
+        serialized_url["text"] = url.content
+    if "language" in fields:
+        serialized_url["language"] = url.language
+    if "expires_at" in fields:
+        serialized_url["expires_at"] = url.expiration_date.timestamp()
+    if "is_expired" in fields:
+        serialized_url["is_expired"] = url.is_expired()
+    if "stats_is_public" in fields:
+        serialized_url["stats_is_public"] = url.stats_is_public
+    if "burn_after_read" in fields:
+        serialized_url["burn_after_read"] = url.burn_after_read
+    if "is_deleted" in fields:
+        serialized_url["is_deleted"] = url.is_deleted
 
     if include_stats:
-        serialized_url["_links"]["stats"] = {
-            "href": url_for(
-                "pastes.paste_stats",
-                url_hash=url.hash,
-                _external=True,
-                _scheme="https",
-            )
+        serialized_url["_links"] = {
+            "stats": {
+                "href": url_for(
+                    "pastes.get_paste_stats",
+                    url_hash=url_hash,
+                    _external=True,
+                    _scheme="https",
+                )
+            }
         }
-    else:
-        serialized_url.pop("_links")
 
     if in_list:
         return serialized_url
@@ -62,17 +110,23 @@ def serialize_paste(
 def serialize_pastes(
     urls: list[PasteUrl],
     include_stats: bool = False,
+    fields: set[str] | None = None,
 ) -> dict[str, Any]:
     """
     Serializes list of PasteUrl objects to dict for the response.
+    :param set[str]|None fields: serialize only these fields (see PASTE_FIELDS)
     """
+    urls = list(urls)
+    url_hashes = get_hashids_codec().encode_many(url.id for url in urls)
     return {
         "pastes": [
             serialize_paste(
                 url,
                 in_list=True,
                 include_stats=include_stats,
+                url_hash=url_hash,
+                fields=fields,
             )
-            for url in urls
+            for url, url_hash in zip(urls, url_hashes)
         ]
     }
@@ -20,38 +20,83 @@ from typing import Any
 from flask import url_for, current_app
 
 from app.database.models.url import RedirectUrl
+from app.database.snapshots import RedirectUrlSnapshot
+from app.services.hashids_codec import get_hashids_codec
+
+
+# Fields of serialized url and columns required for them (for fields projection).
+URL_FIELDS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "redirect_url": ("redirect",),
+    "hash": ("id",),
+    "expires_at": ("expiration_date",),
+    "is_expired": ("expiration_date",),
+    "stats_is_public": ("stats_is_public",),
+    "is_deleted": ("is_deleted",),
+    "_links": ("id",),
+}
+
+
+def get_url_columns(fields: set[str] | None) -> set[str] | None:
+    """
+    Returns columns required to serialize fields.
+    :param set[str]|None fields: serialized fields, None for all fields
+    :rtype: set[str] | None
+    :return: column names, None for all columns
+    """
+    if fields is None:
+        return None
+    return {column for field in fields for column in URL_FIELDS[field]}
 
 
 def serialize_url(
-    url: RedirectUrl, *, include_stats=False, in_list: bool = False
+    url: RedirectUrl | RedirectUrlSnapshot,
+    *,
+    include_stats=False,
+    in_list: bool = False,
+    url_hash: str | None = None,
+    fields: set[str] | None = None,
 ) -> dict[str, Any]:
     """
     Serializes url object to dict for the response.
+    :param str|None url_hash: already encoded hash of url, encoded here if not passed
+    :param set[str]|None fields: serialize only these fields (see URL_FIELDS),
+                                 other columns may be not loaded
     """
-    API_SCHEME = current_app.config["API_SCHEME"]
-    API_HOSTNAME = current_app.config["API_HOSTNAME"]
-    QR_PATH = url_for("urls.generate_qr_code_for_url", url_hash=url.hash)
-    STATS_PATH = url_for("urls.get_short_url_stats", url_hash=url.hash)
-
-    serialized_url = {
-        "id": url.id,
-        "redirect_url": url.redirect,
-        "hash": url.hash,
-        "expires_at": url.expiration_date.timestamp(),
-        "is_expired": url.is_expired(),
-        "stats_is_public": url.stats_is_public,
-        "is_deleted": url.is_deleted,
-        "_links": {
+    if fields is None:
+        fields = URL_FIELDS.keys()
+    if url_hash is None:
+        url_hash = url.hash
+
+    serialized_url = {}
+    if "id" in fields:
+        serialized_url["id"] = url.id
+    if "redirect_url" in fields:
+        serialized_url["redirect_url"] = url.redirect
+    if "hash" in fields:
+        serialized_url["hash"] = url_hash
+    if "expires_at" in fields:
+        serialized_url["expires_at"] = url.expiration_date.timestamp()
+    if "is_expired" in fields:
+        serialized_url["is_expired"] = url.is_expired()
+    if "stats_is_public" in fields:
+        serialized_url["stats_is_public"] = url.stats_is_public
+    if "is_deleted" in fields:
+        serialized_url["is_deleted"] = url.is_deleted
+    if "_links" in fields:
+        API_SCHEME = current_app.config["API_SCHEME"]
+        API_HOSTNAME = current_app.config["API_HOSTNAME"]
+        QR_PATH = url_for("urls.generate_qr_code_for_url", url_hash=url_hash)
+        serialized_url["_links"] = {
             "qr": {
                 "href": f"{API_SCHEME}://{API_HOSTNAME}{QR_PATH}",
             },
-        },
-    }
-
-    if include_stats:
-        serialized_url["_links"]["stats"] = {
-            "href": f"{API_SCHEME}://{API_HOSTNAME}{STATS_PATH}"
         }
+        if include_stats:
+            STATS_PATH = url_for("urls.get_short_url_stats", url_hash=url_hash)
+            serialized_url["_links"]["stats"] = {
+                "href": f"{API_SCHEME}://{API_HOSTNAME}{STATS_PATH}"
+            }
 
     if in_list:
         return serialized_url
@@ -63,17 +108,23 @@ def serialize_urls(
     urls: list[RedirectUrl],
     *,
     include_stats: bool = False,
+    fields: set[str] | None = None,
 ) -> dict[str, Any]:
     """
     Serializes list of urls objects to dict for the response.
+    :param set[str]|None fields: serialize only these fields (see URL_FIELDS)
     """
+    urls = list(urls)
+    url_hashes = get_hashids_codec().encode_many(url.id for url in urls)
     return {
         "urls": [
             serialize_url(
                 url,
                 include_stats=include_stats,
                 in_list=True,
+                url_hash=url_hash,
+                fields=fields,
             )
-            for url in urls
+            for url, url_hash in zip(urls, url_hashes)
         ]
     }
@@ -19,17 +19,18 @@
 from typing import Any
 
 from app.database.models.url import RedirectUrl
+from app.database.snapshots import RedirectUrlSnapshot
 from app.database import crud, db
 
 
 def serialize_url_stats(
-    url: RedirectUrl,
+    url: RedirectUrl | RedirectUrlSnapshot,
     referer_views_value_as: str = "percent",
     dates_views_value_as: str = "percent",
 ) -> dict[str, Any]:
     """
     Serialize url stats into response dictionary (json).
-    :param RedirectUrl url: url object
+    :param RedirectUrl|RedirectUrlSnapshot url: url object
     :param str referer_views_value_as: how to represent views by referers.
         Accepted values: 'percent', 'number'
         Defaults to: 'percent'
@@ -39,25 +40,21 @@ def serialize_url_stats(
     :return: json dictionary
     :rtype: dict[str, Any]
     """
-    referers = crud.url_view.get_referers(
+    summary = crud.url_view_daily.get_summary(
         db=db,
         url_id=url.id,
-        value_as=referer_views_value_as,
-    )
-    dates = crud.url_view.get_dates(
-        db=db,
-        url_id=url.id,
-        value_as=dates_views_value_as,
+        referer_views_value_as=referer_views_value_as,
+        dates_views_value_as=dates_views_value_as,
     )
 
     response = {
         "views": {
-            "total": url.views.count(),
+            "total": summary["total"],
         },
     }
-    if referers:
-        response["views"]["by_referers"] = referers
-    if dates:
-        response["views"]["by_dates"] = dates
+    if summary["by_referers"]:
+        response["views"]["by_referers"] = summary["by_referers"]
+    if summary["by_dates"]:
+        response["views"]["by_dates"] = summary["by_dates"]
 
     return response
@@ -16,9 +16,10 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 import json
+from typing import Iterable
 
 
-from flask import Response, jsonify, make_response
+from flask import Response, jsonify, make_response, stream_with_context
 
 from app.services.api.errors import ApiErrorCode
 from app.services.api.version import API_VERSION
@@ -32,23 +33,16 @@ def api_error(
 ) -> Response:
     """Returns API error response."""
 
-    if data is None:
-        data = {}
     if headers is None:
         headers = {}
 
-    code, status = api_code.value
+    _, status = api_code.value
 
     response = make_response(
         json.dumps(
             {
                 "v": API_VERSION,
-                "error": {
-                    "message": message,
-                    "code": code,
-                    "status": status,
-                    **data,
-                },
+                **serialize_api_error(api_code, message, data),
             }
         )
     )
@@ -59,6 +53,37 @@ def api_error(
     return response
 
 
+def serialize_api_error(
+    api_code: ApiErrorCode, message: str = "", data: dict | None = None
+) -> dict:
+    """Returns API error body (also used for failed items of batch methods)."""
+    if data is None:
+        data = {}
+
+    code, status = api_code.value
+    return {
+        "error": {
+            "message": message,
+            "code": code,
+            "status": status,
+            **data,
+        },
+    }
+
+
 def api_success(data: dict, *, http_status: int = 200) -> tuple[Response, int]:
     """Returns API success response."""
     return jsonify({"v": API_VERSION, "success": data}), http_status
+
+
+def api_ndjson_stream(items: Iterable[dict]) -> Response:
+    """
+    Returns streamed response with newline-delimited JSON (one item per line).
+    Items are serialized while response is sent, so they are never all in memory.
+    """
+
+    def generate():
+        for item in items:
+            yield json.dumps(item) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
@@ -0,0 +1,54 @@
+"""
+    Caches for short urls resolution, views dimensions and SSO tokens.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from flask import Flask
+
+from app.services.cache.lru import LruTtlCache
+from app.services.cache.backends import (
+    CacheBackend,
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    create_cache_backend,
+)
+from app.services.cache import url, dimensions, tokens
+from app.services.cache.url import UrlCache, get_url_cache
+from app.services.cache.dimensions import DimensionsCache, get_dimensions_cache
+from app.services.cache.tokens import TokenCache, get_token_cache
+
+__all__ = [
+    "LruTtlCache",
+    "CacheBackend",
+    "MemoryCacheBackend",
+    "RedisCacheBackend",
+    "create_cache_backend",
+    "UrlCache",
+    "init_with_app",
+    "get_url_cache",
+    "DimensionsCache",
+    "get_dimensions_cache",
+    "TokenCache",
+    "get_token_cache",
+]
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates caches for the app.
+    """
+    url.init_with_app(app)
+    dimensions.init_with_app(app)
+    tokens.init_with_app(app)
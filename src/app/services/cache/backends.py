@@ -0,0 +1,231 @@
+"""
+    Shared cache backends (second level cache, shared by all workers and nodes).
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Callback that receives published message.
+MessageHandler = Callable[[str], None]
+
+
+class CacheBackend(ABC):
+    """
+    Key-value storage with expiration and publish/subscribe channels.
+    Backend errors must not break requests, so implementations
+    should treat them as cache misses.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        """
+        Returns value by key or None if there is no value.
+        """
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        value: str,
+        ttl: float | None = None,
+        only_if_missing: bool = False,
+    ) -> bool:
+        """
+        Sets value by key.
+        :param float|None ttl: seconds value lives, forever if None
+        :param bool only_if_missing: do not overwrite existing value
+        :return: False if value is not set as key exists (with `only_if_missing`)
+        :rtype: bool
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Deletes value by key.
+        """
+
+    @abstractmethod
+    def publish(self, channel: str, message: str) -> None:
+        """
+        Sends message to all subscribers of channel (in all workers).
+        """
+
+    @abstractmethod
+    def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        """
+        Calls handler for every message published to channel.
+        Should be called in every worker process.
+        """
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-memory backend, shared only within one process. Used in tests.
+    """
+
+    def __init__(self, timer: Callable[[], float] = time.monotonic) -> None:
+        self._timer = timer
+        self._items: dict[str, tuple[float, str]] = {}
+        self._handlers: dict[str, list[MessageHandler]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < self._timer():
+                del self._items[key]
+                return None
+            return value
+
+    def set(
+        self,
+        key: str,
+        value: str,
+        ttl: float | None = None,
+        only_if_missing: bool = False,
+    ) -> bool:
+        now = self._timer()
+        expires_at = float("inf") if ttl is None else now + ttl
+        with self._lock:
+            item = self._items.get(key)
+            if only_if_missing and item is not None and item[0] >= now:
+                return False
+            self._items[key] = (expires_at, value)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def publish(self, channel: str, message: str) -> None:
+        for handler in list(self._handlers.get(channel, [])):
+            handler(message)
+
+    def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Backend for Redis (or any server speaking Redis protocol, e.g. KeyDB, Dragonfly).
+    """
+
+    def __init__(self, url: str) -> None:
+        """
+        :param str url: server url like redis://host:6379/0
+        """
+        # Imported here, as redis is required only if this backend is configured.
+        import redis  # pylint: disable=import-outside-toplevel
+
+        self._errors = (redis.RedisError,)
+        self._client = redis.Redis.from_url(
+            url, socket_timeout=0.25, socket_connect_timeout=0.25
+        )
+
+    def get(self, key: str) -> str | None:
+        try:
+            value = self._client.get(key)
+        except self._errors:
+            logger.warning("Unable to get %s from redis cache!", key, exc_info=True)
+            return None
+        return value.decode() if value is not None else None
+
+    def set(
+        self,
+        key: str,
+        value: str,
+        ttl: float | None = None,
+        only_if_missing: bool = False,
+    ) -> bool:
+        try:
+            px = None if ttl is None else max(1, int(ttl * 1000))
+            return bool(self._client.set(key, value, px=px, nx=only_if_missing))
+        except self._errors:
+            logger.warning("Unable to set %s in redis cache!", key, exc_info=True)
+            return True
+
+    def delete(self, key: str) -> None:
+        try:
+            self._client.delete(key)
+        except self._errors:
+            logger.warning("Unable to delete %s from redis cache!", key, exc_info=True)
+
+    def publish(self, channel: str, message: str) -> None:
+        try:
+            self._client.publish(channel, message)
+        except self._errors:
+            logger.warning("Unable to publish to %s!", channel, exc_info=True)
+
+    def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        # Subscribing connects to server, so it is done in background thread:
+        # requests must not wait for (or fail with) unavailable server.
+        threading.Thread(
+            target=self._subscribe, args=(channel, handler), daemon=True
+        ).start()
+
+    def _subscribe(
+        self, channel: str, handler: MessageHandler, retry_interval: float = 1.0
+    ) -> None:
+        """
+        Subscribes to channel, retrying until server is available, then starts
+        subscriber thread.
+        """
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        while True:
+            try:
+                pubsub.subscribe(
+                    **{channel: lambda message: handler(message["data"].decode())}
+                )
+                break
+            except self._errors:
+                logger.warning(
+                    "Unable to subscribe to %s, retrying!", channel, exc_info=True
+                )
+                time.sleep(retry_interval)
+        pubsub.run_in_thread(
+            sleep_time=1, daemon=True, exception_handler=_log_pubsub_exception
+        )
+
+
+def _log_pubsub_exception(exc: Exception, _pubsub, _worker_thread) -> None:
+    """
+    Keeps subscriber thread running after connection errors (it reconnects itself).
+    """
+    logger.warning("Redis subscriber error: %s", exc)
+    time.sleep(1)
+
+
+def create_cache_backend(url: str) -> CacheBackend | None:
+    """
+    Creates cache backend from url.
+    :param str url: `memory://`, `redis://...`, `rediss://...` or empty string to disable backend
+    :rtype: CacheBackend | None
+    """
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryCacheBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Unknown cache backend url: {url}!")
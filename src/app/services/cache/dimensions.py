@@ -0,0 +1,64 @@
+"""
+    Cache of views dimensions (user agents and referers) ids, keyed by values digests.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from typing import Any
+
+from flask import Flask, current_app
+
+from app.services.cache.lru import LruTtlCache
+
+
+class DimensionsCache:
+    """
+    Per-worker caches of user agents and referers ids.
+    Set of distinct values is small and repetitive, so most views cost no dimension queries.
+    Ids never change, so cached ids live until evicted.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        """
+        :param int maxsize: max count of cached ids (of each dimension)
+        """
+        self.user_agents: LruTtlCache[int] = LruTtlCache(maxsize)
+        self.referers: LruTtlCache[int] = LruTtlCache(maxsize)
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Returns hit/miss counters of caches.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "user_agents": self.user_agents.get_stats(),
+            "referers": self.referers.get_stats(),
+        }
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates dimensions cache for the app.
+    """
+    app.extensions["dimensions_cache"] = DimensionsCache(
+        maxsize=app.config["DIMENSIONS_CACHE_MAX_SIZE"]
+    )
+
+
+def get_dimensions_cache() -> DimensionsCache:
+    """
+    Returns dimensions cache of current app.
+    :rtype: DimensionsCache
+    """
+    return current_app.extensions["dimensions_cache"]
@@ -0,0 +1,158 @@
+"""
+    Cache of SSO tokens verification results, keyed by tokens digests.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import hashlib
+import json
+import time
+from typing import Any
+
+from flask import Flask, current_app
+
+from app.services.cache.backends import CacheBackend, create_cache_backend
+from app.services.cache.lru import LruTtlCache
+
+# SSO error codes of invalid (10, 20) and expired (11) tokens.
+# Responses with these errors do not change for the token, so they are cached briefly.
+NEGATIVE_ERROR_CODES = (10, 11, 20)
+
+
+class TokenCache:
+    """
+    Two level cache of SSO `tokens/check` responses.
+    First level is per-worker LRU cache, second (optional) level is shared backend.
+    Tokens are never stored, keys are sha256 digests of tokens.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float,
+        backend: CacheBackend | None = None,
+        key_prefix: str = "cc-api",
+    ) -> None:
+        """
+        :param int maxsize: max count of cached tokens in worker
+        :param float ttl: seconds valid token response lives in cache (not longer than token)
+        :param float negative_ttl: seconds invalid (or expired) token response lives in cache
+        :param CacheBackend|None backend: shared second level cache
+        :param str key_prefix: prefix of shared cache keys
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.tokens: LruTtlCache[dict[str, Any]] = LruTtlCache(maxsize)
+        self.backend = backend
+        self.backend_hits = 0
+        self.backend_misses = 0
+
+        self._key_prefix = key_prefix
+
+    def get(self, token: str) -> dict[str, Any] | None:
+        """
+        Returns cached SSO response for token or None on miss.
+        :rtype: dict[str, Any] | None
+        """
+        digest = get_token_digest(token)
+        response = self.tokens.get(digest)
+        if response is not None or self.backend is None:
+            return response
+
+        data = self.backend.get(self._get_key(digest))
+        if data is None:
+            self.backend_misses += 1
+            return None
+
+        self.backend_hits += 1
+        response = json.loads(data)
+        ttl = self.get_ttl(response)
+        if ttl is not None:
+            self.tokens.set(digest, response, ttl=ttl)
+        return response
+
+    def set(self, token: str, response: dict[str, Any]) -> None:
+        """
+        Puts SSO response for token to the cache, if response may be cached.
+        """
+        ttl = self.get_ttl(response)
+        if ttl is None:
+            return
+
+        digest = get_token_digest(token)
+        self.tokens.set(digest, response, ttl=ttl)
+        if self.backend is not None:
+            self.backend.set(self._get_key(digest), json.dumps(response), ttl=ttl)
+
+    def get_ttl(self, response: dict[str, Any]) -> float | None:
+        """
+        Returns seconds response may be cached, or None if it should not be cached
+        (server errors, already expired tokens).
+        :rtype: float | None
+        """
+        if "error" in response:
+            if response["error"].get("code") in NEGATIVE_ERROR_CODES:
+                return self.negative_ttl
+            return None
+
+        ttl = self.ttl
+        expires_at = response.get("success", {}).get("expires_at")
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        return ttl if ttl > 0 else None
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Returns hit/miss counters of caches.
+        :rtype: dict[str, Any]
+        """
+        stats: dict[str, Any] = {"tokens": self.tokens.get_stats()}
+        if self.backend is not None:
+            stats["backend"] = {
+                "hits": self.backend_hits,
+                "misses": self.backend_misses,
+            }
+        return stats
+
+    def _get_key(self, digest: str) -> str:
+        return f"{self._key_prefix}:sso-token:{digest}"
+
+
+def get_token_digest(token: str) -> str:
+    """
+    Returns sha256 digest of token.
+    :rtype: str
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates SSO tokens cache for the app.
+    """
+    app.extensions["token_cache"] = TokenCache(
+        maxsize=app.config["SSO_TOKEN_CACHE_MAX_SIZE"],
+        ttl=app.config["SSO_TOKEN_CACHE_TTL"],
+        negative_ttl=app.config["SSO_TOKEN_CACHE_NEGATIVE_TTL"],
+        backend=create_cache_backend(app.config["SSO_TOKEN_CACHE_BACKEND_URL"]),
+    )
+
+
+def get_token_cache() -> TokenCache:
+    """
+    Returns SSO tokens cache of current app.
+    :rtype: TokenCache
+    """
+    return current_app.extensions["token_cache"]
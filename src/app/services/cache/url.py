@@ -0,0 +1,251 @@
+"""
+    Cache of short urls snapshots, keyed by decoded url id.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, TypeVar
+
+from flask import Flask, current_app
+
+from app.database.snapshots import UrlSnapshot, RedirectUrlSnapshot, PasteUrlSnapshot
+from app.services.cache.backends import CacheBackend, create_cache_backend
+from app.services.cache.lru import LruTtlCache
+
+S = TypeVar("S", bound=UrlSnapshot)
+
+# Names of snapshot types, used in keys and invalidation messages.
+SNAPSHOT_KINDS: dict[type[UrlSnapshot], str] = {
+    RedirectUrlSnapshot: "redirect_url",
+    PasteUrlSnapshot: "paste_url",
+}
+
+# Value of shared cache key of just invalidated url.
+TOMBSTONE = "tombstone"
+
+
+class UrlCache:
+    """
+    Two level cache of RedirectUrl and PasteUrl snapshots.
+    First level is per-worker LRU cache, second (optional) level is shared backend.
+    Invalidations are published to all workers, so they drop stale first level entries.
+    Invalidated urls are not cached again for `tombstone_ttl` seconds: snapshot read
+    from database before invalidation must not be put to the cache after it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None,
+        backend: CacheBackend | None = None,
+        backend_ttl: float | None = None,
+        tombstone_ttl: float = 10.0,
+        key_prefix: str = "cc-api",
+    ) -> None:
+        """
+        :param int maxsize: max count of cached urls (of each type) in worker
+        :param float|None ttl: seconds url lives in worker cache
+        :param CacheBackend|None backend: shared second level cache
+        :param float|None backend_ttl: seconds url lives in shared cache
+        :param float tombstone_ttl: seconds invalidated url is not cached
+        :param str key_prefix: prefix of shared cache keys and channel
+        """
+        self.redirect_urls: LruTtlCache[RedirectUrlSnapshot] = LruTtlCache(maxsize, ttl)
+        self.paste_urls: LruTtlCache[PasteUrlSnapshot] = LruTtlCache(maxsize, ttl)
+        self.backend = backend
+        self.backend_ttl = backend_ttl
+        self.tombstone_ttl = tombstone_ttl
+        self._tombstones: LruTtlCache[bool] = LruTtlCache(maxsize, tombstone_ttl)
+        self.backend_hits = 0
+        self.backend_misses = 0
+
+        self._key_prefix = key_prefix
+        self._channel = f"{key_prefix}:url-cache:invalidations"
+        self._subscribed_pid: int | None = None
+        self._subscribe_lock = threading.Lock()
+
+    def get(self, snapshot_class: type[S], url_id: int) -> S | None:
+        """
+        Returns cached snapshot or None on miss.
+        :param type snapshot_class: RedirectUrlSnapshot or PasteUrlSnapshot
+        :param int url_id: id of url
+        """
+        self._ensure_subscribed()
+        snapshot = self._get_local_cache(snapshot_class).get(url_id)
+        if snapshot is not None or self.backend is None:
+            return snapshot
+        return self._get_from_backend(snapshot_class, url_id)
+
+    async def get_async(self, snapshot_class: type[S], url_id: int) -> S | None:
+        """
+        Async version of `get`: shared backend is queried in thread,
+        so event loop is not blocked by network.
+        """
+        self._ensure_subscribed()
+        snapshot = self._get_local_cache(snapshot_class).get(url_id)
+        if snapshot is not None or self.backend is None:
+            return snapshot
+        return await asyncio.to_thread(self._get_from_backend, snapshot_class, url_id)
+
+    def _get_from_backend(self, snapshot_class: type[S], url_id: int) -> S | None:
+        """
+        Returns snapshot from shared backend and puts it to worker cache.
+        """
+        local_cache = self._get_local_cache(snapshot_class)
+        data = self.backend.get(self._get_key(snapshot_class, url_id))
+        if data is None or data == TOMBSTONE:
+            self.backend_misses += 1
+            return None
+
+        self.backend_hits += 1
+        snapshot = snapshot_class.from_dict(json.loads(data))
+        local_cache.set(url_id, snapshot, ttl=_get_seconds_to_expiration(snapshot))
+        return snapshot
+
+    def set(self, snapshot: UrlSnapshot) -> None:
+        """
+        Puts snapshot to the cache. Snapshot is cached not longer than url expiration date.
+        Recently invalidated snapshot is not cached (it may be read before invalidation).
+        """
+        self._ensure_subscribed()
+        if self._tombstones.get((type(snapshot), snapshot.id)):
+            return
+        ttl = _get_seconds_to_expiration(snapshot)
+        if self.backend is not None:
+            backend_ttl = ttl
+            if self.backend_ttl is not None:
+                backend_ttl = min(ttl or self.backend_ttl, self.backend_ttl)
+            # Shared key exists if url is cached by other worker or has tombstone
+            # (invalidation may be not received by this worker yet).
+            if not self.backend.set(
+                self._get_key(type(snapshot), snapshot.id),
+                json.dumps(snapshot.to_dict()),
+                ttl=backend_ttl,
+                only_if_missing=True,
+            ):
+                return
+        self._get_local_cache(type(snapshot)).set(snapshot.id, snapshot, ttl=ttl)
+
+    async def set_async(self, snapshot: UrlSnapshot) -> None:
+        """
+        Async version of `set`: shared backend is updated in thread.
+        """
+        if self.backend is None:
+            self.set(snapshot)
+        else:
+            await asyncio.to_thread(self.set, snapshot)
+
+    def invalidate(self, snapshot_class: type[UrlSnapshot], url_id: int) -> None:
+        """
+        Drops snapshot from the cache in all workers.
+        Should be called after url is changed (deleted, updated, burned, expired).
+        """
+        self._drop_local(snapshot_class, url_id)
+        if self.backend is not None:
+            self.backend.set(
+                self._get_key(snapshot_class, url_id),
+                TOMBSTONE,
+                ttl=self.tombstone_ttl,
+            )
+            self.backend.publish(
+                self._channel, f"{SNAPSHOT_KINDS[snapshot_class]}:{url_id}"
+            )
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Returns hit/miss counters of caches.
+        :rtype: dict[str, Any]
+        """
+        stats: dict[str, Any] = {
+            "redirect_urls": self.redirect_urls.get_stats(),
+            "paste_urls": self.paste_urls.get_stats(),
+        }
+        if self.backend is not None:
+            stats["backend"] = {
+                "hits": self.backend_hits,
+                "misses": self.backend_misses,
+            }
+        return stats
+
+    def _get_local_cache(self, snapshot_class: type[S]) -> LruTtlCache[S]:
+        if snapshot_class is RedirectUrlSnapshot:
+            return self.redirect_urls
+        return self.paste_urls
+
+    def _get_key(self, snapshot_class: type[UrlSnapshot], url_id: int) -> str:
+        return f"{self._key_prefix}:{SNAPSHOT_KINDS[snapshot_class]}:{url_id}"
+
+    def _ensure_subscribed(self) -> None:
+        """
+        Subscribes to invalidations once in every worker process,
+        as subscriber threads are not inherited by forked gunicorn workers.
+        """
+        if self.backend is None or self._subscribed_pid == os.getpid():
+            return
+        with self._subscribe_lock:
+            if self._subscribed_pid == os.getpid():
+                return
+            self.backend.subscribe(self._channel, self._on_invalidation)
+            self._subscribed_pid = os.getpid()
+
+    def _on_invalidation(self, message: str) -> None:
+        """
+        Drops snapshot from worker cache by invalidation message.
+        """
+        kind, url_id = message.split(":")
+        for snapshot_class, snapshot_kind in SNAPSHOT_KINDS.items():
+            if snapshot_kind == kind:
+                self._drop_local(snapshot_class, int(url_id))
+
+    def _drop_local(self, snapshot_class: type[UrlSnapshot], url_id: int) -> None:
+        """
+        Drops snapshot from worker cache and leaves tombstone instead of it.
+        """
+        self._get_local_cache(snapshot_class).invalidate(url_id)
+        self._tombstones.set((snapshot_class, url_id), True)
+
+
+def _get_seconds_to_expiration(snapshot: UrlSnapshot) -> float | None:
+    """
+    Returns seconds until url expires, or None if url is already expired
+    (expired url will not change, so it may be cached as usual).
+    """
+    seconds = (snapshot.expiration_date - datetime.now()).total_seconds()
+    return seconds if seconds > 0 else None
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates url cache for the app.
+    """
+    app.extensions["url_cache"] = UrlCache(
+        maxsize=app.config["URL_CACHE_MAX_SIZE"],
+        ttl=app.config["URL_CACHE_TTL"],
+        backend=create_cache_backend(app.config["URL_CACHE_BACKEND_URL"]),
+        backend_ttl=app.config["URL_CACHE_BACKEND_TTL"],
+        tombstone_ttl=app.config["URL_CACHE_TOMBSTONE_TTL"],
+    )
+
+
+def get_url_cache() -> UrlCache:
+    """
+    Returns url cache of current app.
+    :rtype: UrlCache
+    """
+    return current_app.extensions["url_cache"]
@@ -0,0 +1,202 @@
+"""
+    Background sweeper of expired short urls and pastes.
+    to the database in batches by background flusher.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+"""
+import atexit
+import os
+import threading
+import time
+from typing import Any
+
+from flask import Flask, current_app
+
+from app.database import crud, db
+
+
+class ExpirySweeper:
+    """
+    Marks expired urls and pastes as swept (and evicts them from url cache)
+    in bounded batches, every batch is a separate short transaction.
+    May be run periodically by background thread of every worker:
+    concurrent sweepers skip rows locked by each other.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        batch_size: int = 500,
+        interval: float = 300.0,
+        max_batches: int | None = None,
+    ) -> None:
+        """
+        :param Flask app: application, used to get database session in sweeper thread
+        :param int batch_size: max count of urls (pastes) marked by one transaction
+        :param float interval: seconds between sweeps of background thread
+        :param int|None max_batches: max count of batches of one sweep (for each model)
+        """
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_batches = max_batches
+
+        self.swept_urls_count = 0
+        self.swept_pastes_count = 0
+        self.batches_count = 0
+        self.sweeps_count = 0
+        self.last_sweep: dict[str, Any] | None = None
+
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sweep(self) -> dict[str, Any]:
+        """
+        Marks expired urls and pastes as swept (up to `max_batches` batches of each).
+        :return: stats of the sweep: counts of swept urls and pastes, batches,
+                 duration (seconds) and rate (swept items per second)
+        :rtype: dict[str, Any]
+        """
+        started_at = time.perf_counter()
+        swept = {}
+        batches_count = 0
+        with self._lock, self.app.app_context():
+            for name, crud_module in (
+                ("urls", crud.redirect_url),
+                ("pastes", crud.paste_url),
+            ):
+                swept[name], model_batches_count = self._sweep_model(crud_module)
+                batches_count += model_batches_count
+
+            duration = time.perf_counter() - started_at
+            self.swept_urls_count += swept["urls"]
+            self.swept_pastes_count += swept["pastes"]
+            self.batches_count += batches_count
+            self.sweeps_count += 1
+            self.last_sweep = {
+                **swept,
+                "batches": batches_count,
+                "duration": duration,
+                "rate": (swept["urls"] + swept["pastes"]) / duration if duration else 0,
+            }
+        if swept["urls"] or swept["pastes"]:
+            self.app.logger.info(
+                "Swept %s expired urls and %s pastes in %.2fs (%.0f/s).",
+                swept["urls"],
+                swept["pastes"],
+                duration,
+                self.last_sweep["rate"],
+            )
+        return self.last_sweep
+
+    def _sweep_model(self, crud_module) -> tuple[int, int]:
+        """
+        Marks expired items of one model (by its crud module) batch by batch.
+        :return: count of swept items and count of batches
+        :rtype: tuple[int, int]
+        """
+        swept_count = batches_count = 0
+        while self.max_batches is None or batches_count < self.max_batches:
+            url_ids = crud_module.tombstone_expired(db=db, batch_size=self.batch_size)
+            batches_count += 1
+            swept_count += len(url_ids)
+            if len(url_ids) < self.batch_size:
+                break
+        return swept_count, batches_count
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Returns counters of swept urls and pastes (by this process).
+        :rtype: dict[str, Any]
+        """
+        return {
+            "swept_urls": self.swept_urls_count,
+            "swept_pastes": self.swept_pastes_count,
+            "batches": self.batches_count,
+            "sweeps": self.sweeps_count,
+            "last_sweep": self.last_sweep,
+        }
+
+    def start(self) -> None:
+        """
+        Starts background sweeper in current process.
+        """
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="expiry-sweeper", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stops background sweeper (current batch is finished).
+        :param float timeout: seconds to wait for sweeper thread
+        """
+        self._stopped.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        atexit.unregister(self.stop)
+
+    def ensure_started(self) -> None:
+        """
+        Starts sweeper on first request in every process,
+        as threads are not inherited by forked gunicorn workers.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self.start()
+
+    def _run(self) -> None:
+        """
+        Sweeper thread loop.
+        """
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:  # pylint: disable=broad-except
+                self.app.logger.exception("Failed to sweep expired urls!")
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates expiry sweeper for the app.
+    Background sweeper is started lazily in every worker on first request,
+    if it is enabled in config.
+    """
+    config = app.config
+    sweeper = ExpirySweeper(
+        app=app,
+        batch_size=config["EXPIRY_SWEEPER_BATCH_SIZE"],
+        interval=config["EXPIRY_SWEEPER_INTERVAL"],
+        max_batches=config["EXPIRY_SWEEPER_MAX_BATCHES"] or None,
+    )
+    app.extensions["expiry_sweeper"] = sweeper
+    if config["EXPIRY_SWEEPER_ENABLED"]:
+        app.before_request(sweeper.ensure_started)
+
+
+def get_expiry_sweeper() -> ExpirySweeper:
+    """
+    Returns expiry sweeper of current app.
+    :rtype: ExpirySweeper
+    """
+    return current_app.extensions["expiry_sweeper"]
@@ -0,0 +1,102 @@
+"""
+    Hashids codec for short urls hashes.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import string
+from functools import lru_cache
+from typing import Iterable
+
+from hashids import Hashids
+from flask import Flask, current_app
+
+# Hashes are decoded from client input, so junk is rejected before decoding.
+# Hash of any 64-bit id is much shorter, characters are of default hashids alphabet.
+MAX_HASH_LENGTH = 32
+HASH_CHARACTERS = frozenset(string.ascii_letters + string.digits)
+
+
+class HashidsCodec:
+    """
+    Encodes url ids to hashes and decodes them back.
+    Created once per app, results for hot ids are memoized
+    (only valid hashes, so junk hashes from clients do not evict hot ones).
+    """
+
+    def __init__(self, salt: str, min_length: int = 6, memo_size: int = 65536) -> None:
+        """
+        :param str salt: hashids salt
+        :param int min_length: min length of hash
+        :param int memo_size: max count of memoized hashes (for encode and decode each)
+        """
+        self._hashids = Hashids(salt=salt, min_length=min_length)
+        self._encode = lru_cache(maxsize=memo_size)(self._hashids.encode)
+        # Exceptions are not memoized by lru_cache, so invalid hashes are not.
+        self._decode = lru_cache(maxsize=memo_size)(self._decode_valid)
+
+    def encode(self, url_id: int) -> str:
+        """
+        Returns hash of url id.
+        :rtype: str
+        """
+        return self._encode(url_id)
+
+    def encode_many(self, url_ids: Iterable[int]) -> list[str]:
+        """
+        Returns hashes of url ids in the same order.
+        :rtype: list[str]
+        """
+        encode = self._encode
+        return [encode(url_id) for url_id in url_ids]
+
+    def decode(self, url_hash: str) -> int | None:
+        """
+        Returns url id from hash.
+        :rtype: int | None
+        :return: url id or None if hash is invalid
+        """
+        if len(url_hash) > MAX_HASH_LENGTH or not HASH_CHARACTERS.issuperset(url_hash):
+            return None
+        try:
+            return self._decode(url_hash)
+        except ValueError:
+            return None
+
+    def _decode_valid(self, url_hash: str) -> int:
+        """
+        Returns url id from hash, raises ValueError if hash is invalid.
+        """
+        url_ids: tuple[int, ...] = self._hashids.decode(url_hash)
+        if len(url_ids) != 1:
+            raise ValueError(f"Invalid url hash {url_hash!r}!")
+        return url_ids[0]
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates hashids codec for the app.
+    """
+    app.extensions["hashids_codec"] = HashidsCodec(
+        salt=app.config["HASHIDS_SALT"],
+        memo_size=app.config["HASHIDS_MEMO_SIZE"],
+    )
+
+
+def get_hashids_codec() -> HashidsCodec:
+    """
+    Returns hashids codec of current app.
+    :rtype: HashidsCodec
+    """
+    return current_app.extensions["hashids_codec"]
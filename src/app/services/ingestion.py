@@ -0,0 +1,406 @@
+"""
+    Views ingestion: in-process buffer for url views that are written
+    to the database in batches by background flusher.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+import time
+from glob import glob
+
+from flask import Flask, current_app
+
+from app.database import crud, db
+from app.services.stats import ViewRecord
+
+# What to do with new view when buffer is full.
+OVERFLOW_POLICY_DROP = "drop"
+OVERFLOW_POLICY_BLOCK = "block"
+OVERFLOW_POLICY_SPILL = "spill"
+OVERFLOW_POLICIES = (OVERFLOW_POLICY_DROP, OVERFLOW_POLICY_BLOCK, OVERFLOW_POLICY_SPILL)
+
+# Spill file of process (`views-<pid>.jsonl`), or spill file claimed for replay
+# by process (`views-<pid>.jsonl.<claimer pid>.replay`).
+# Records left after failed replays are moved to `views-<pid>.jsonl.<claimer pid>.dead`,
+# which is never replayed.
+SPILL_FILE_PATTERN = re.compile(r"^(views-(\d+)\.jsonl)(?:\.(\d+)\.replay)?$")
+
+# Failed replay of spill file is retried with exponential backoff (starting from
+# flush interval) up to this count of attempts, then its records are moved to dead file.
+SPILL_REPLAY_MAX_ATTEMPTS = 10
+
+
+class ViewIngestionBuffer:
+    """
+    Bounded buffer of url views.
+    Request handlers only put records here, and background flusher
+    writes them with multi-row INSERTs every `flush_interval` seconds
+    or as soon as `batch_size` records are collected.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        app: Flask,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        overflow_policy: str = OVERFLOW_POLICY_DROP,
+        block_timeout: float = 1.0,
+        spill_dir: str | None = None,
+    ) -> None:
+        """
+        :param Flask app: application, used to get database session in flusher
+        :param int max_size: max count of records in buffer
+        :param int batch_size: max count of records written with one INSERT
+        :param float flush_interval: seconds between flushes
+        :param str overflow_policy: what to do when buffer is full. May be `drop`, `block` or `spill`
+        :param float block_timeout: seconds to wait for free space with `block` policy, then record is dropped
+        :param str|None spill_dir: directory for records spilled with `spill` policy
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Overflow policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy!r}!"
+            )
+        if overflow_policy == OVERFLOW_POLICY_SPILL and not spill_dir:
+            raise ValueError("Spill directory is required for `spill` overflow policy!")
+
+        self.app = app
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.spill_dir = spill_dir
+
+        self.dropped_count = 0
+        self.spilled_count = 0
+        self.written_count = 0
+
+        self._pid: int | None = None
+        # Claimed spill files with failed replays: path -> (attempts, time of next attempt).
+        self._replay_failures: dict[str, tuple[int, float]] = {}
+        self._queue: queue.Queue[ViewRecord] = queue.Queue(maxsize=max_size)
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def put(self, record: ViewRecord) -> bool:
+        """
+        Puts view record to the buffer, never touches the database.
+        :param ViewRecord record: view to write
+        :return: False if record was dropped because buffer is full
+        :rtype: bool
+        """
+        self._ensure_started()
+
+        try:
+            if self.overflow_policy == OVERFLOW_POLICY_BLOCK:
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow_policy == OVERFLOW_POLICY_SPILL:
+                self._spill(record)
+                return True
+            with self._counters_lock:
+                self.dropped_count += 1
+            return False
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self) -> int:
+        """
+        Writes all buffered (and previously spilled) records to the database.
+        :return: count of written records
+        :rtype: int
+        """
+        written = 0
+        with self._flush_lock, self.app.app_context():
+            while batch := self._take_batch():
+                written += self._write(batch)
+            written += self._replay_spilled()
+        return written
+
+    def start(self) -> None:
+        """
+        Starts background flusher in current process.
+        First flush is done at once, so views spilled by dead processes are recovered
+        on startup.
+        """
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self._wakeup.set()
+        self._thread = threading.Thread(
+            target=self._run, name="views-ingestion-flusher", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stops background flusher and writes all remaining records.
+        Called on worker shutdown.
+        :param float timeout: seconds to wait for flusher thread
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        atexit.unregister(self.stop)
+        self.flush()
+
+    def qsize(self) -> int:
+        """
+        Returns count of records in the buffer.
+        :rtype: int
+        """
+        return self._queue.qsize()
+
+    def _ensure_started(self) -> None:
+        """
+        Starts flusher on first use in every process,
+        as threads (and buffered records) are not inherited by forked gunicorn workers.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._flush_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self.start()
+
+    def _run(self) -> None:
+        """
+        Flusher thread loop.
+        """
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:  # pylint: disable=broad-except
+                self.app.logger.exception("Failed to flush url views!")
+
+    def _take_batch(self) -> list[ViewRecord]:
+        """
+        Takes up to `batch_size` records from the buffer.
+        """
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list[ViewRecord]) -> int:
+        """
+        Writes batch to the database. On failure, batch is spilled (if possible) or dropped.
+        """
+        try:
+            return self._insert(batch)
+        except Exception:  # pylint: disable=broad-except
+            self.app.logger.exception("Failed to write %s url views!", len(batch))
+            if self.spill_dir:
+                for record in batch:
+                    self._spill(record)
+            else:
+                with self._counters_lock:
+                    self.dropped_count += len(batch)
+            return 0
+
+    def _insert(self, batch: list[ViewRecord]) -> int:
+        """
+        Writes batch to the database and commits it (rolls back and raises on failure).
+        """
+        try:
+            written = crud.url_view.create_many(db=db, records=batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        with self._counters_lock:
+            self.written_count += written
+        return written
+
+    def _spill_path(self, pid: int | None = None) -> str:
+        """
+        Returns path to spill file of the process.
+        """
+        return os.path.join(self.spill_dir, f"views-{pid or os.getpid()}.jsonl")
+
+    def _spill(self, record: ViewRecord) -> None:
+        """
+        Appends record to the spill file of current process.
+        """
+        with self._spill_lock:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self._spill_path(), "a", encoding="utf-8") as spill_file:
+                spill_file.write(json.dumps(record.to_dict()) + "\n")
+        with self._counters_lock:
+            self.spilled_count += 1
+
+    def _replay_spilled(self) -> int:
+        """
+        Writes records from spill files of current process and of dead processes
+        (workers that were killed before they replayed their spill files),
+        also from spill files left claimed by processes killed while replaying them.
+        """
+        if not self.spill_dir or self._queue.qsize() > self.max_size // 2:
+            return 0
+
+        written = 0
+        for path in glob(os.path.join(self.spill_dir, "views-*")):
+            match = SPILL_FILE_PATTERN.match(os.path.basename(path))
+            if match is None:
+                continue
+            spill_name, spiller_pid, claimer_pid = match.groups()
+            # Claimed file of current process is left by its failed replay, or by dead
+            # process with the same pid (restarted container).
+            owner_pid = int(claimer_pid or spiller_pid)
+            if owner_pid != os.getpid() and _is_process_alive(owner_pid):
+                continue
+
+            claimed_path = os.path.join(
+                self.spill_dir, f"{spill_name}.{os.getpid()}.replay"
+            )
+            if path != claimed_path:
+                if os.path.exists(claimed_path):
+                    # Records of failed replay are not written yet, file is claimed after them.
+                    continue
+                with self._spill_lock:
+                    try:
+                        os.rename(path, claimed_path)
+                    except FileNotFoundError:
+                        # Claimed by another process.
+                        continue
+
+            _, retry_at = self._replay_failures.get(claimed_path, (0, 0.0))
+            if time.monotonic() >= retry_at:
+                written += self._replay_file(claimed_path)
+
+        return written
+
+    def _replay_file(self, claimed_path: str) -> int:
+        """
+        Writes records of claimed spill file in batches. File is removed only after all
+        records are written, so records are not lost if process is killed while replaying.
+        On failure, only not written records are left in the file for the next attempt.
+        """
+        with open(claimed_path, encoding="utf-8") as spill_file:
+            records = [ViewRecord.from_dict(json.loads(line)) for line in spill_file]
+
+        written = 0
+        for i in range(0, len(records), self.batch_size):
+            try:
+                written += self._insert(records[i : i + self.batch_size])
+            except Exception:  # pylint: disable=broad-except
+                self.app.logger.exception(
+                    "Failed to replay %s url views from %s!", len(records) - i, claimed_path
+                )
+                self._fail_replay(claimed_path, records[i:])
+                return written
+
+        os.remove(claimed_path)
+        self._replay_failures.pop(claimed_path, None)
+        return written
+
+    def _fail_replay(self, claimed_path: str, records: list[ViewRecord]) -> None:
+        """
+        Leaves not written records in claimed spill file and schedules next attempt,
+        or moves them to dead file when attempts are exhausted.
+        """
+        attempts, _ = self._replay_failures.get(claimed_path, (0, 0.0))
+        attempts += 1
+        if attempts >= SPILL_REPLAY_MAX_ATTEMPTS:
+            dead_path = claimed_path.removesuffix(".replay") + ".dead"
+            _write_records(dead_path, records, mode="a")
+            os.remove(claimed_path)
+            self._replay_failures.pop(claimed_path, None)
+            self.app.logger.error(
+                "Failed to replay %s url views %s times, moved them to %s!",
+                len(records),
+                attempts,
+                dead_path,
+            )
+            return
+
+        _write_records(f"{claimed_path}.tmp", records, mode="w")
+        os.replace(f"{claimed_path}.tmp", claimed_path)
+        self._replay_failures[claimed_path] = (
+            attempts,
+            time.monotonic() + self.flush_interval * 2**attempts,
+        )
+
+
+def _write_records(path: str, records: list[ViewRecord], mode: str) -> None:
+    """
+    Writes records to file as JSON lines.
+    """
+    with open(path, mode, encoding="utf-8") as records_file:
+        records_file.writelines(json.dumps(record.to_dict()) + "\n" for record in records)
+
+
+def _is_process_alive(pid: int) -> bool:
+    """
+    Checks that process with pid is running.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates views ingestion buffer for the app, if it is enabled in config.
+    Flusher is started lazily in every worker on first view.
+    """
+    config = app.config
+    if not config["VIEWS_INGESTION_ENABLED"]:
+        return
+
+    app.extensions["views_ingestion"] = ViewIngestionBuffer(
+        app=app,
+        max_size=config["VIEWS_INGESTION_BUFFER_SIZE"],
+        batch_size=config["VIEWS_INGESTION_BATCH_SIZE"],
+        flush_interval=config["VIEWS_INGESTION_FLUSH_INTERVAL_MS"] / 1000,
+        overflow_policy=config["VIEWS_INGESTION_OVERFLOW_POLICY"],
+        block_timeout=config["VIEWS_INGESTION_BLOCK_TIMEOUT_MS"] / 1000,
+        spill_dir=config["VIEWS_INGESTION_SPILL_DIR"],
+    )
+
+
+def get_views_ingestion_buffer() -> ViewIngestionBuffer | None:
+    """
+    Returns views ingestion buffer of current app or None if ingestion is disabled.
+    :rtype: ViewIngestionBuffer | None
+    """
+    return current_app.extensions.get("views_ingestion")
@@ -19,15 +19,13 @@
 """
 from typing import Any
 import functools
-import logging
-from requests import request
-from requests.exceptions import JSONDecodeError
-
-from flask import current_app, request as flask_request
+from flask import request as flask_request
 from flask_sqlalchemy import SQLAlchemy
 
 from app.services.api.errors import ApiErrorCode, ApiErrorException
+from app.services.cache import get_token_cache
 from app.services.request.auth_data import AuthData
+from app.services.request.sso import get_sso_client
 from app.services.permissions import Permission, parse_permissions_from_scope
 from app.database.models.user import User
 from app.database import crud, db
@@ -181,28 +179,33 @@ def _query_scope_permissions(
 def _check_token_with_sso_server(token: str) -> dict[str, Any]:
     """
     Checks that token is valid with SSO server.
+    Responses are cached, so repeated requests with the same token do not wait for SSO.
     :param token: Token to check.
     :returns: json response from server
     :rtype: dict[str, Any]
     """
 
-    config = current_app.config
-    url = f"{config['SSO_API_URL']}/{config['SSO_API_METHOD']}"
-    logging.error(url)
-    params = {"access_token": token, "required_scope": SSO_REQUESTED_SCOPE}
-
-    try:
-        response = request("GET", url, params=params).json()
-    except JSONDecodeError as e:
-        raise ApiErrorException(
-            ApiErrorCode.API_EXTERNAL_SERVER_ERROR,
-            "Unable to process your request due to server being down!",
-        ) from e
+    cache = get_token_cache()
+    response = cache.get(token)
+    if response is None:
+        response = _request_sso_server(token)
+        cache.set(token, response)
 
     _check_sso_server_response(response)
     return response
 
 
+def _request_sso_server(token: str) -> dict[str, Any]:
+    """
+    Requests token check from SSO server.
+    :param token: Token to check.
+    :returns: json response from server
+    :rtype: dict[str, Any]
+    """
+
+    return get_sso_client().check_token(token, scope=SSO_REQUESTED_SCOPE)
+
+
 def _check_sso_server_response(response: dict[str, Any]) -> None:
     """
     Checks SSO server response to not contain any error.
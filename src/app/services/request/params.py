@@ -15,12 +15,13 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-from typing import TypeVar
+from typing import Iterable, TypeVar
 
-from flask import request
+from flask import current_app, request
 import pydantic
 
 from app.services.api.errors import ApiErrorCode, ApiErrorException
+from app.services.hashids_codec import get_hashids_codec
 
 T = TypeVar("T")
 
@@ -52,6 +53,78 @@ def get_post_param(
     return param
 
 
+def get_batch_param(name: str, items: list | None = None) -> list:
+    """
+    Returns items of batch request parameter (list from json).
+    :param str name: name of parameter
+    :param list|None items: already parsed items (e.g. from GET params)
+    :returns: non-empty list with not more than `URLS_BATCH_MAX_SIZE` items
+    :raises ApiErrorException: if param is not a list, empty or too long.
+    """
+    if items is None:
+        items = get_post_param(name, None)
+    if not isinstance(items, list) or not items:
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST, f"`{name}` must be non-empty list!"
+        )
+    max_size = current_app.config["URLS_BATCH_MAX_SIZE"]
+    if len(items) > max_size:
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST,
+            f"`{name}` must contain not more than {max_size} items!",
+        )
+    return items
+
+
+def get_page_params() -> tuple[int, int | None]:
+    """
+    Returns params of keyset pagination of lists (from GET params):
+    `limit` (defaults to `LIST_DEFAULT_LIMIT`, not more than `LIST_MAX_LIMIT`)
+    and `cursor` (hash of the last item of previous page).
+    :rtype: tuple[int, int | None]
+    :returns: limit and id of the last item of previous page
+    :raises ApiErrorException: if params are invalid.
+    """
+    max_limit = current_app.config["LIST_MAX_LIMIT"]
+    limit = request.args.get("limit", str(current_app.config["LIST_DEFAULT_LIMIT"]))
+    if not limit.isdigit() or not 1 <= int(limit) <= max_limit:
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST,
+            f"`limit` must be an integer number in range from 1 to {max_limit}!",
+        )
+
+    cursor = request.args.get("cursor")
+    if cursor is None:
+        return int(limit), None
+    before_id = get_hashids_codec().decode(cursor)
+    if before_id is None:
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST, "`cursor` is invalid!"
+        )
+    return int(limit), before_id
+
+
+def get_fields_param(available_fields: Iterable[str]) -> set[str] | None:
+    """
+    Returns fields requested with `fields` GET param (comma separated).
+    :param Iterable[str] available_fields: fields that may be requested
+    :rtype: set[str] | None
+    :returns: requested fields or None if all fields are requested
+    :raises ApiErrorException: if unknown field is requested.
+    """
+    fields = request.args.get("fields")
+    if fields is None:
+        return None
+    fields = set(filter(None, fields.split(",")))
+    unknown_fields = fields - set(available_fields)
+    if not fields or unknown_fields:
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST,
+            f"`fields` must be comma separated list of: {', '.join(available_fields)}!",
+        )
+    return fields
+
+
 def _parse_as_bool(param: str) -> bool:
     """
     Parses string param as bool.
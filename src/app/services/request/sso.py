@@ -0,0 +1,287 @@
+"""
+    Florgon SSO API client with connections pool, retries and circuit breaker.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable
+
+from flask import Flask, current_app
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+
+from app.services.api.errors import ApiErrorCode, ApiErrorException
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Fails fast while service is unhealthy.
+    Opens after `failure_threshold` consecutive failures. After `recovery_timeout`
+    one trial call is let through (half-open): its success closes breaker,
+    failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        recovery_timeout: float,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param int failure_threshold: failures to open breaker, 0 disables breaker
+        :param float recovery_timeout: seconds breaker is open before trial call
+        :param timer: function that returns current time in seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures_count = 0
+        self.opened_count = 0
+
+        self._timer = timer
+        self._opened_at: float | None = None
+        self._trial_started = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Returns True if breaker is open (calls are rejected).
+        """
+        return self._opened_at is not None
+
+    def allow_request(self) -> bool:
+        """
+        Returns True if call may be done now.
+        :rtype: bool
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_started:
+                return False
+            if self._timer() < self._opened_at + self.recovery_timeout:
+                return False
+            self._trial_started = True
+            return True
+
+    def record_success(self) -> None:
+        """
+        Closes breaker after successful call.
+        """
+        with self._lock:
+            self.failures_count = 0
+            self._opened_at = None
+            self._trial_started = False
+
+    def release_trial(self) -> None:
+        """
+        Lets next trial call through, if current one is finished without outcome
+        (e.g. unexpected error), so breaker is not left open forever.
+        """
+        with self._lock:
+            self._trial_started = False
+
+    def record_failure(self) -> None:
+        """
+        Counts failed call, opens breaker if there are too many failures.
+        """
+        with self._lock:
+            self.failures_count += 1
+            self._trial_started = False
+            if self._opened_at is not None:
+                # Trial call failed.
+                self._opened_at = self._timer()
+            elif 0 < self.failure_threshold <= self.failures_count:
+                self._opened_at = self._timer()
+                self.opened_count += 1
+                logger.warning(
+                    "SSO circuit breaker is open after %s failures.",
+                    self.failures_count,
+                )
+
+
+class SsoClient:
+    """
+    Client of SSO API.
+    Keeps alive pooled connections (pool is created in every worker process),
+    retries idempotent requests with exponential backoff and jitter,
+    and fails fast with API_EXTERNAL_SERVER_ERROR while SSO is unhealthy.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        api_url: str,
+        check_token_method: str = "tokens/check",
+        pool_size: int = 10,
+        connect_timeout: float = 1.0,
+        read_timeout: float = 3.0,
+        retries: int = 2,
+        retry_backoff: float = 0.1,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """
+        :param str api_url: url of SSO API, like https://api.florgon.com/v1
+        :param str check_token_method: API method to check tokens
+        :param int pool_size: max count of kept alive connections
+        :param float connect_timeout: seconds to wait for connection
+        :param float read_timeout: seconds to wait for response
+        :param int retries: count of retries of failed request
+        :param float retry_backoff: base of delay between retries in seconds
+        :param CircuitBreaker|None breaker: circuit breaker, disabled if None
+        """
+        self.api_url = api_url
+        self.check_token_method = check_token_method
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=0, recovery_timeout=0
+        )
+        self.requests_count = 0
+        self.failures_count = 0
+
+        self._session: Session | None = None
+        self._session_pid: int | None = None
+        self._session_lock = threading.Lock()
+
+    def request(self, method: str, params: dict[str, Any]) -> dict[str, Any]:
+        """
+        Requests SSO API method with GET and returns json response.
+        SSO errors (like invalid token) are returned as json, they are not failures.
+        :param str method: API method, like tokens/check
+        :param dict params: query params
+        :rtype: dict[str, Any]
+        :raises ApiErrorException: if SSO is down (or breaker is open)
+        """
+        if not self.breaker.allow_request():
+            raise ApiErrorException(
+                ApiErrorCode.API_EXTERNAL_SERVER_ERROR,
+                "Unable to process your request due to server being down!",
+            )
+
+        try:
+            return self._request_with_retries(method, params)
+        finally:
+            self.breaker.release_trial()
+
+    def _request_with_retries(
+        self, method: str, params: dict[str, Any]
+    ) -> dict[str, Any]:
+        """
+        Requests SSO API method, retries failed requests and records outcome in breaker.
+        """
+        url = f"{self.api_url}/{method}"
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # Full jitter, so workers do not retry all at once.
+                time.sleep(random.uniform(0, self.retry_backoff * 2 ** (attempt - 1)))
+            self.requests_count += 1
+            try:
+                response = self._get_session().get(
+                    url, params=params, timeout=self.timeout
+                )
+                if response.status_code < 500:
+                    result = response.json()
+                    self.breaker.record_success()
+                    return result
+                logger.warning("SSO returned %s status.", response.status_code)
+            except RequestException as e:
+                logger.warning("SSO request failed: %r", e)
+            self.failures_count += 1
+
+        self.breaker.record_failure()
+        raise ApiErrorException(
+            ApiErrorCode.API_EXTERNAL_SERVER_ERROR,
+            "Unable to process your request due to server being down!",
+        )
+
+    def check_token(self, token: str, scope: str) -> dict[str, Any]:
+        """
+        Checks token with SSO `tokens/check` method.
+        :param str token: access token
+        :param str scope: required scope
+        :returns: json response from server
+        :rtype: dict[str, Any]
+        """
+        return self.request(
+            self.check_token_method,
+            params={"access_token": token, "required_scope": scope},
+        )
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Returns counters of client.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "requests": self.requests_count,
+            "failures": self.failures_count,
+            "breaker_is_open": self.breaker.is_open,
+            "breaker_opened": self.breaker.opened_count,
+        }
+
+    def _get_session(self) -> Session:
+        """
+        Returns session of current process,
+        as pooled connections can't be shared by forked workers.
+        """
+        if self._session is not None and self._session_pid == os.getpid():
+            return self._session
+        with self._session_lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.pool_size, max_retries=0
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session, self._session_pid = session, os.getpid()
+        return self._session
+
+
+def init_with_app(app: Flask) -> None:
+    """
+    Creates SSO client for the app.
+    """
+    config = app.config
+    app.extensions["sso_client"] = SsoClient(
+        api_url=config["SSO_API_URL"],
+        check_token_method=config["SSO_API_METHOD"],
+        pool_size=config["SSO_POOL_SIZE"],
+        connect_timeout=config["SSO_CONNECT_TIMEOUT"],
+        read_timeout=config["SSO_READ_TIMEOUT"],
+        retries=config["SSO_RETRIES"],
+        retry_backoff=config["SSO_RETRY_BACKOFF"],
+        breaker=CircuitBreaker(
+            failure_threshold=config["SSO_BREAKER_FAILURE_THRESHOLD"],
+            recovery_timeout=config["SSO_BREAKER_RECOVERY_TIMEOUT"],
+        ),
+    )
+
+
+def get_sso_client() -> SsoClient:
+    """
+    Returns SSO client of current app.
+    :rtype: SsoClient
+    """
+    return current_app.extensions["sso_client"]
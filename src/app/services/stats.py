@@ -17,7 +17,9 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any
 
 from flask import request
 
@@ -35,6 +37,41 @@ class Stats:
     referer: str | None
 
 
+@dataclass
+class ViewRecord:
+    """View of url or paste that is waiting to be written to the database."""
+    stats: Stats
+    url_id: int | None = None
+    paste_id: int | None = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns JSON-serializable dict with record data.
+        :rtype: dict[str, Any]
+        """
+        return {
+            "stats": asdict(self.stats),
+            "url_id": self.url_id,
+            "paste_id": self.paste_id,
+            "created_at": self.created_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ViewRecord":
+        """
+        Builds record from dict returned by `to_dict`.
+        :param dict[str, Any] data: serialized record
+        :rtype: ViewRecord
+        """
+        return cls(
+            stats=Stats(**data["stats"]),
+            url_id=data["url_id"],
+            paste_id=data["paste_id"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+        )
+
+
 def get_stats() -> Stats:
     """
     Returns Stats for current request.
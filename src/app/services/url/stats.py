@@ -19,21 +19,54 @@
 from flask_sqlalchemy import SQLAlchemy
 
 from app.database import crud
-from app.database.models.url import RedirectUrl
+from app.database.models.url import PasteUrl, RedirectUrl
+from app.database.snapshots import PasteUrlSnapshot, RedirectUrlSnapshot
 from app.services.api.errors import ApiErrorCode, ApiErrorException
-from app.services.stats import get_stats
+from app.services.stats import get_stats, ViewRecord
+from app.services.ingestion import get_views_ingestion_buffer
 
 
-def collect_stats_and_add_view(db: SQLAlchemy, short_url: RedirectUrl) -> None:
+def collect_stats_and_add_view(
+    db: SQLAlchemy, short_url: RedirectUrl | RedirectUrlSnapshot
+) -> None:
     """
     Collects stats (IP, headers, referer) and add view to short_url.
+    If views ingestion is enabled, view is only put to the buffer
+    and written to the database later by background flusher.
     :param SQLAlchemy db: database object
-    :param RedirectUrl short_url: short url object
+    :param RedirectUrl|RedirectUrlSnapshot short_url: short url object
     :rtype: None
     """
+    buffer = get_views_ingestion_buffer()
+    if buffer is not None:
+        buffer.put(ViewRecord(stats=get_stats(), url_id=short_url.id))
+        return
+
     crud.url_view.create(
         db=db,
         url=short_url,
         stats=get_stats(),
     )
 
+
+def collect_stats_and_add_paste_views(
+    db: SQLAlchemy, pastes: list[PasteUrl | PasteUrlSnapshot]
+) -> None:
+    """
+    Collects stats (IP, headers, referer) and add view to every paste.
+    Views are put to the ingestion buffer if it is enabled,
+    else they are written to the database with single multi-row INSERT.
+    :param SQLAlchemy db: database object
+    :param list[PasteUrl|PasteUrlSnapshot] pastes: paste objects
+    :rtype: None
+    """
+    stats = get_stats()
+    records = [ViewRecord(stats=stats, paste_id=paste.id) for paste in pastes]
+
+    buffer = get_views_ingestion_buffer()
+    if buffer is not None:
+        for record in records:
+            buffer.put(record)
+        return
+
+    crud.url_view.create_many(db=db, records=records)
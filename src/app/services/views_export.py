@@ -0,0 +1,172 @@
+"""
+    Export of raw url views (view events) for analytics.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from flask import Response, current_app, request, stream_with_context
+from flask_sqlalchemy import SQLAlchemy
+
+from app.database import crud
+from app.services.api.errors import ApiErrorCode, ApiErrorException
+from app.services.hashids_codec import get_hashids_codec
+
+# Formats of export and their content types.
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+EVENT_FIELDS = ("viewed_at", "url_hash", "paste_hash", "ip", "user_agent", "referer")
+
+
+def get_view_events(  # pylint: disable=too-many-arguments
+    db: SQLAlchemy,
+    url_id: int | None = None,
+    paste_id: int | None = None,
+    owner_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    batch_size: int = 1000,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yields view events (url views with user agents and referers values), oldest first.
+    Views are fetched in batches and values of dimensions are queried once per batch,
+    so memory does not depend on count of views.
+    Filters are the same as of `crud.url_view.get_batches`.
+    :rtype: Iterator[dict[str, Any]]
+    """
+    codec = get_hashids_codec()
+    batches = crud.url_view.get_batches(
+        db=db,
+        url_id=url_id,
+        paste_id=paste_id,
+        owner_id=owner_id,
+        since=since,
+        until=until,
+        batch_size=batch_size,
+    )
+    for rows in batches:
+        user_agents = crud.user_agent.get_values(
+            db=db, ids={row.user_agent_id for row in rows}
+        )
+        referers = crud.referer.get_values(
+            db=db, ids={row.referer_id for row in rows if row.referer_id is not None}
+        )
+        for row in rows:
+            yield {
+                "viewed_at": row.created_at.isoformat(),
+                "url_hash": codec.encode(row.url_id) if row.url_id else None,
+                "paste_hash": codec.encode(row.paste_id) if row.paste_id else None,
+                "ip": row.ip,
+                "user_agent": user_agents.get(row.user_agent_id),
+                "referer": referers.get(row.referer_id),
+            }
+
+
+def format_view_events(
+    events: Iterator[dict[str, Any]], export_format: str
+) -> Iterator[str]:
+    """
+    Yields view events formatted as NDJSON lines or CSV rows (with header).
+    :param str export_format: one of EXPORT_FORMATS
+    :rtype: Iterator[str]
+    """
+    if export_format == "ndjson":
+        for event in events:
+            yield json.dumps(event) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EVENT_FIELDS)
+    writer.writeheader()
+    for event in events:
+        writer.writerow(event)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header of empty export.
+        yield buffer.getvalue()
+
+
+def get_view_events_response(
+    db: SQLAlchemy,
+    url_id: int | None = None,
+    paste_id: int | None = None,
+    owner_id: int | None = None,
+) -> Response:
+    """
+    Returns streamed response with view events for export methods.
+    Format and time range are taken from GET params:
+     - str `format` - `ndjson` or `csv`. Defaults to `ndjson`.
+     - str `since`, `until` - ISO 8601 bounds of time range (`until` is excluded).
+    :rtype: Response
+    """
+    export_format = request.args.get("format", "ndjson")
+    validate_export_format(export_format)
+    since = parse_export_time("since", request.args.get("since"))
+    until = parse_export_time("until", request.args.get("until"))
+
+    events = get_view_events(
+        db=db,
+        url_id=url_id,
+        paste_id=paste_id,
+        owner_id=owner_id,
+        since=since,
+        until=until,
+        batch_size=current_app.config["EXPORT_BATCH_SIZE"],
+    )
+    return Response(
+        stream_with_context(format_view_events(events, export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+    )
+
+
+def validate_export_format(export_format: str) -> None:
+    """
+    Validates format of export (from user request args).
+    :raises ApiErrorException: if format is unknown
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST,
+            f"`format` must be one of: {', '.join(EXPORT_FORMATS)}!",
+        )
+
+
+def parse_export_time(name: str, value: str | None) -> datetime | None:
+    """
+    Parses bound of exported time range (ISO 8601 date or datetime, UTC).
+    :param str name: name of param (for error message)
+    :raises ApiErrorException: if time is invalid
+    """
+    if value is None:
+        return None
+    try:
+        time = datetime.fromisoformat(value)
+    except ValueError as e:
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST,
+            f"`{name}` must be ISO 8601 date or datetime!",
+        ) from e
+    if time.tzinfo is not None:
+        # Views are stored in naive UTC.
+        time = time.astimezone(timezone.utc).replace(tzinfo=None)
+    return time
@@ -15,11 +15,106 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, ContextManager, Iterator
+from urllib.parse import parse_qs, urlparse
+
 import pytest
 from flask import Flask
+from sqlalchemy import event
 
 from app.app import _create_app
 from app.database import db
+from app.services.request import sso
+
+
+class FakeSsoServer:
+    """
+    Local fake of SSO API (`tokens/check` method) for tests.
+    """
+
+    def __init__(self) -> None:
+        # Valid tokens and their `success` responses.
+        self.tokens: dict[str, dict[str, Any]] = {}
+        # Count of next requests that will fail with 500 status.
+        self.failures = 0
+        # Seconds to wait before response.
+        self.delay = 0.0
+        self.requests_count = 0
+        # Client addresses, one per opened connection.
+        self.connections: set[tuple[str, int]] = set()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._get_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """
+        Url of SSO API.
+        """
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        """
+        Starts server in background thread.
+        """
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _respond(self, path: str) -> tuple[int, dict[str, Any]]:
+        self.requests_count += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.failures > 0:
+            self.failures -= 1
+            return 500, {"error": {"code": 1, "message": "Internal server error!"}}
+
+        url = urlparse(path)
+        token = parse_qs(url.query).get("access_token", [""])[0]
+        if url.path != "/tokens/check" or token not in self.tokens:
+            return 400, {"error": {"code": 10, "message": "Invalid token!"}}
+        return 200, {"success": self.tokens[token]}
+
+    def _get_handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Request handler with keep-alive connections.
+            """
+
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Handles GET request.
+                """
+                server.connections.add(self.client_address)
+                status, response = server._respond(  # pylint: disable=protected-access
+                    self.path
+                )
+                body = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
 
 
 @pytest.fixture()
@@ -53,3 +148,52 @@ def runner(app):  # pylint: disable=redefined-outer-name
     CLI runner.
     """
     return app.test_cli_runner()
+
+
+@pytest.fixture()
+def count_queries(
+    app,  # pylint: disable=redefined-outer-name,unused-argument
+) -> Callable[[], ContextManager[list[str]]]:
+    """
+    Context manager that collects SQL statements executed in it
+    (and `COMMIT` of every committed transaction).
+    """
+
+    @contextmanager
+    def count() -> Iterator[list[str]]:
+        queries: list[str] = []
+
+        def before_cursor_execute(*args) -> None:
+            queries.append(args[2])
+
+        def commit(*_) -> None:
+            queries.append("COMMIT")
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(db.engine, "commit", commit)
+        try:
+            yield queries
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+            event.remove(db.engine, "commit", commit)
+
+    return count
+
+
+@pytest.fixture()
+def sso_server(app) -> Iterator[FakeSsoServer]:  # pylint: disable=redefined-outer-name
+    """
+    Fake SSO server, used by the app instead of real one.
+    """
+    server = FakeSsoServer()
+    server.start()
+    app.config.update(
+        SSO_API_URL=server.url,
+        SSO_RETRY_BACKOFF=0.01,
+        SSO_READ_TIMEOUT=1,
+    )
+    sso.init_with_app(app)
+
+    yield server
+
+    server.stop()
@@ -0,0 +1,323 @@
+"""
+    Tests for cache service.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import crud, db
+from app.database.snapshots import RedirectUrlSnapshot
+from app.services.api.errors import ApiErrorException
+from app.services.cache import (
+    LruTtlCache,
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    TokenCache,
+    UrlCache,
+    get_url_cache,
+)
+from app.services.request import auth
+
+
+class FakeTimer:
+    """
+    Controllable clock for TTL tests.
+    """
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestLruTtlCache:
+    """
+    Tests for LruTtlCache.
+    """
+
+    @staticmethod
+    def test_evicts_least_recently_used():
+        """
+        Tests that least recently used item is evicted when cache is full.
+        """
+        cache = LruTtlCache(maxsize=2)
+        cache.set(1, "a")
+        cache.set(2, "b")
+        assert cache.get(1) == "a"
+        cache.set(3, "c")
+
+        assert cache.get(2) is None
+        assert cache.get(1) == "a"
+        assert cache.get(3) == "c"
+        assert cache.evictions == 1
+
+    @staticmethod
+    def test_ttl():
+        """
+        Tests that expired items are not returned.
+        """
+        timer = FakeTimer()
+        cache = LruTtlCache(maxsize=10, ttl=5, timer=timer)
+        cache.set(1, "a")
+        cache.set(2, "b", ttl=1)
+
+        timer.now = 2
+        assert cache.get(1) == "a"
+        assert cache.get(2) is None
+
+        timer.now = 6
+        assert cache.get(1) is None
+
+    @staticmethod
+    def test_counters():
+        """
+        Tests hit/miss counters.
+        """
+        cache = LruTtlCache(maxsize=10)
+        cache.set(1, "a")
+        cache.get(1)
+        cache.get(2)
+
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+
+    @staticmethod
+    def test_disabled():
+        """
+        Tests that cache with zero size stores nothing.
+        """
+        cache = LruTtlCache(maxsize=0)
+        cache.set(1, "a")
+        assert cache.get(1) is None
+
+
+class TestUrlCache:
+    """
+    Tests for cached short url resolution.
+    """
+
+    @staticmethod
+    def test_snapshot_is_cached(app):
+        """
+        Tests that second resolution of url is served from cache.
+        """
+        url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+        cache = get_url_cache().redirect_urls
+
+        snapshot = crud.redirect_url.get_snapshot_by_hash(url.hash)
+        assert snapshot.redirect == url.redirect
+        assert snapshot.hash == url.hash
+        assert crud.redirect_url.get_snapshot_by_hash(url.hash) == snapshot
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    @staticmethod
+    def test_delete_invalidates_snapshot(app):
+        """
+        Tests that deleted url is not resolved from cache.
+        """
+        url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+        snapshot = crud.redirect_url.get_snapshot_by_hash(url.hash)
+
+        crud.redirect_url.delete(db=db, url=snapshot)
+        db.session.commit()
+
+        assert crud.redirect_url.get_snapshot_by_hash(url.hash) is None
+        assert crud.redirect_url.get_snapshot_by_hash(url.hash, only_active=False)
+
+    @staticmethod
+    def test_paste_update_invalidates_snapshot(app):
+        """
+        Tests that updated paste is not resolved from cache with old content.
+        """
+        paste = crud.paste_url.create_url(db=db, content="Some paste content")
+        crud.paste_url.get_snapshot_by_hash(paste.hash)
+
+        crud.paste_url.update(db=db, url=paste, text="New paste content")
+        db.session.commit()
+
+        assert (
+            crud.paste_url.get_snapshot_by_hash(paste.hash).content
+            == "New paste content"
+        )
+
+
+def _snapshot(**kwargs) -> RedirectUrlSnapshot:
+    return RedirectUrlSnapshot(
+        **{
+            "id": 1,
+            "expiration_date": datetime.now() + timedelta(days=1),
+            "is_deleted": False,
+            "stats_is_public": False,
+            "owner_id": None,
+            "redirect": "https://florgon.com",
+            **kwargs,
+        }
+    )
+
+
+class TestSharedUrlCache:
+    """
+    Tests for UrlCache with shared backend (workers are emulated with UrlCache objects).
+    """
+
+    @staticmethod
+    def test_snapshot_is_shared():
+        """
+        Tests that snapshot cached by one worker is resolved by another one.
+        """
+        backend = MemoryCacheBackend()
+        first, second = UrlCache(10, 60, backend), UrlCache(10, 60, backend)
+        snapshot = _snapshot()
+
+        first.set(snapshot)
+
+        assert second.get(RedirectUrlSnapshot, snapshot.id) == snapshot
+        assert second.backend_hits == 1
+        assert second.get(RedirectUrlSnapshot, snapshot.id) == snapshot
+        assert second.redirect_urls.hits == 1
+
+    @staticmethod
+    def test_invalidation_is_published():
+        """
+        Tests that invalidation in one worker drops snapshot in all workers.
+        """
+        backend = MemoryCacheBackend()
+        first, second = UrlCache(10, 60, backend), UrlCache(10, 60, backend)
+        snapshot = _snapshot()
+        first.set(snapshot)
+        assert second.get(RedirectUrlSnapshot, snapshot.id) == snapshot
+
+        first.invalidate(RedirectUrlSnapshot, snapshot.id)
+
+        assert second.redirect_urls.get(snapshot.id) is None
+        assert second.get(RedirectUrlSnapshot, snapshot.id) is None
+
+    @staticmethod
+    def test_stale_snapshot_is_not_cached_after_invalidation():
+        """
+        Tests that snapshot read before invalidation is not cached after it.
+        """
+        backend = MemoryCacheBackend()
+        first, second = UrlCache(10, 60, backend), UrlCache(10, 60, backend)
+        stale_snapshot = _snapshot()
+
+        first.invalidate(RedirectUrlSnapshot, stale_snapshot.id)
+        first.set(stale_snapshot)
+        second.set(stale_snapshot)
+
+        assert first.get(RedirectUrlSnapshot, stale_snapshot.id) is None
+        assert second.get(RedirectUrlSnapshot, stale_snapshot.id) is None
+        assert UrlCache(10, 60, backend).get(RedirectUrlSnapshot, 1) is None
+
+    @staticmethod
+    def test_unavailable_redis_is_a_miss():
+        """
+        Tests that url cache works (without shared level) while Redis is down.
+        """
+        cache = UrlCache(10, 60, RedisCacheBackend("redis://127.0.0.1:1"))
+        snapshot = _snapshot()
+
+        assert cache.get(RedirectUrlSnapshot, snapshot.id) is None
+        cache.set(snapshot)
+        assert cache.get(RedirectUrlSnapshot, snapshot.id) == snapshot
+        cache.invalidate(RedirectUrlSnapshot, snapshot.id)
+
+    @staticmethod
+    def test_snapshot_roundtrip():
+        """
+        Tests that snapshot is not changed by serialization for shared backend.
+        """
+        snapshot = _snapshot(owner_id=5, stats_is_public=True)
+        assert RedirectUrlSnapshot.from_dict(snapshot.to_dict()) == snapshot
+
+
+def _sso_success(**kwargs) -> dict:
+    return {"success": {"user_id": 1, "scope": "cc", **kwargs}}
+
+
+class TestTokenCache:
+    """
+    Tests for SSO tokens cache.
+    """
+
+    @staticmethod
+    def test_token_expiration_is_respected():
+        """
+        Tests that valid token is cached not longer than it expires.
+        """
+        cache = TokenCache(maxsize=10, ttl=60, negative_ttl=5)
+
+        assert cache.get_ttl(_sso_success()) == 60
+        assert 9 < cache.get_ttl(_sso_success(expires_at=time.time() + 10)) <= 10
+        assert cache.get_ttl(_sso_success(expires_at=time.time() - 1)) is None
+
+    @staticmethod
+    def test_negative_caching():
+        """
+        Tests that invalid token is cached briefly and server errors are not cached.
+        """
+        cache = TokenCache(maxsize=10, ttl=60, negative_ttl=5)
+        invalid_token = {"error": {"code": 10, "message": "Invalid token!"}}
+        server_error = {"error": {"code": 1, "message": "Internal error!"}}
+
+        cache.set("invalid", invalid_token)
+        cache.set("error", server_error)
+
+        assert cache.get_ttl(invalid_token) == 5
+        assert cache.get("invalid") == invalid_token
+        assert cache.get("error") is None
+
+    @staticmethod
+    def test_token_is_shared_and_not_stored():  # pylint: disable=protected-access
+        """
+        Tests that response is shared by workers and token itself is not a key.
+        """
+        backend = MemoryCacheBackend()
+        first = TokenCache(10, 60, 5, backend)
+        second = TokenCache(10, 60, 5, backend)
+
+        first.set("secret-token", _sso_success())
+
+        assert second.get("secret-token") == _sso_success()
+        assert second.backend_hits == 1
+        assert not any("secret-token" in key for key in backend._items)
+
+    @staticmethod
+    def test_sso_is_requested_once(app, monkeypatch):  # pylint: disable=protected-access
+        """
+        Tests that SSO server is requested once for repeated checks of the same token.
+        """
+        responses = {
+            "valid": _sso_success(),
+            "invalid": {"error": {"code": 10, "message": "Invalid token!"}},
+        }
+        requested_tokens = []
+
+        def request_sso_server(token: str) -> dict:
+            requested_tokens.append(token)
+            return responses[token]
+
+        monkeypatch.setattr(auth, "_request_sso_server", request_sso_server)
+        for _ in range(3):
+            assert auth._check_token_with_sso_server("valid") == responses["valid"]
+            with pytest.raises(ApiErrorException):
+                auth._check_token_with_sso_server("invalid")
+
+        assert requested_tokens == ["valid", "invalid"]
@@ -0,0 +1,63 @@
+"""
+    Tests for interned dimensions (user agents and referers) lookup.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from app.database import crud, db
+from app.database.models.user_agent import UserAgent
+from app.services.cache import get_dimensions_cache
+
+
+class TestDimensions:
+    """
+    Tests for interned dimensions lookup.
+    """
+
+    @staticmethod
+    def test_cached_lookup_costs_no_queries(app, count_queries):
+        """
+        Tests that ids of known values are returned without queries.
+        """
+        user_agent_id = crud.user_agent.get_or_create_id(db=db, user_agent="pytest")
+        referer_id = crud.referer.get_or_create_id(db=db, referer="https://vk.com/")
+        # Ids are cached after commit.
+        db.session.commit()
+
+        with count_queries() as queries:
+            assert crud.user_agent.get_or_create_id(db=db, user_agent="pytest") == (
+                user_agent_id
+            )
+            assert crud.referer.get_or_create_ids(
+                db=db, referers={"https://vk.com/"}
+            ) == {"https://vk.com/": referer_id}
+        assert not queries
+
+    @staticmethod
+    def test_existing_value_is_not_duplicated(app):
+        """
+        Tests that value created by another worker (not cached in this one) is reused.
+        """
+        user_agent_id = crud.user_agent.get_or_create_id(db=db, user_agent="pytest")
+        get_dimensions_cache().user_agents.clear()
+
+        user_agent_ids = crud.user_agent.get_or_create_ids(
+            db=db, user_agents={"pytest", "curl"}
+        )
+
+        assert user_agent_ids["pytest"] == user_agent_id
+        assert UserAgent.query.count() == 2
+        assert db.session.get(UserAgent, user_agent_ids["curl"]).value_digest == (
+            crud.dimension.get_digest("curl")
+        )
@@ -0,0 +1,102 @@
+"""
+    Tests for expiry sweeper service.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app, url_for
+
+from app.database import crud, db
+from app.database.models.url import PasteUrl, RedirectUrl
+from app.services.cache import get_url_cache
+from app.services.expiry import ExpirySweeper
+
+
+def _create_expired_urls(count: int) -> list[RedirectUrl]:
+    urls = [
+        crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+        for _ in range(count)
+    ]
+    RedirectUrl.query.filter(RedirectUrl.id.in_([url.id for url in urls])).update(
+        {"expiration_date": datetime.now() - timedelta(days=1)}
+    )
+    db.session.commit()
+    return urls
+
+
+def test_expired_urls_are_swept(app):
+    """
+    Tests that only expired urls and pastes are marked as swept.
+    """
+    expired_url = _create_expired_urls(1)[0]
+    active_url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    expired_paste = crud.paste_url.create_url(db=db, content="Expired paste")
+    PasteUrl.query.filter_by(id=expired_paste.id).update(
+        {"expiration_date": datetime.now() - timedelta(minutes=1)}
+    )
+    db.session.commit()
+
+    stats = ExpirySweeper(app=current_app, batch_size=10).sweep()
+
+    assert stats["urls"] == 1
+    assert stats["pastes"] == 1
+    assert RedirectUrl.query.filter_by(is_swept=True).all() == [expired_url]
+    assert PasteUrl.query.filter_by(is_swept=True).all() == [expired_paste]
+    # Swept urls are not deleted, so they are still reported as expired.
+    assert not crud.redirect_url.get_by_hash(expired_url.hash).is_deleted
+    assert crud.redirect_url.get_by_hash(active_url.hash) is not None
+    assert crud.paste_url.get_by_hash(expired_paste.hash) is not None
+
+
+def test_swept_url_is_expired(app, client):
+    """
+    Tests that swept url is reported as expired (not as deleted) by the API.
+    """
+    url = _create_expired_urls(1)[0]
+    ExpirySweeper(app=current_app).sweep()
+
+    with app.test_request_context():
+        open_url = url_for("urls.open_short_url", url_hash=url.hash)
+    response = client.get(open_url)
+    assert response.status_code == 403
+    assert response.json["error"]["message"] == "Url is expired!"
+
+
+def test_swept_url_is_evicted_from_cache(app):
+    """
+    Tests that swept url is not resolved from url cache.
+    """
+    url = _create_expired_urls(1)[0]
+    assert crud.redirect_url.get_snapshot_by_hash(url.hash) is not None
+
+    ExpirySweeper(app=current_app).sweep()
+
+    assert get_url_cache().redirect_urls.get(url.id) is None
+
+
+def test_sweep_is_batched(app):
+    """
+    Tests that urls are swept in batches and sweep is limited by max batches.
+    """
+    _create_expired_urls(5)
+    sweeper = ExpirySweeper(app=current_app, batch_size=2, max_batches=2)
+
+    assert sweeper.sweep()["urls"] == 4
+    stats = sweeper.sweep()
+    assert stats["urls"] == 1
+    assert stats["batches"] == 2  # Batch of urls and batch of pastes.
+    assert sweeper.get_stats()["swept_urls"] == 5
+    assert sweeper.get_stats()["sweeps"] == 2
@@ -0,0 +1,83 @@
+"""
+    Tests for hashids codec service.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import pytest
+from hashids import Hashids
+
+from app.services.hashids_codec import HashidsCodec
+
+SALT = "test-salt"
+
+
+class TestHashidsCodec:
+    """
+    Tests for HashidsCodec.
+    """
+
+    @staticmethod
+    def test_same_hashes_as_hashids():
+        """
+        Tests that codec produces same hashes as plain Hashids (old urls stay valid).
+        """
+        codec = HashidsCodec(salt=SALT)
+        hashids = Hashids(salt=SALT, min_length=6)
+        for url_id in (1, 2, 1000, 123456):
+            assert codec.encode(url_id) == hashids.encode(url_id)
+            assert codec.decode(hashids.encode(url_id)) == url_id
+
+    @staticmethod
+    def test_encode_many_keeps_order():
+        """
+        Tests that encode_many returns hashes in order of ids.
+        """
+        codec = HashidsCodec(salt=SALT)
+        assert codec.encode_many([3, 1, 2]) == [
+            codec.encode(3),
+            codec.encode(1),
+            codec.encode(2),
+        ]
+
+    @staticmethod
+    @pytest.mark.parametrize("url_hash", ["", "!!!", "abc"])
+    def test_decode_invalid_hash(url_hash: str):
+        """
+        Tests that invalid hash is decoded to None.
+        """
+        assert HashidsCodec(salt=SALT).decode(url_hash) is None
+
+    @staticmethod
+    def test_decode_many_ids_hash():
+        """
+        Tests that hash of several ids is not accepted as url hash.
+        """
+        url_hash = Hashids(salt=SALT, min_length=6).encode(1, 2)
+        assert HashidsCodec(salt=SALT).decode(url_hash) is None
+
+    @staticmethod
+    def test_only_valid_hashes_are_memoized():
+        """
+        Tests that junk hashes (from clients) do not evict memoized valid hashes.
+        """
+        codec = HashidsCodec(salt=SALT, memo_size=1)
+        url_hash = codec.encode(1)
+        assert codec.decode(url_hash) == 1
+        for junk_hash in ("a" * 1000, "abcdefgh", "abc/def"):
+            assert codec.decode(junk_hash) is None
+        # pylint: disable-next=protected-access
+        assert codec._decode.cache_info().currsize == 1
+        assert codec.decode(url_hash) == 1
+        assert codec._decode.cache_info().hits == 1  # pylint: disable=protected-access
@@ -0,0 +1,185 @@
+"""
+    Tests for views ingestion service.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import os
+import subprocess
+
+import pytest
+
+from app.database import crud, db
+from app.database.models.url_view import UrlView
+from app.services import ingestion
+from app.services.ingestion import ViewIngestionBuffer
+from app.services.stats import Stats, ViewRecord
+
+
+@pytest.fixture()
+def url(app):  # pylint: disable=redefined-outer-name
+    """
+    Short url to add views to.
+    """
+    url_ = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    db.session.commit()
+    return url_
+
+
+def _record(url_id: int, referer: str | None = None) -> ViewRecord:
+    return ViewRecord(
+        stats=Stats(ip="127.0.0.1", user_agent="pytest", referer=referer),
+        url_id=url_id,
+    )
+
+
+class TestViewIngestionBuffer:
+    """
+    Tests for ViewIngestionBuffer.
+    """
+
+    @staticmethod
+    def test_flush_writes_all_records(app, url):
+        """
+        Tests that flush writes buffered views with their dimensions.
+        """
+        buffer = ViewIngestionBuffer(app, batch_size=2)
+        for referer in ("https://vk.com/", None, "https://vk.com/"):
+            assert buffer.put(_record(url.id, referer))
+
+        # Records may also be flushed by started flusher.
+        buffer.stop()
+        assert buffer.written_count == 3
+        assert buffer.qsize() == 0
+        assert UrlView.query.filter_by(url_id=url.id).count() == 3
+        summary = crud.url_view_daily.get_summary(
+            db, url_id=url.id, referer_views_value_as="number"
+        )
+        assert summary["by_referers"] == {"https://vk.com/": 2, "untracked": 1}
+
+    @staticmethod
+    def test_views_are_committed_by_flush(app, url):
+        """
+        Tests that views are committed by flush only (not when written without buffer).
+        """
+        crud.url_view.create_many(db=db, records=[_record(url.id)])
+        db.session.rollback()
+        assert UrlView.query.count() == 0
+
+        buffer = ViewIngestionBuffer(app)
+        assert buffer.put(_record(url.id))
+        buffer.stop()
+        assert buffer.written_count == 1
+        db.session.rollback()
+        assert UrlView.query.count() == 1
+
+    @staticmethod
+    def test_drop_policy(app, url):
+        """
+        Tests that views are dropped when buffer is full.
+        """
+        buffer = ViewIngestionBuffer(app, max_size=1, overflow_policy="drop")
+        assert buffer.put(_record(url.id))
+        assert not buffer.put(_record(url.id))
+        assert buffer.dropped_count == 1
+        buffer.stop()
+        assert UrlView.query.count() == 1
+
+    @staticmethod
+    def test_spill_policy(app, url, tmp_path):
+        """
+        Tests that views are spilled to file when buffer is full and written on flush.
+        """
+        buffer = ViewIngestionBuffer(
+            app, max_size=1, overflow_policy="spill", spill_dir=str(tmp_path)
+        )
+        assert buffer.put(_record(url.id))
+        assert buffer.put(_record(url.id))
+        assert buffer.spilled_count == 1
+        assert os.listdir(tmp_path)
+
+        buffer.stop()
+        assert UrlView.query.count() == 2
+        assert not os.listdir(tmp_path)
+
+    @staticmethod
+    def test_claimed_spill_file_is_recovered(app, url, tmp_path):
+        """
+        Tests that spill file left by process killed while replaying it is written.
+        """
+        with subprocess.Popen(["true"]) as process:
+            process.wait()
+        dead_pid = process.pid
+        claimed_path = tmp_path / f"views-{dead_pid}.jsonl.{dead_pid}.replay"
+        claimed_path.write_text(json.dumps(_record(url.id).to_dict()) + "\n")
+
+        buffer = ViewIngestionBuffer(
+            app, overflow_policy="spill", spill_dir=str(tmp_path)
+        )
+        assert buffer.flush() == 1
+        assert UrlView.query.count() == 1
+        assert not os.listdir(tmp_path)
+
+    @staticmethod
+    def test_failed_replay_is_retried(app, url, tmp_path, monkeypatch):
+        """
+        Tests that records of failed replay are kept for next attempts,
+        and moved to dead file when attempts are exhausted.
+        """
+        with subprocess.Popen(["true"]) as process:
+            process.wait()
+        dead_pid = process.pid
+        (tmp_path / f"views-{dead_pid}.jsonl").write_text(
+            "".join(json.dumps(_record(url.id).to_dict()) + "\n" for _ in range(3))
+        )
+        buffer = ViewIngestionBuffer(
+            app,
+            batch_size=2,
+            flush_interval=0,
+            overflow_policy="spill",
+            spill_dir=str(tmp_path),
+        )
+        create_many = crud.url_view.create_many
+        batches = []
+
+        def fail_second_batch(db, records):  # pylint: disable=redefined-outer-name
+            batches.append(records)
+            if len(batches) >= 2:
+                raise ValueError("Database is not available!")
+            return create_many(db=db, records=records)
+
+        monkeypatch.setattr(ingestion, "SPILL_REPLAY_MAX_ATTEMPTS", 2)
+        monkeypatch.setattr(crud.url_view, "create_many", fail_second_batch)
+        assert buffer.flush() == 2
+        claimed_path = tmp_path / f"views-{dead_pid}.jsonl.{os.getpid()}.replay"
+        assert os.listdir(tmp_path) == [claimed_path.name]
+        assert len(claimed_path.read_text().splitlines()) == 1
+
+        assert buffer.flush() == 0
+        dead_path = tmp_path / f"views-{dead_pid}.jsonl.{os.getpid()}.dead"
+        assert os.listdir(tmp_path) == [dead_path.name]
+        assert len(dead_path.read_text().splitlines()) == 1
+
+        monkeypatch.setattr(crud.url_view, "create_many", create_many)
+        assert buffer.flush() == 0
+        assert UrlView.query.count() == 2
+
+    @staticmethod
+    def test_invalid_policy(app):
+        """
+        Tests that unknown overflow policy is rejected.
+        """
+        with pytest.raises(ValueError):
+            ViewIngestionBuffer(app, overflow_policy="ignore")
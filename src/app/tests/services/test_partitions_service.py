@@ -0,0 +1,88 @@
+"""
+    Tests for url views partitions service.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from datetime import date
+
+from app.database import db
+from app.database.partitions import (
+    add_months,
+    get_expired_partitions,
+    get_partition_month,
+    get_oldest_month,
+    get_partition_name,
+    is_partitioned,
+)
+
+
+def test_add_months():
+    """
+    Tests that months are shifted across years.
+    """
+    assert add_months(date(2023, 11, 1), 2) == date(2024, 1, 1)
+    assert add_months(date(2023, 1, 1), -1) == date(2022, 12, 1)
+    assert add_months(date(2023, 5, 1), 0) == date(2023, 5, 1)
+
+
+def test_partition_name_roundtrip():
+    """
+    Tests that month is parsed back from partition name.
+    """
+    name = get_partition_name(date(2023, 9, 1))
+    assert name == "url_views_y2023m09"
+    assert get_partition_month(name) == date(2023, 9, 1)
+    assert get_partition_month("url_views_default") is None
+
+
+def test_expired_partitions():
+    """
+    Tests that only partitions older than retention window are expired.
+    """
+    names = [
+        "url_views_default",
+        "url_views_y2023m10",
+        "url_views_y2023m08",
+        "url_views_y2023m07",
+        "url_views_y2022m12",
+    ]
+    today = date(2023, 10, 18)
+
+    assert get_expired_partitions(names, 2, today) == [
+        "url_views_y2022m12",
+        "url_views_y2023m07",
+    ]
+    # Current month is never expired.
+    assert get_expired_partitions(names, 0, today) == [
+        "url_views_y2022m12",
+        "url_views_y2023m07",
+        "url_views_y2023m08",
+    ]
+
+
+def test_oldest_month():
+    """
+    Tests that oldest month is found among monthly partitions only.
+    """
+    names = ["url_views_default", "url_views_y2023m10", "url_views_y2022m12"]
+    assert get_oldest_month(names) == date(2022, 12, 1)
+    assert get_oldest_month(["url_views_default"]) is None
+
+
+def test_not_partitioned(app):
+    """
+    Tests that url views are not partitioned on SQLite.
+    """
+    assert not is_partitioned(db)
@@ -0,0 +1,103 @@
+"""
+    Tests for database pool options and metrics.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.database.pool import get_engine_options
+from app.database.pool import MeteredAsyncQueuePool, MeteredQueuePool, get_pool_stats
+
+
+def _config(**kwargs) -> dict:
+    return {
+        "SQLALCHEMY_DATABASE_URI": "postgresql://cc:cc@localhost/cc",
+        "DATABASE_POOL_SIZE": 5,
+        "DATABASE_MAX_OVERFLOW": 10,
+        "ASYNC_DATABASE_POOL_SIZE": 20,
+        "ASYNC_DATABASE_MAX_OVERFLOW": 80,
+        "DATABASE_POOL_TIMEOUT": 30,
+        "DATABASE_POOL_RECYCLE": 1800,
+        "DATABASE_POOL_PRE_PING": False,
+        "DATABASE_STATEMENT_CACHE_SIZE": 100,
+        "DATABASE_PGBOUNCER_MODE": False,
+        **kwargs,
+    }
+
+
+def test_engine_options():
+    """
+    Tests that pool options are taken from config for sync and async engines.
+    """
+    options = get_engine_options(_config())
+    async_options = get_engine_options(_config(), is_async=True)
+
+    assert options["poolclass"] is MeteredQueuePool
+    assert (options["pool_size"], options["max_overflow"]) == (5, 10)
+    assert options["pool_recycle"] == 1800
+    assert not options["pool_pre_ping"]
+    assert "connect_args" not in options
+    assert async_options["poolclass"] is MeteredAsyncQueuePool
+    assert (async_options["pool_size"], async_options["max_overflow"]) == (20, 80)
+    assert async_options["connect_args"]["statement_cache_size"] == 100
+    assert get_engine_options(_config(SQLALCHEMY_DATABASE_URI="sqlite://")) == {}
+
+
+def test_engine_options_pgbouncer_mode():
+    """
+    Tests that statements cache is disabled and pre-ping is enabled for PgBouncer.
+    """
+    options = get_engine_options(_config(DATABASE_PGBOUNCER_MODE=True))
+    async_options = get_engine_options(
+        _config(DATABASE_PGBOUNCER_MODE=True), is_async=True
+    )
+    connect_args = async_options["connect_args"]
+
+    assert options["pool_pre_ping"]
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    name_func = connect_args["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+def test_pool_metrics(tmp_path):
+    """
+    Tests checkout metrics and saturation of metered pool.
+    """
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=MeteredQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.01,
+    )
+    first, second = engine.connect(), engine.connect()
+    first.execute(text("SELECT 1"))
+
+    stats = get_pool_stats(engine)
+    assert stats["checked_out"] == 2
+    assert stats["saturation"] == 1
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    first.close()
+    second.close()
+    stats = get_pool_stats(engine)
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 3
+    assert stats["timeouts"] == 1
+    assert stats["max_checkout_time_ms"] >= stats["avg_checkout_time_ms"] > 0
+    engine.dispose()
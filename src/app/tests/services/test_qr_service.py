@@ -0,0 +1,225 @@
+"""
+    Tests for QR codes service.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+
+import pytest
+
+from app.services.api.errors import ApiErrorCode, ApiErrorException
+from app.services.qr import (
+    QrPrerenderer,
+    QrRenderCache,
+    QrRenderPool,
+    get_qr_code_key,
+    parse_qr_prerender_variants,
+    render_qr_code,
+)
+
+
+class TestQrRenderCache:
+    """
+    Tests for QrRenderCache.
+    """
+
+    @staticmethod
+    def test_evicts_by_size():
+        """
+        Tests that least recently used QR codes are evicted when size is exceeded.
+        """
+        cache = QrRenderCache(max_bytes=10)
+        cache.set("a", b"aaaa")
+        cache.set("b", b"bbbb")
+        assert cache.get("a") == b"aaaa"
+        cache.set("c", b"cccc")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"aaaa"
+        assert cache.size_bytes == 8
+        assert cache.evictions == 1
+
+    @staticmethod
+    def test_spill_to_disk(tmp_path):
+        """
+        Tests that evicted QR codes are read from spill directory.
+        """
+        cache = QrRenderCache(max_bytes=4, spill_dir=str(tmp_path))
+        cache.set("a", b"aaaa")
+        cache.set("b", b"bbbb")
+
+        assert cache.get("a") == b"aaaa"
+        assert cache.disk_hits == 1
+        assert QrRenderCache(max_bytes=4, spill_dir=str(tmp_path)).get("b") == b"bbbb"
+
+    @staticmethod
+    def test_spill_dir_is_bounded(tmp_path):
+        """
+        Tests that least recently used QR codes are removed from spill directory.
+        """
+        cache = QrRenderCache(max_bytes=0, spill_dir=str(tmp_path), spill_max_bytes=10)
+        for key, mtime in (("a", 1), ("b", 2)):
+            cache.set(key, key.encode() * 4, persist=True)
+            os.utime(tmp_path / key, (mtime, mtime))
+        assert cache.get("a") == b"aaaa"
+
+        cache.set("c", b"cccc", persist=True)
+
+        assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+        assert cache.get_stats()["disk_evictions"] == 1
+
+    @staticmethod
+    def test_disabled():
+        """
+        Tests that cache with zero size stores nothing.
+        """
+        cache = QrRenderCache(max_bytes=0)
+        cache.set("a", b"a")
+        assert cache.get("a") is None
+
+
+class TestQrPrerenderer:
+    """
+    Tests for QrPrerenderer.
+    """
+
+    @staticmethod
+    def test_variants_are_cached(tmp_path):
+        """
+        Tests that all variants are rendered once and shared with other workers.
+        """
+        cache = QrRenderCache(max_bytes=1024 * 1024, spill_dir=str(tmp_path))
+        variants = parse_qr_prerender_variants("svg:3, png:3")
+        prerenderer = QrPrerenderer(cache, variants)
+
+        assert prerenderer.submit("https://florgon.com")
+        prerenderer.wait()
+        prerenderer.prerender("https://florgon.com")
+
+        assert prerenderer.get_stats() == {"pending": 0, "rendered": 2, "dropped": 0}
+        other_worker_cache = QrRenderCache(1024 * 1024, spill_dir=str(tmp_path))
+        for result_type, scale in variants:
+            key = get_qr_code_key("https://florgon.com", result_type, scale, 4)
+            expected = render_qr_code("https://florgon.com", result_type, scale)
+            assert cache.get(key) == expected
+            assert other_worker_cache.get(key) == cache.get(key)
+
+    @staticmethod
+    def test_busy_pool_is_not_waited():
+        """
+        Tests that QR codes are not prerendered while rendering processes are busy.
+        """
+        cache = QrRenderCache(max_bytes=1024 * 1024)
+        pool = QrRenderPool(max_processes=0, max_pending=0)
+        prerenderer = QrPrerenderer(cache, [("svg", 3), ("png", 3)], pool=pool)
+
+        prerenderer.prerender("https://florgon.com")
+
+        assert prerenderer.get_stats() == {"pending": 0, "rendered": 0, "dropped": 1}
+        assert cache.get_stats()["count"] == 0
+
+    @staticmethod
+    def test_invalid_variants():
+        """
+        Tests that invalid variants are not accepted.
+        """
+        with pytest.raises(ValueError):
+            parse_qr_prerender_variants("svg:3,jpg:3")
+
+
+class TestQrRenderPool:
+    """
+    Tests for QrRenderPool.
+    """
+
+    @staticmethod
+    def test_render_in_process():
+        """
+        Tests that QR code rendered in rendering process is the same and timed.
+        """
+        pool = QrRenderPool(max_processes=1)
+        try:
+            qr_code = pool.render("https://florgon.com", "png", 3, 4)
+        finally:
+            pool.shutdown()
+
+        assert qr_code == render_qr_code("https://florgon.com", "png", 3, 4)
+        stats = pool.get_stats()
+        assert stats["rendered"] == 1
+        assert stats["pending"] == 0
+        assert stats["max_render_time_ms"] > 0
+
+    @staticmethod
+    def test_too_many_pending():
+        """
+        Tests that QR code is rejected with 429 when too many QR codes are pending.
+        """
+        pool = QrRenderPool(max_processes=0, max_pending=0)
+
+        with pytest.raises(ApiErrorException) as excinfo:
+            pool.render("https://florgon.com", "svg")
+
+        assert excinfo.value.api_code == ApiErrorCode.API_TOO_MANY_REQUESTS
+        assert pool.get_stats()["rejected"] == 1
+
+
+class TestQrCodeKey:
+    """
+    Tests for QR codes content addresses.
+    """
+
+    @staticmethod
+    def test_key_depends_on_all_params():
+        """
+        Tests that QR codes with different params have different keys.
+        """
+        keys = {
+            get_qr_code_key("https://cc.florgon.com/o/abc123", "svg", 3, 4),
+            get_qr_code_key("https://cc.florgon.com/o/abc124", "svg", 3, 4),
+            get_qr_code_key("https://cc.florgon.com/o/abc123", "png", 3, 4),
+            get_qr_code_key("https://cc.florgon.com/o/abc123", "svg", 4, 4),
+            get_qr_code_key("https://cc.florgon.com/o/abc123", "svg", 3, 5),
+        }
+        assert len(keys) == 5
+
+    @staticmethod
+    def test_render_is_deterministic():
+        """
+        Tests that QR code is the same for the same params, so it may be cached.
+        """
+        for result_type in ("svg", "png", "txt"):
+            assert render_qr_code("https://florgon.com", result_type) == (
+                render_qr_code("https://florgon.com", result_type)
+            )
+
+
+class TestZlibPngBackend:
+    """
+    Tests for zlib PNG rendering backend.
+    """
+
+    @staticmethod
+    @pytest.mark.parametrize("scale", [1, 8])
+    @pytest.mark.parametrize("quiet_zone", [0, 25])
+    @pytest.mark.parametrize(
+        "text", ["https://cc.florgon.com/o/abc123", "https://florgon.com/" + "a" * 100]
+    )
+    def test_output_is_identical_to_pypng(text, scale, quiet_zone):
+        """
+        Tests that zlib backend renders the same PNG bytes as pyqrcode (PyPNG).
+        """
+        assert render_qr_code(
+            text, "png", scale, quiet_zone, png_backend="zlib"
+        ) == render_qr_code(text, "png", scale, quiet_zone, png_backend="pypng")
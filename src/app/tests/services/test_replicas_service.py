@@ -0,0 +1,162 @@
+"""
+    Tests for routing of reads to database replica.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import pytest
+from flask import url_for
+from sqlalchemy import create_engine, insert
+
+from app.database import crud, db
+from app.database.models.url import RedirectUrl
+from app.database.models.url_view import UrlView
+from app.database.replicas import (
+    PIN_COOKIE,
+    ReplicaRouter,
+    pin_to_primary,
+    use_replica,
+)
+from app.services.hashids_codec import get_hashids_codec
+
+
+class FakeTimer:
+    """
+    Controllable clock for lag checks.
+    """
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name="replica")
+def fixture_replica(app, tmp_path):
+    """
+    Replica database (separate SQLite database) with one url, absent in primary.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(RedirectUrl), {"id": 100, "redirect": "https://a.b"})
+    router = ReplicaRouter(engine, max_lag=1, timer=FakeTimer())
+    app.extensions["database_replica"] = router
+
+    yield router
+
+    del app.extensions["database_replica"]
+    engine.dispose()
+
+
+def test_reads_are_routed_to_replica(replica):
+    """
+    Tests that read-only CRUD functions read replica and other queries read primary.
+    """
+    url_hash = get_hashids_codec().encode(100)
+
+    assert crud.redirect_url.get_by_hash(url_hash).redirect == "https://a.b"
+    assert RedirectUrl.query.filter_by(id=100).first() is None
+    assert replica.get_stats()["reads"] == 1
+
+
+def test_cached_snapshots_are_read_from_primary(replica):
+    """
+    Tests that snapshots for url cache are never read from (lagging) replica.
+    """
+    url_hash = get_hashids_codec().encode(100)
+
+    assert crud.redirect_url.get_snapshot_by_hash(url_hash) is None
+    assert crud.paste_url.get_snapshots_by_hashes([url_hash]) == {url_hash: None}
+    assert replica.get_stats()["reads"] == 0
+
+
+def test_session_is_pinned_after_write(replica):
+    """
+    Tests that session reads primary after write, so it reads its own writes.
+    """
+    url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+
+    assert crud.redirect_url.get_by_hash(url.hash).id == url.id
+    assert crud.redirect_url.get_by_hash(get_hashids_codec().encode(100)) is None
+    assert replica.get_stats()["reads"] == 0
+
+
+def test_explicit_pin(replica):
+    """
+    Tests that pinned session does not read replica.
+    """
+    pin_to_primary()
+    with use_replica():
+        assert RedirectUrl.query.filter_by(id=100).first() is None
+    assert replica.get_stats()["reads"] == 0
+
+
+def test_lagging_replica_falls_back_to_primary(replica, monkeypatch):
+    """
+    Tests that reads fall back to primary while replica lags, and lag is rechecked.
+    """
+    lag = 5.0
+    monkeypatch.setattr(replica, "_get_lag", lambda: lag)
+    with use_replica():
+        assert RedirectUrl.query.filter_by(id=100).first() is None
+        assert replica.get_stats()["fallbacks"] == 1
+
+        lag = 0.5
+        replica._timer.now = 10  # pylint: disable=protected-access
+        assert RedirectUrl.query.filter_by(id=100).first().redirect == "https://a.b"
+    assert replica.get_stats()["lag"] == 0.5
+
+
+def test_unsafe_request_is_pinned(app, replica):
+    """
+    Tests that requests modifying data never read replica.
+    """
+    with app.test_request_context(method="DELETE"):
+        app.preprocess_request()
+        with use_replica():
+            assert RedirectUrl.query.filter_by(id=100).first() is None
+    assert replica.get_stats()["reads"] == 0
+
+
+def test_client_is_pinned_after_write(app, client, replica):
+    """
+    Tests that client reads primary for a while after its writes.
+    """
+    response = client.post("/v1/urls/", json={"url": "https://florgon.com"})
+    cookie = response.headers["Set-Cookie"]
+    assert cookie.startswith(f"{PIN_COOKIE}=1;")
+    assert "Max-Age=1;" in cookie
+
+    with app.test_request_context(headers={"Cookie": f"{PIN_COOKIE}=1"}):
+        app.preprocess_request()
+        with use_replica():
+            assert RedirectUrl.query.filter_by(id=100).first() is None
+    assert replica.get_stats()["reads"] == 0
+
+
+def test_client_is_not_pinned_after_view(app, client, replica):
+    """
+    Tests that opening short url (which writes url view) does not pin client.
+    """
+    url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    db.session.commit()
+    with app.test_request_context():
+        open_url = url_for("urls.open_short_url", url_hash=url.hash)
+
+    response = client.get(open_url, headers={"User-Agent": "pytest"})
+    assert response.status_code == 302
+    assert "Set-Cookie" not in response.headers
+    assert UrlView.query.filter_by(url_id=url.id).count() == 1
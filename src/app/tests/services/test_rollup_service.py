@@ -0,0 +1,187 @@
+"""
+    Tests for daily views rollups.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytest
+
+from app.database import crud, db
+from app.database.models.url_view import UrlView
+from app.database.models.url_view_daily import UrlViewDaily
+from app.services.stats import Stats, ViewRecord
+
+
+@pytest.fixture()
+def url(app):  # pylint: disable=redefined-outer-name
+    """
+    Short url with views in two days.
+    """
+    url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    crud.url_view.create_many(
+        db=db,
+        records=[
+            ViewRecord(
+                stats=Stats(ip="127.0.0.1", user_agent="pytest", referer=referer),
+                url_id=url.id,
+                created_at=created_at,
+            )
+            for referer, created_at in (
+                ("https://vk.com/", yesterday),
+                (None, yesterday),
+                ("https://vk.com/", datetime.utcnow()),
+            )
+        ],
+    )
+    crud.url_view.create(
+        db=db, stats=Stats(ip="127.0.0.1", user_agent="pytest", referer=None), url=url
+    )
+    return url
+
+
+def _get_views_summary(value_as: str, **filters) -> dict[str, Any]:
+    """
+    Returns summary of raw url views (as `get_summary`), computed without rollups.
+    """
+    views = UrlView.query.filter_by(**filters).all()
+    dates = Counter(str(view.created_at.date()) for view in views)
+    referers = Counter(
+        view.referer.referer_value if view.referer else "untracked" for view in views
+    )
+
+    def format_values(values: Counter[str]) -> dict[str, int]:
+        if value_as != "percent":
+            return dict(values)
+        return {key: round(count / len(views) * 100) for key, count in values.items()}
+
+    return {
+        "total": len(views),
+        "by_dates": format_values(dates),
+        "by_referers": format_values(referers),
+    }
+
+
+def _assert_rollups_match_views(url_id: int) -> None:
+    for value_as in ("number", "percent"):
+        summary = crud.url_view_daily.get_summary(
+            db,
+            url_id=url_id,
+            referer_views_value_as=value_as,
+            dates_views_value_as=value_as,
+        )
+        assert summary == _get_views_summary(value_as, url_id=url_id)
+
+
+class TestUrlViewDaily:
+    """
+    Tests for daily views rollups.
+    """
+
+    @staticmethod
+    def test_rollups_are_updated_with_views(url):
+        """
+        Tests that rollups written with views give the same stats as views.
+        """
+        assert UrlViewDaily.query.count() == 4
+        assert crud.url_view_daily.get_summary(db, url_id=url.id)["total"] == 4
+        _assert_rollups_match_views(url.id)
+
+    @staticmethod
+    def test_rebuild(url):
+        """
+        Tests that rollups are rebuilt from views.
+        """
+        UrlView.query.filter_by(referer_id=None).delete()
+        db.session.commit()
+
+        assert crud.url_view_daily.rebuild(db=db) == 2
+        _assert_rollups_match_views(url.id)
+
+    @staticmethod
+    def test_delete(url):
+        """
+        Tests that rollups are deleted with views of url.
+        """
+        crud.url_view.delete_by_url_id(db=db, url_id=url.id)
+
+        assert UrlViewDaily.query.count() == 0
+        assert crud.url_view_daily.get_summary(db, url_id=url.id) == {
+            "total": 0,
+            "by_referers": {},
+            "by_dates": {},
+        }
+
+    @staticmethod
+    def test_rollup_command(url, runner):
+        """
+        Tests backfill CLI command.
+        """
+        UrlViewDaily.query.delete()
+        db.session.commit()
+
+        result = runner.invoke(
+            args=["views", "rollup", "--since", datetime.utcnow().strftime("%Y-%m-%d")]
+        )
+
+        assert result.exit_code == 0, result.output
+        assert crud.url_view_daily.get_summary(db, url_id=url.id)["total"] == 2
+
+
+class TestStatsSummary:
+    """
+    Tests for single query stats summary.
+    """
+
+    @staticmethod
+    def test_summary_matches_separate_queries(app):
+        """
+        Tests that summary of paste stats equals to results of separate aggregate queries.
+        """
+        paste = crud.paste_url.create_url(db=db, content="Some paste content")
+        for referer in (
+            "https://vk.com/",
+            "https://florgon.com/",
+            "https://vk.com/",
+            None,
+        ):
+            crud.url_view.create(
+                db=db,
+                stats=Stats(ip="127.0.0.1", user_agent="pytest", referer=referer),
+                paste=paste,
+            )
+
+        for value_as in ("number", "percent"):
+            summary = crud.url_view_daily.get_summary(
+                db,
+                paste_id=paste.id,
+                referer_views_value_as=value_as,
+                dates_views_value_as=value_as,
+            )
+            assert summary == _get_views_summary(value_as, paste_id=paste.id)
+            assert summary["total"] == 4
+
+    @staticmethod
+    def test_url_and_paste_are_required(app):
+        """
+        Tests that summary requires only url or only paste.
+        """
+        with pytest.raises(TypeError):
+            crud.url_view_daily.get_summary(db)
+        with pytest.raises(TypeError):
+            crud.url_view_daily.get_summary(db, url_id=1, paste_id=1)
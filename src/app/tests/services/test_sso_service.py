@@ -0,0 +1,142 @@
+"""
+    Tests for SSO client.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import pytest
+
+from app.database import db
+from app.services.api.errors import ApiErrorCode, ApiErrorException
+from app.services.request.auth import query_auth_data_from_token
+from app.services.request.sso import CircuitBreaker, SsoClient, get_sso_client
+
+
+class FakeTimer:
+    """
+    Controllable clock for circuit breaker tests.
+    """
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSsoClient:
+    """
+    Tests for SsoClient with fake SSO server.
+    """
+
+    @staticmethod
+    def test_connection_is_reused(sso_server):
+        """
+        Tests that requests are sent over one kept alive connection.
+        """
+        sso_server.tokens["valid"] = {"user_id": 1, "scope": "cc"}
+        client = get_sso_client()
+
+        for _ in range(5):
+            assert client.check_token("valid", scope="cc") == {
+                "success": {"user_id": 1, "scope": "cc"}
+            }
+            assert "error" in client.check_token("invalid", scope="cc")
+
+        assert sso_server.requests_count == 10
+        assert len(sso_server.connections) == 1
+        assert client.failures_count == 0
+
+    @staticmethod
+    def test_failed_request_is_retried(sso_server):
+        """
+        Tests that server errors are retried.
+        """
+        sso_server.tokens["valid"] = {"user_id": 1, "scope": "cc"}
+        sso_server.failures = 2
+
+        assert "success" in get_sso_client().check_token("valid", scope="cc")
+        assert sso_server.requests_count == 3
+
+    @staticmethod
+    def test_timeout(sso_server):
+        """
+        Tests that stalled server does not block request longer than timeouts.
+        """
+        sso_server.delay = 0.5
+        client = SsoClient(sso_server.url, read_timeout=0.1, retries=1)
+
+        with pytest.raises(ApiErrorException) as error:
+            client.check_token("valid", scope="cc")
+        assert error.value.api_code == ApiErrorCode.API_EXTERNAL_SERVER_ERROR
+        assert client.failures_count == 2
+
+    @staticmethod
+    def test_circuit_breaker(sso_server):
+        """
+        Tests that requests fail fast while SSO is down, and breaker recovers after timeout.
+        """
+        sso_server.tokens["valid"] = {"user_id": 1, "scope": "cc"}
+        sso_server.failures = 2
+        timer = FakeTimer()
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10, timer=timer)
+        client = SsoClient(sso_server.url, retries=0, breaker=breaker)
+
+        for _ in range(3):
+            with pytest.raises(ApiErrorException):
+                client.check_token("valid", scope="cc")
+        assert breaker.is_open
+        assert sso_server.requests_count == 2
+
+        timer.now = 11
+        assert "success" in client.check_token("valid", scope="cc")
+        assert not breaker.is_open
+
+    @staticmethod
+    def test_breaker_trial_is_released(sso_server, monkeypatch):
+        """
+        Tests that breaker is not left open forever if trial call fails unexpectedly.
+        """
+        sso_server.tokens["valid"] = {"user_id": 1, "scope": "cc"}
+        sso_server.failures = 1
+        timer = FakeTimer()
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10, timer=timer)
+        client = SsoClient(sso_server.url, retries=0, breaker=breaker)
+        with pytest.raises(ApiErrorException):
+            client.check_token("valid", scope="cc")
+        assert breaker.is_open
+
+        timer.now = 11
+        with monkeypatch.context() as patch:
+            patch.setattr(client, "_get_session", lambda: 1 / 0)
+            with pytest.raises(ZeroDivisionError):
+                client.check_token("valid", scope="cc")
+        assert "success" in client.check_token("valid", scope="cc")
+        assert not breaker.is_open
+
+    @staticmethod
+    def test_auth(sso_server):
+        """
+        Tests authentication with token checked by SSO server (and then cached).
+        """
+        sso_server.tokens["valid"] = {"user_id": 5, "scope": "cc"}
+
+        for _ in range(2):
+            auth_data = query_auth_data_from_token(db=db, token="valid")
+            assert auth_data.user_id == auth_data.user.user_id == 5
+        with pytest.raises(ApiErrorException) as error:
+            query_auth_data_from_token(db=db, token="invalid")
+
+        assert error.value.api_code == ApiErrorCode.AUTH_INVALID_TOKEN
+        assert sso_server.requests_count == 2
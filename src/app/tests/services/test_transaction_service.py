@@ -0,0 +1,50 @@
+"""
+    Tests for request transaction.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from app.database import crud, db
+from app.database.models.url import RedirectUrl
+from app.database.transaction import on_commit
+
+
+def test_on_commit_callbacks(app):
+    """
+    Tests that callbacks run after commit and are dropped on rollback.
+    """
+    calls = []
+    crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    on_commit(db, lambda: calls.append("rolled back"))
+    db.session.rollback()
+    crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    on_commit(db, lambda: calls.append("committed"))
+    assert not calls
+
+    db.session.commit()
+    db.session.commit()
+
+    assert calls == ["committed"]
+
+
+def test_failed_request_is_rolled_back(app):
+    """
+    Tests that writes of request are committed only if request is succeeded.
+    """
+    for status in (200, 400, 500):
+        with app.test_request_context():
+            crud.redirect_url.create_url(db=db, redirect_url=f"https://a.b/{status}")
+            app.process_response(app.response_class(status=status))
+
+    assert [url.redirect for url in RedirectUrl.query.all()] == ["https://a.b/200"]
@@ -0,0 +1,109 @@
+"""
+    Tests for views export service.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from app.database import crud, db
+from app.services.stats import Stats, ViewRecord
+from app.services.views_export import (
+    EVENT_FIELDS,
+    format_view_events,
+    get_view_events,
+)
+
+
+def _create_views(url, paste) -> None:
+    now = datetime.utcnow()
+    crud.url_view.create_many(
+        db=db,
+        records=[
+            ViewRecord(
+                stats=Stats(
+                    ip="127.0.0.1",
+                    user_agent=f"pytest/{i % 2}",
+                    referer="https://florgon.com/" if i % 3 else None,
+                ),
+                url_id=url.id if i < 4 else None,
+                paste_id=paste.id if i >= 4 else None,
+                created_at=now - timedelta(days=5 - i),
+            )
+            for i in range(5)
+        ],
+    )
+
+
+class TestViewsExport:
+    """
+    Tests for export of raw url views.
+    """
+
+    @staticmethod
+    def test_events_are_exported_in_batches(app):
+        """
+        Tests that views are exported with dimensions values, in order and by filters.
+        """
+        url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+        paste = crud.paste_url.create_url(db=db, content="Some paste content")
+        _create_views(url, paste)
+
+        events = list(get_view_events(db=db, url_id=url.id, batch_size=3))
+
+        assert len(events) == 4
+        assert [event["viewed_at"] for event in events] == sorted(
+            event["viewed_at"] for event in events
+        )
+        assert events[0]["url_hash"] == url.hash
+        assert events[0]["user_agent"] == "pytest/0"
+        assert events[0]["referer"] is None
+        assert events[1]["referer"] == "https://florgon.com/"
+
+        since = datetime.utcnow() - timedelta(days=2, hours=12)
+        events = list(get_view_events(db=db, paste_id=paste.id, since=since))
+        assert [event["paste_hash"] for event in events] == [paste.hash]
+
+    @staticmethod
+    def test_csv_format(app):
+        """
+        Tests CSV formatting of events (with header even for empty export).
+        """
+        event = dict.fromkeys(EVENT_FIELDS, "value")
+
+        exported = "".join(format_view_events(iter([event, event]), "csv"))
+        rows = list(csv.DictReader(io.StringIO(exported)))
+        assert rows == [event, event]
+        assert "".join(format_view_events(iter([]), "csv")).strip() == ",".join(
+            EVENT_FIELDS
+        )
+
+    @staticmethod
+    def test_export_command(app, runner):
+        """
+        Tests export CLI command.
+        """
+        url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+        paste = crud.paste_url.create_url(db=db, content="Some paste content")
+        _create_views(url, paste)
+
+        result = runner.invoke(args=["views", "export", "--url-hash", url.hash])
+
+        assert result.exit_code == 0, result.output
+        events = [json.loads(line) for line in result.output.splitlines()]
+        assert len(events) == 4
+        assert runner.invoke(args=["views", "export", "--url-hash", "x"]).exit_code
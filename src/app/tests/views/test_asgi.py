@@ -0,0 +1,141 @@
+"""
+    Tests for async (ASGI) serving mode.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+from flask import url_for
+
+from app.asgi import AsgiApp
+from app.database import crud, db
+from app.database.models.url_view import UrlView
+
+
+def _request(app, url: str, headers: dict | None = None) -> tuple[int, dict, bytes]:
+    """
+    Sends GET request to ASGI app (with database engine of single event loop).
+    :return: status, headers and body of response
+    """
+    asgi_app = AsgiApp(app)
+    split_url = urlsplit(url)
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": split_url.path,
+        "query_string": split_url.query.encode(),
+        "root_path": "",
+        "headers": [
+            (name.lower().encode(), value.encode())
+            for name, value in (headers or {}).items()
+        ],
+        "client": ("127.0.0.1", 12345),
+        "server": ("localhost", 80),
+    }
+    messages = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    async def call() -> None:
+        try:
+            await asgi_app(scope, receive, send)
+        finally:
+            await asgi_app.shutdown()
+
+    asyncio.run(call())
+    status = messages[0]["status"]
+    response_headers = {
+        name.decode(): value.decode() for name, value in messages[0]["headers"]
+    }
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return status, response_headers, body
+
+
+def test_open_short_url(app):
+    """
+    Test for async `urls/<url_hash>/open` method: redirect and view.
+    """
+    url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    db.session.commit()
+    with app.test_request_context():
+        open_url = url_for("urls.open_short_url", url_hash=url.hash)
+
+    status, headers, _ = _request(app, open_url, {"User-Agent": "pytest"})
+
+    assert status == 302
+    assert headers["location"] == "https://florgon.com"
+    assert UrlView.query.filter_by(url_id=url.id).count() == 1
+
+
+def test_url_info_is_the_same(app, client):
+    """
+    Test that async `urls/<url_hash>/` method returns the same response as sync one.
+    """
+    url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    db.session.commit()
+    with app.test_request_context():
+        info_url = url_for("urls.get_info_about_url", url_hash=url.hash)
+
+    status, headers, body = _request(app, info_url)
+
+    assert status == 200
+    assert headers["content-type"] == "application/json"
+    assert json.loads(body) == client.get(info_url).json
+
+    status, _, body = _request(app, info_url.replace(url.hash, "invalid"))
+    assert status == 404
+    assert json.loads(body) == client.get(info_url.replace(url.hash, "invalid")).json
+
+
+def test_paste_is_burned(app):
+    """
+    Test for async `pastes/<url_hash>/` method: burn after read paste is read once.
+    """
+    paste = crud.paste_url.create_url(
+        db=db, content="Burned paste content", burn_after_read=True
+    )
+    db.session.commit()
+    with app.test_request_context():
+        info_url = url_for("pastes.get_paste_info", url_hash=paste.hash)
+
+    status, _, body = _request(app, info_url)
+    assert status == 200
+    assert json.loads(body)["success"]["paste"]["text"] == "Burned paste content"
+
+    status, _, _ = _request(app, info_url)
+    assert status == 404
+
+
+def test_sync_methods(app, client):
+    """
+    Test that methods without async version are served by sync app.
+    """
+    with app.test_request_context():
+        server_time_url = url_for("utils.get_server_time")
+
+    status, _, body = _request(app, server_time_url)
+
+    assert status == 200
+    assert "server_time" in json.loads(body)["success"]
+    status, _, _ = _request(app, "/v1/unknown")
+    assert status == client.get("/v1/unknown").status_code
@@ -0,0 +1,153 @@
+"""
+    Tests for pastes methods of the API.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+
+from flask import url_for
+
+from app.database import crud, db
+from app.database.models.url_view import UrlView
+
+
+def test_create_pastes_batch(app, client, count_queries):
+    """
+    Test for `pastes/batch` POST method of the API: order and per-item errors.
+    """
+    with app.test_request_context():
+        batch_url = url_for("pastes.create_pastes_batch")
+    items = [
+        {"text": "First paste text"},
+        {"text": "short"},
+        {"text": "Second paste text", "language": "python", "burn_after_read": True},
+        {"language": "python"},
+    ]
+
+    with count_queries() as queries:
+        response = client.post(batch_url, json={"pastes": items})
+
+    assert response.status_code == 200
+    results = response.json["success"]["pastes"]
+    assert results[0]["paste"]["text"] == "First paste text"
+    assert results[0]["paste"]["language"] == "plain"
+    assert results[2]["paste"]["language"] == "python"
+    assert results[2]["paste"]["burn_after_read"]
+    assert results[1]["error"]["code"] == 3
+    assert results[3]["error"]["code"] == 3
+    assert len([query for query in queries if query.startswith("INSERT")]) == 1
+
+
+def test_get_pastes_batch(app, client, count_queries):
+    """
+    Test for `pastes/batch` GET method of the API: single query, bulk views,
+    repeated hashes and burn after read pastes.
+    """
+    paste = crud.paste_url.create_url(db=db, content="Some paste content")
+    burned_paste = crud.paste_url.create_url(
+        db=db, content="Burned paste content", burn_after_read=True
+    )
+    hashes = [paste.hash, "invalid", burned_paste.hash, paste.hash]
+    with app.test_request_context():
+        batch_url = url_for("pastes.get_pastes_batch", hashes=",".join(hashes))
+
+    with count_queries() as queries:
+        response = client.get(batch_url)
+
+    assert response.status_code == 200
+    results = response.json["success"]["pastes"]
+    # Repeated hash is returned once.
+    assert [result["paste"]["hash"] for result in results if "paste" in result] == [
+        paste.hash,
+        burned_paste.hash,
+    ]
+    assert len(results) == 3
+    assert results[1]["error"]["code"] == 8
+    assert results[2]["paste"]["is_deleted"]
+    assert (
+        len([query for query in queries if query.startswith("SELECT paste_urls")]) == 1
+    )
+    assert UrlView.query.filter_by(paste_id=paste.id).count() == 1
+    assert UrlView.query.filter_by(paste_id=burned_paste.id).count() == 1
+
+    results = client.get(batch_url).json["success"]["pastes"]
+    assert "paste" in results[0]
+    assert results[2]["error"]["code"] == 8
+
+
+def test_burn_after_read_paste_is_read_once(app, client):
+    """
+    Test that burn after read paste is returned only to the first reader,
+    even if second reader resolved it before it was burned.
+    """
+    paste = crud.paste_url.create_url(
+        db=db, content="Burned paste content", burn_after_read=True
+    )
+    snapshot = crud.paste_url.get_snapshot_by_hash(paste.hash)
+
+    assert crud.paste_url.burn(db, [snapshot.id]) == {snapshot.id}
+    assert crud.paste_url.burn(db, [snapshot.id]) == set()
+    with app.test_request_context():
+        response = client.get(url_for("pastes.get_paste_info", url_hash=paste.hash))
+    assert response.status_code == 404
+
+
+def test_export_pastes(app, client, sso_server):
+    """
+    Test for `pastes/export` method of the API: streamed pastes with views counts.
+    """
+    sso_server.tokens["token"] = {"user_id": 1, "scope": "cc"}
+    crud.user.get_or_create(db=db, user_id=1)
+    paste = crud.paste_url.create_url(db=db, content="Some paste content", owner_id=1)
+    with app.test_request_context():
+        client.get(url_for("pastes.get_paste_info", url_hash=paste.hash))
+        export_url = url_for("pastes.export_pastes")
+
+    response = client.get(export_url, headers={"Authorization": "token"})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["text"] == "Some paste content"
+    assert lines[0]["views"] == 1
+
+
+def test_paste_queries(app, client, count_queries):
+    """
+    Test for `pastes/` methods of the API: paste and its view are written with one
+    commit each, without selecting created rows again.
+    """
+    with app.test_request_context():
+        create_url = url_for("pastes.create_paste")
+
+    with count_queries() as queries:
+        response = client.post(create_url, json={"text": "Some paste content"})
+    assert response.status_code == 200
+    assert [query.split()[0] for query in queries] == ["INSERT", "COMMIT"]
+
+    with app.test_request_context():
+        paste_url = url_for(
+            "pastes.get_paste_info", url_hash=response.json["success"]["paste"]["hash"]
+        )
+    with count_queries() as queries:
+        response = client.get(paste_url, headers={"User-Agent": "pytest"})
+    assert response.status_code == 200
+    assert [query.split()[0] for query in queries] == [
+        "SELECT",  # Paste (not cached yet).
+        "INSERT",  # User agent.
+        "INSERT",  # View.
+        "INSERT",  # Rollup.
+        "COMMIT",
+    ]
@@ -0,0 +1,283 @@
+"""
+    Tests for urls methods of the API.
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+
+from flask import url_for
+
+from app.database import crud, db
+from app.database.models.url_view import UrlView
+from app.services.stats import Stats
+from app.services.qr import get_qr_prerenderer, get_qr_render_cache
+
+
+def test_qr_code_is_cached(app, client):
+    """
+    Test for `urls/<url_hash>/qr` method of the API: caching headers and cache.
+    """
+    url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    with app.test_request_context():
+        qr_url = url_for("urls.generate_qr_code_for_url", url_hash=url.hash)
+
+    response = client.get(qr_url, query_string={"result_type": "png"})
+    assert response.status_code == 200
+    assert response.content_type == "image/png"
+    assert "immutable" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+
+    cached_response = client.get(qr_url, query_string={"result_type": "png"})
+    assert cached_response.data == response.data
+    assert cached_response.headers["ETag"] == etag
+    assert get_qr_render_cache().hits == 1
+
+    not_modified_response = client.get(
+        qr_url, query_string={"result_type": "png"}, headers={"If-None-Match": etag}
+    )
+    assert not_modified_response.status_code == 304
+    assert not not_modified_response.data
+    assert client.get(qr_url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_qr_code_is_prerendered(app, client):
+    """
+    Test for `prerender_qr` param of `urls/` method: first QR code request is cached.
+    """
+    with app.test_request_context():
+        create_url = url_for("urls.create_url")
+    response = client.post(
+        create_url, json={"url": "https://florgon.com", "prerender_qr": True}
+    )
+    assert response.status_code == 200
+    url_hash = response.json["success"]["url"]["hash"]
+    with app.test_request_context():
+        qr_url = url_for("urls.generate_qr_code_for_url", url_hash=url_hash)
+
+    get_qr_prerenderer().wait()
+    cache = get_qr_render_cache()
+    assert client.get(qr_url).status_code == 200
+    assert client.get(qr_url, query_string={"result_type": "png"}).status_code == 200
+    assert cache.hits == 2
+    assert get_qr_prerenderer().get_stats()["rendered"] == 2
+
+
+def test_create_urls_batch(app, client, count_queries):
+    """
+    Test for `urls/batch` method of the API: order, per-item errors and single INSERT.
+    """
+    with app.test_request_context():
+        batch_url = url_for("urls.create_urls_batch")
+    items = [
+        {"url": "https://florgon.com/1"},
+        {"url": "not an url"},
+        {"url": "florgon.com/2", "stats_is_public": True},
+        "https://florgon.com/3",
+        {"url": "https://florgon.com/4", "stats_is_public": "yes"},
+    ]
+
+    with count_queries() as queries:
+        response = client.post(batch_url, json={"urls": items})
+
+    assert response.status_code == 200
+    results = response.json["success"]["urls"]
+    assert len(results) == len(items)
+    assert results[0]["url"]["redirect_url"] == "https://florgon.com/1"
+    assert results[2]["url"]["redirect_url"] == "https://florgon.com/2"
+    assert "stats" in results[2]["url"]["_links"]
+    assert "stats" not in results[0]["url"]["_links"]
+    for index in (1, 3, 4):
+        assert results[index]["error"]["code"] == 3
+    assert len([query for query in queries if query.startswith("INSERT")]) == 1
+
+    created = crud.redirect_url.get_snapshot_by_hash(results[2]["url"]["hash"])
+    assert created.redirect == "https://florgon.com/2"
+    assert created.stats_is_public
+
+    assert client.post(batch_url, json={"urls": []}).status_code == 400
+    app.config["URLS_BATCH_MAX_SIZE"] = 1
+    assert client.post(batch_url, json={"urls": items[:2]}).status_code == 400
+
+
+def test_urls_list_pagination(app, client, sso_server, count_queries):
+    """
+    Test for `urls/` GET method of the API: keyset pagination and fields projection.
+    """
+    sso_server.tokens["token"] = {"user_id": 1, "scope": "cc"}
+    crud.user.get_or_create(db=db, user_id=1)
+    urls = [
+        crud.redirect_url.create_url(
+            db=db, redirect_url=f"https://florgon.com/{i}", owner_id=1
+        )
+        for i in range(5)
+    ]
+    crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com/", owner_id=2)
+    with app.test_request_context():
+        list_url = url_for("urls.urls_list")
+
+    hashes, cursor = [], None
+    while True:
+        query_string = {"limit": 2, "fields": "hash,redirect_url"}
+        if cursor:
+            query_string["cursor"] = cursor
+        with count_queries() as queries:
+            response = client.get(
+                list_url, query_string=query_string, headers={"Authorization": "token"}
+            )
+        assert response.status_code == 200
+        url_queries = [query for query in queries if "FROM redirect_urls" in query]
+        assert len(url_queries) == 1
+        assert "expiration_date" not in url_queries[0]
+        page = response.json["success"]
+        assert all(set(url) == {"hash", "redirect_url"} for url in page["urls"])
+        hashes += [url["hash"] for url in page["urls"]]
+        cursor = page["cursor"]
+        if cursor is None:
+            break
+
+    assert hashes == [url.hash for url in reversed(urls)]
+    response = client.get(list_url, headers={"Authorization": "token"})
+    assert len(response.json["success"]["urls"]) == 5
+    assert "_links" in response.json["success"]["urls"][0]
+
+    for query_string in ({"limit": 0}, {"cursor": "invalid"}, {"fields": "text"}):
+        response = client.get(
+            list_url, query_string=query_string, headers={"Authorization": "token"}
+        )
+        assert response.status_code == 400
+
+
+def test_export_urls(app, client, sso_server):
+    """
+    Test for `urls/export` method of the API: streamed urls with views counts.
+    """
+    sso_server.tokens["token"] = {"user_id": 1, "scope": "cc"}
+    crud.user.get_or_create(db=db, user_id=1)
+    urls = [
+        crud.redirect_url.create_url(
+            db=db, redirect_url=f"https://florgon.com/{i}", owner_id=1
+        )
+        for i in range(3)
+    ]
+    crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com/", owner_id=2)
+    stats = Stats(ip="127.0.0.1", user_agent="pytest", referer=None)
+    for _ in range(2):
+        crud.url_view.create(db=db, url=urls[1], stats=stats)
+    with app.test_request_context():
+        export_url = url_for("urls.export_urls")
+
+    response = client.get(export_url, headers={"Authorization": "token"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.is_streamed
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [line["hash"] for line in lines] == [url.hash for url in urls]
+    assert [line["views"] for line in lines] == [0, 2, 0]
+    assert "stats" in lines[0]["_links"]
+
+
+def test_export_url_views(app, client, sso_server):
+    """
+    Test for `urls/<url_hash>/views/export` method of the API: CSV and ownership.
+    """
+    sso_server.tokens["token"] = {"user_id": 1, "scope": "cc"}
+    crud.user.get_or_create(db=db, user_id=1)
+    url = crud.redirect_url.create_url(
+        db=db, redirect_url="https://florgon.com", owner_id=1
+    )
+    other_url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    stats = Stats(ip="127.0.0.1", user_agent="pytest", referer="https://florgon.com/")
+    for short_url in (url, url, other_url):
+        crud.url_view.create(db=db, url=short_url, stats=stats)
+    with app.test_request_context():
+        export_url = url_for("urls.export_url_views", url_hash=url.hash)
+        other_export_url = url_for("urls.export_url_views", url_hash=other_url.hash)
+        views_export_url = url_for("urls.export_views")
+
+    response = client.get(
+        export_url, query_string={"format": "csv"}, headers={"Authorization": "token"}
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    lines = response.data.decode().splitlines()
+    assert lines[0] == "viewed_at,url_hash,paste_hash,ip,user_agent,referer"
+    assert len(lines) == 3
+    assert lines[1].endswith(f",{url.hash},,127.0.0.1,pytest,https://florgon.com/")
+
+    response = client.get(views_export_url, headers={"Authorization": "token"})
+    assert len(response.data.decode().splitlines()) == 2
+    headers = {"Authorization": "token"}
+    assert client.get(other_export_url, headers=headers).status_code == 403
+    response = client.get(export_url, query_string={"format": "xml"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_create_url_queries(app, client, sso_server, count_queries):
+    """
+    Test for `urls/` method of the API: url (and user) are created with one commit,
+    without selecting created rows again.
+    """
+    sso_server.tokens["token"] = {"user_id": 1, "scope": "cc"}
+    with app.test_request_context():
+        create_url = url_for("urls.create_url")
+
+    with count_queries() as queries:
+        response = client.post(create_url, json={"url": "https://florgon.com"})
+    assert response.status_code == 200
+    assert [query.split()[0] for query in queries] == ["INSERT", "COMMIT"]
+
+    with count_queries() as queries:
+        response = client.post(
+            create_url,
+            json={"url": "https://florgon.com"},
+            headers={"Authorization": "token"},
+        )
+    assert response.status_code == 200
+    assert [query.split()[0] for query in queries] == [
+        "SELECT",  # User.
+        "INSERT",  # User.
+        "INSERT",  # Url.
+        "COMMIT",
+    ]
+    assert response.json["success"]["url"]["_links"]["stats"]
+
+
+def test_open_short_url_queries(app, client, count_queries):
+    """
+    Test for `urls/<url_hash>/open` method of the API: view is written with one commit.
+    """
+    url = crud.redirect_url.create_url(db=db, redirect_url="https://florgon.com")
+    db.session.commit()
+    with app.test_request_context():
+        open_url = url_for("urls.open_short_url", url_hash=url.hash)
+    headers = {"User-Agent": "pytest", "Referer": "https://florgon.com/"}
+
+    with count_queries() as queries:
+        assert client.get(open_url, headers=headers).status_code == 302
+    assert [query.split()[0] for query in queries] == [
+        "SELECT",  # Url (not cached yet).
+        "INSERT",  # User agent.
+        "INSERT",  # Referer.
+        "INSERT",  # View.
+        "INSERT",  # Rollup.
+        "COMMIT",
+    ]
+
+    with count_queries() as queries:
+        assert client.get(open_url, headers=headers).status_code == 302
+    assert [query.split()[0] for query in queries] == ["INSERT", "INSERT", "COMMIT"]
+    assert UrlView.query.filter_by(url_id=url.id).count() == 2
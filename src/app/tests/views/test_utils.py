@@ -29,3 +29,21 @@ def test_read_utils_get_server_time(app, client):
     assert "v" in response.json
     assert "success" in response.json
     assert "server_time" in response.json["success"]
+
+
+def test_metrics(app, client):
+    """
+    Test for `metrics` method of the API: it is available only if enabled.
+    """
+    with app.test_request_context():
+        metrics_url = url_for("utils.get_metrics")
+
+    assert client.get(metrics_url).status_code == 404
+
+    app.config["METRICS_ENABLED"] = True
+    response = client.get(metrics_url)
+
+    assert response.status_code == 200
+    assert response.json["success"]["qr_render_pool"]["pending"] == 0
+    assert "url_cache" in response.json["success"]
+    assert "database_pool" in response.json["success"]
@@ -15,11 +15,23 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-from flask import Blueprint, request, Response
+from dataclasses import replace
+from typing import Any
+
+from flask import Blueprint, current_app, request, Response
 
 from app.services.api.errors import ApiErrorException, ApiErrorCode
-from app.services.api.response import api_success
-from app.serializers.paste import serialize_paste, serialize_pastes
+from app.services.api.response import (
+    api_ndjson_stream,
+    api_success,
+    serialize_api_error,
+)
+from app.serializers.paste import (
+    PASTE_FIELDS,
+    get_paste_columns,
+    serialize_paste,
+    serialize_pastes,
+)
 from app.serializers.paste_stats import serialize_paste_stats
 from app.services.request.auth import (
     try_query_auth_data_from_request,
@@ -27,12 +39,20 @@ from app.services.request.auth import (
     auth_required,
 )
 from app.services.request.auth_data import AuthData
-from app.services.request.params import get_post_param
+from app.services.request.params import (
+    get_batch_param,
+    get_fields_param,
+    get_page_params,
+    get_post_param,
+)
+from app.services.hashids_codec import get_hashids_codec
+from app.services.url.stats import collect_stats_and_add_paste_views
+from app.services.views_export import get_view_events_response
 from app.services.url_mixin import (
     validate_short_url,
     validate_url_owner,
 )
-from app.services.stats import is_accessed_to_stats, get_stats, validate_dates_views_value_as, validate_referer_views_value_as
+from app.services.stats import is_accessed_to_stats, validate_dates_views_value_as, validate_referer_views_value_as
 from app.services.paste.paste import validate_paste_text, validate_paste_language
 from app.database import db, crud
 
@@ -43,10 +63,41 @@ bp_pastes = Blueprint("pastes", __name__)
 @auth_required
 def get_pastes_list(auth_data: AuthData):
     """
-    Returns list of pastes. Auth required.
+    Returns list of pastes, newest first. Auth required.
+    GET params:
+     - int `limit` - Max count of pastes. Defaults to 100, may be up to 1000.
+     - str `cursor` - Cursor of the next page (returned with previous page).
+     - str `fields` - Comma separated fields of pastes. Defaults to all fields.
+    """
+    limit, before_id = get_page_params()
+    fields = get_fields_param(PASTE_FIELDS)
+    urls = crud.paste_url.get_by_owner_id(
+        owner_id=auth_data.user_id,
+        # One more paste is loaded to know if there is next page.
+        limit=limit + 1,
+        before_id=before_id,
+        columns=get_paste_columns(fields),
+    )
+    response = serialize_pastes(urls[:limit], include_stats=False, fields=fields)
+    response["cursor"] = urls[limit - 1].hash if len(urls) > limit else None
+    return api_success(response)
+
+@bp_pastes.route("/export", methods=["GET"])
+@auth_required
+def export_pastes(auth_data: AuthData):
+    """
+    Exports all user's pastes with their views counts. Auth required.
+    Response is streamed as newline-delimited JSON (paste per line).
     """
-    urls = crud.paste_url.get_by_owner_id(owner_id=auth_data.user_id)
-    return api_success(serialize_pastes(urls, include_stats=False))
+    rows = crud.paste_url.get_with_views_by_owner_id(
+        db=db,
+        owner_id=auth_data.user_id,
+        batch_size=current_app.config["EXPORT_BATCH_SIZE"],
+    )
+    return api_ndjson_stream(
+        {**serialize_paste(url, include_stats=True, in_list=True), "views": views_count}
+        for url, views_count in rows
+    )
 
 @bp_pastes.route("/", methods=["POST"])
 def create_paste():
@@ -87,21 +138,148 @@ def get_paste_info(url_hash: str):
     Returns info about paste and links to stats if user is accessed to stats.
     """
     _, auth_data = try_query_auth_data_from_request(db=db)
-    short_url = validate_short_url(crud.paste_url.get_by_hash(url_hash=url_hash))
+    short_url = validate_short_url(
+        crud.paste_url.get_snapshot_by_hash(url_hash=url_hash)
+    )
     include_stats = is_accessed_to_stats(
         url=short_url, owner_id=auth_data.user_id if auth_data else None
     )
 
-    crud.url_view.create(
-        db=db,
-        paste=short_url,
-        stats=get_stats()
-    )
     if short_url.burn_after_read:
-        crud.paste_url.delete(db, short_url)
+        # Paste may be read concurrently, only one reader gets it.
+        if not crud.paste_url.burn(db, [short_url.id]):
+            raise ApiErrorException(
+                ApiErrorCode.API_ITEM_NOT_FOUND, "Url hash is invalid/not specified"
+            )
+        short_url = replace(short_url, is_deleted=True)
+    collect_stats_and_add_paste_views(db, [short_url])
 
     return api_success(serialize_paste(short_url, include_stats=include_stats))
 
+@bp_pastes.route("/batch", methods=["POST"])
+def create_pastes_batch():
+    """
+    Creates many pastes at once.
+    JSON params:
+     - list `pastes` - Objects with `text`, `language`, `stats_is_public`
+       and `burn_after_read` fields (see `create_paste`).
+    Invalid items do not fail the batch, error is returned in place of such item.
+    """
+    items = get_batch_param("pastes")
+
+    is_authorized, auth_data = try_query_auth_data_from_request(db=db)
+    owner_id = auth_data.user_id if is_authorized else None
+
+    results: list[dict | None] = [None] * len(items)
+    valid_indexes, pastes = [], []
+    for index, item in enumerate(items):
+        try:
+            pastes.append(_validate_batch_item(item))
+        except ApiErrorException as e:
+            results[index] = serialize_api_error(e.api_code, e.message, e.data)
+            continue
+        valid_indexes.append(index)
+
+    urls = crud.paste_url.create_urls(db=db, pastes=pastes, owner_id=owner_id)
+    url_hashes = get_hashids_codec().encode_many(url.id for url in urls)
+    for index, url, url_hash in zip(valid_indexes, urls, url_hashes):
+        include_stats = is_accessed_to_stats(url=url, owner_id=owner_id)
+        results[index] = serialize_paste(
+            url, include_stats=include_stats, url_hash=url_hash
+        )
+
+    return api_success({"pastes": results})
+
+@bp_pastes.route("/batch", methods=["GET"])
+def get_pastes_batch():
+    """
+    Returns info about many pastes at once (as `get_paste_info`).
+    GET params:
+     - str `hashes` - Comma separated hashes of pastes (repeated hashes are returned once).
+    Pastes are resolved with single query and views are recorded in bulk.
+    Burn after read paste is returned only once, even for concurrent requests.
+    Invalid items do not fail the batch, error is returned in place of such item.
+    """
+    # Repeated hash is returned once, so burn after read paste is not returned twice.
+    url_hashes = get_batch_param(
+        "hashes",
+        list(dict.fromkeys(filter(None, request.args.get("hashes", "").split(",")))),
+    )
+    _, auth_data = try_query_auth_data_from_request(db=db)
+    owner_id = auth_data.user_id if auth_data else None
+
+    snapshots = crud.paste_url.get_snapshots_by_hashes(url_hashes)
+    pastes, errors = {}, {}
+    for url_hash, snapshot in snapshots.items():
+        try:
+            pastes[url_hash] = validate_short_url(snapshot)
+        except ApiErrorException as e:
+            errors[url_hash] = serialize_api_error(e.api_code, e.message, e.data)
+
+    burned_ids = crud.paste_url.burn(
+        db, [paste.id for paste in pastes.values() if paste.burn_after_read]
+    )
+    for url_hash, paste in list(pastes.items()):
+        if not paste.burn_after_read:
+            continue
+        if paste.id in burned_ids:
+            pastes[url_hash] = replace(paste, is_deleted=True)
+            continue
+        # Burned by another reader.
+        del pastes[url_hash]
+        errors[url_hash] = serialize_api_error(
+            ApiErrorCode.API_ITEM_NOT_FOUND, "Url hash is invalid/not specified"
+        )
+    collect_stats_and_add_paste_views(
+        db, list({paste.id: paste for paste in pastes.values()}.values())
+    )
+
+    results = []
+    for url_hash in url_hashes:
+        if url_hash in errors:
+            results.append(errors[url_hash])
+            continue
+        paste = pastes[url_hash]
+        include_stats = is_accessed_to_stats(url=paste, owner_id=owner_id)
+        results.append(
+            serialize_paste(paste, include_stats=include_stats, url_hash=url_hash)
+        )
+    return api_success({"pastes": results})
+
+def _validate_batch_item(item: Any) -> dict[str, Any]:
+    """
+    Validates item of pastes batch.
+    :rtype: dict[str, Any]
+    :return: paste fields for `crud.paste_url.create_urls`
+    :raises ApiErrorException: when item is invalid
+    """
+    if not isinstance(item, dict):
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST, "item must be an object!"
+        )
+    text = item.get("text")
+    if not isinstance(text, str):
+        raise ApiErrorException(ApiErrorCode.API_INVALID_REQUEST, "text is required!")
+    validate_paste_text(text)
+    language = item.get("language")
+    if language is not None and not isinstance(language, str):
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST, "`language` must be string!"
+        )
+    validate_paste_language(language)
+    for name in ("stats_is_public", "burn_after_read"):
+        if not isinstance(item.get(name, False), bool):
+            raise ApiErrorException(
+                ApiErrorCode.API_INVALID_REQUEST, f"`{name}` must be bool!"
+            )
+
+    return {
+        "content": text,
+        "language": language if language else "plain",
+        "stats_is_public": item.get("stats_is_public", False),
+        "burn_after_read": item.get("burn_after_read", False),
+    }
+
 @bp_pastes.route("/<url_hash>/", methods=["DELETE"])
 @auth_required
 def delete_paste(auth_data: AuthData, url_hash: str):
@@ -150,7 +328,9 @@ def get_paste_stats(url_hash: str):
     Returns statistics about paste. Auth required if
     stats is private (not public).
     """
-    short_url = validate_short_url(crud.paste_url.get_by_hash(url_hash=url_hash))
+    short_url = validate_short_url(
+        crud.paste_url.get_snapshot_by_hash(url_hash=url_hash)
+    )
     if not short_url.stats_is_public:
         auth_data = query_auth_data_from_request(db=db)
         validate_url_owner(short_url, owner_id=auth_data.user_id)
@@ -166,10 +346,29 @@ def get_paste_stats(url_hash: str):
     return api_success(response)
 
 
+@bp_pastes.route("/<url_hash>/views/export", methods=["GET"])
+@auth_required
+def export_paste_views(auth_data: AuthData, url_hash: str):
+    """
+    Exports raw views of paste. Ownership required.
+    GET params:
+     - str `format` - `ndjson` or `csv`. Defaults to `ndjson`.
+     - str `since`, `until` - ISO 8601 bounds of time range (`until` is excluded).
+    """
+    short_url = validate_short_url(
+        crud.paste_url.get_snapshot_by_hash(url_hash=url_hash, only_active=False),
+        allow_expired=True,
+    )
+    validate_url_owner(url=short_url, owner_id=auth_data.user_id)
+    return get_view_events_response(db=db, paste_id=short_url.id)
+
+
 @bp_pastes.route("/<url_hash>/stats", methods=["DELETE"])
 @auth_required
 def clear_paste_stats(auth_data: AuthData, url_hash: str):
     short_url = validate_short_url(crud.paste_url.get_by_hash(url_hash=url_hash))
     validate_url_owner(short_url, owner_id=auth_data.user_id)
-    crud.url_view.delete_by_paste_id(db=db, paste_id=short_url.id)
+    crud.url_view.delete_by_paste_id(
+        db=db, paste_id=short_url.id, since=short_url.created_at
+    )
     return Response(status=204)
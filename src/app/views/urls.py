@@ -16,20 +16,42 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from flask import Blueprint, Response, request, redirect, url_for
+from typing import Any
 
-from app.serializers.url import serialize_url, serialize_urls
+from flask import Blueprint, Response, current_app, request, redirect, url_for
+
+from app.serializers.url import (
+    URL_FIELDS,
+    get_url_columns,
+    serialize_url,
+    serialize_urls,
+)
 from app.serializers.url_stats import serialize_url_stats
 from app.services.api.errors import ApiErrorCode, ApiErrorException
-from app.services.api.response import api_error, api_success
-from app.services.request.params import get_post_param
+from app.services.api.response import (
+    api_error,
+    api_ndjson_stream,
+    api_success,
+    serialize_api_error,
+)
+from app.services.request.params import (
+    get_batch_param,
+    get_fields_param,
+    get_page_params,
+    get_post_param,
+)
+from app.services.hashids_codec import get_hashids_codec
 from app.services.qr import (
     validate_qr_result_type,
     validate_qr_code_scale,
     validate_qr_code_quiet_zone,
     generate_qr_code,
+    get_qr_code_key,
+    get_cache_headers_for_qr_code,
+    get_qr_prerenderer,
 )
 from app.database import crud, db
+from app.database.transaction import on_commit
 from app.services.url_mixin import (
     validate_short_url,
     validate_url_owner,
@@ -45,6 +67,7 @@ from app.services.stats import (
     validate_dates_views_value_as,
     validate_referer_views_value_as,
 )
+from app.services.views_export import get_view_events_response
 from app.services.url.stats import (
     collect_stats_and_add_view,
 )
@@ -59,11 +82,16 @@ def create_url():
     POST params:
      - str `url` -- long url.
      - bool `stats_is_public` (auth required) -- Make stats awailable for all.
+     - bool `prerender_qr` -- Render QR codes in background, so they are cached
+       before first request. Defaults to `QR_PRERENDER_ENABLED` config.
     """
     long_url = get_post_param("url")
     validate_url(long_url)
 
     stats_is_public = get_post_param("stats_is_public", "False", bool)
+    prerender_qr = get_post_param(
+        "prerender_qr", current_app.config["QR_PRERENDER_ENABLED"], bool
+    )
 
     is_authorized, auth_data = try_query_auth_data_from_request(db=db)
     if is_authorized and auth_data:
@@ -77,19 +105,146 @@ def create_url():
         stats_is_public=stats_is_public,
         owner_id=owner_id,
     )
+    if prerender_qr:
+        # Rendered after commit, so QR code of rolled back url is not rendered.
+        prerenderer, qr_code_text = get_qr_prerenderer(), _get_qr_code_text(url.hash)
+        on_commit(db, lambda: prerenderer.submit(qr_code_text))
 
     include_stats = is_accessed_to_stats(url=url, owner_id=owner_id)
     return api_success(serialize_url(url, include_stats=include_stats))
 
 
+@bp_urls.route("/batch", methods=["POST"])
+def create_urls_batch():
+    """
+    Method creates many short urls at once.
+    JSON params:
+     - list `urls` -- objects with `url` and `stats_is_public` (as in `create_url`).
+    Invalid items do not fail the batch, error is returned in place of such item.
+    """
+    items = get_batch_param("urls")
+
+    is_authorized, auth_data = try_query_auth_data_from_request(db=db)
+    if is_authorized and auth_data:
+        owner_id = auth_data.user_id
+    else:
+        owner_id = None
+
+    results: list[dict | None] = [None] * len(items)
+    valid_indexes, redirect_urls = [], []
+    for index, item in enumerate(items):
+        try:
+            redirect_urls.append(_validate_batch_item(item))
+        except ApiErrorException as e:
+            results[index] = serialize_api_error(e.api_code, e.message, e.data)
+            continue
+        valid_indexes.append(index)
+
+    urls = crud.redirect_url.create_urls(
+        db=db, redirect_urls=redirect_urls, owner_id=owner_id
+    )
+    url_hashes = get_hashids_codec().encode_many(url.id for url in urls)
+    for index, url, url_hash in zip(valid_indexes, urls, url_hashes):
+        include_stats = is_accessed_to_stats(url=url, owner_id=owner_id)
+        results[index] = serialize_url(
+            url, include_stats=include_stats, url_hash=url_hash
+        )
+
+    return api_success({"urls": results})
+
+
+def _validate_batch_item(item: Any) -> tuple[str, bool]:
+    """
+    Validates item of urls batch.
+    :rtype: tuple[str, bool]
+    :return: long url and `stats_is_public`
+    :raises ApiErrorException: when item is invalid
+    """
+    if not isinstance(item, dict):
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST, "item must be an object!"
+        )
+    long_url = item.get("url")
+    if long_url is not None and not isinstance(long_url, str):
+        raise ApiErrorException(ApiErrorCode.API_INVALID_REQUEST, "url is invalid!")
+    validate_url(long_url)
+
+    stats_is_public = item.get("stats_is_public", False)
+    if not isinstance(stats_is_public, bool):
+        raise ApiErrorException(
+            ApiErrorCode.API_INVALID_REQUEST, "`stats_is_public` must be bool!"
+        )
+    return long_url, stats_is_public
+
+
 @bp_urls.route("/", methods=["GET"])
 @auth_required
 def urls_list(auth_data: AuthData):
     """
-    Method returns all user's urls. Auth required.
+    Method returns user's urls, newest first. Auth required.
+    GET params:
+     - int `limit` - Max count of urls. Defaults to 100, may be up to 1000.
+     - str `cursor` - Cursor of the next page (returned with previous page).
+     - str `fields` - Comma separated fields of urls to return. Defaults to all fields.
     """
-    urls = crud.redirect_url.get_by_owner_id(owner_id=auth_data.user_id)
-    return api_success(serialize_urls(urls, include_stats=False))
+    limit, before_id = get_page_params()
+    fields = get_fields_param(URL_FIELDS)
+    urls = crud.redirect_url.get_by_owner_id(
+        owner_id=auth_data.user_id,
+        # One more url is loaded to know if there is next page.
+        limit=limit + 1,
+        before_id=before_id,
+        columns=get_url_columns(fields),
+    )
+    response = serialize_urls(urls[:limit], include_stats=False, fields=fields)
+    response["cursor"] = urls[limit - 1].hash if len(urls) > limit else None
+    return api_success(response)
+
+
+@bp_urls.route("/export", methods=["GET"])
+@auth_required
+def export_urls(auth_data: AuthData):
+    """
+    Method exports all user's urls with their views counts. Auth required.
+    Response is streamed as newline-delimited JSON (url per line).
+    """
+    rows = crud.redirect_url.get_with_views_by_owner_id(
+        db=db,
+        owner_id=auth_data.user_id,
+        batch_size=current_app.config["EXPORT_BATCH_SIZE"],
+    )
+    return api_ndjson_stream(
+        {**serialize_url(url, include_stats=True, in_list=True), "views": views_count}
+        for url, views_count in rows
+    )
+
+
+@bp_urls.route("/views/export", methods=["GET"])
+@auth_required
+def export_views(auth_data: AuthData):
+    """
+    Method exports raw views of all user's urls and pastes. Auth required.
+    GET params:
+     - str `format` - `ndjson` or `csv`. Defaults to `ndjson`.
+     - str `since`, `until` - ISO 8601 bounds of time range (`until` is excluded).
+    Response is streamed (view per line).
+    """
+    return get_view_events_response(db=db, owner_id=auth_data.user_id)
+
+
+@bp_urls.route("/<url_hash>/views/export", methods=["GET"])
+@auth_required
+def export_url_views(auth_data: AuthData, url_hash: str):
+    """
+    Method exports raw views of short url. Ownership required.
+    GET params are the same as of `export_views`.
+    """
+    short_url = validate_short_url(
+        crud.redirect_url.get_snapshot_by_hash(url_hash=url_hash, only_active=False),
+        allow_expired=True,
+    )
+    validate_url_owner(url=short_url, owner_id=auth_data.user_id)
+    return get_view_events_response(db=db, url_id=short_url.id)
 
 
 @bp_urls.route("/<url_hash>/", methods=["GET"])
@@ -97,7 +252,9 @@ def get_info_about_url(url_hash: str):
     """
     Method returns info about short url. Also it returns links to stats, if user is owner of this url.
     """
-    short_url = validate_short_url(crud.redirect_url.get_by_hash(url_hash=url_hash))
+    short_url = validate_short_url(
+        crud.redirect_url.get_snapshot_by_hash(url_hash=url_hash)
+    )
     _, auth_data = try_query_auth_data_from_request(db=db)
     include_stats = is_accessed_to_stats(
         url=short_url, owner_id=auth_data.user_id if auth_data else None
@@ -132,11 +289,13 @@ def generate_qr_code_for_url(url_hash: str):
      - str `result_type` - Type of result. May be `svg`, `png` or `txt`. Defaults to `svg`.
      - int `scale` - Image scaling. May be integer from 1 to 8. Defaults to 3.
      - int `quiet_zone` - White border around qr-code. May be from 0 to 25. Defaults to 4.
+    QR code never changes for the same params, so it is cached (and has strong ETag).
 
-    TODO: Fix caching to not generate new QR code every time.
     TODO: Custom logo for QR.
     """
-    short_url = validate_short_url(crud.redirect_url.get_by_hash(url_hash=url_hash))
+    short_url = validate_short_url(
+        crud.redirect_url.get_snapshot_by_hash(url_hash=url_hash)
+    )
 
     result_type = request.args.get("result_type", "svg")
     validate_qr_result_type(result_type)
@@ -149,13 +308,13 @@ def generate_qr_code_for_url(url_hash: str):
     validate_qr_code_quiet_zone(quiet_zone)
     quiet_zone = int(quiet_zone)
 
+    text = _get_qr_code_text(short_url.hash)
+    qr_code_key = get_qr_code_key(text, result_type, scale, quiet_zone)
+    if request.if_none_match.contains(qr_code_key):
+        return "", 304, get_cache_headers_for_qr_code(result_type, qr_code_key)
+
     return generate_qr_code(
-        text=url_for(
-            "urls.open_short_url",
-            url_hash=short_url.hash,
-            _external=True,
-            _scheme="https",
-        ),
+        text=text,
         result_type=result_type,
         scale=scale,
         quiet_zone=quiet_zone,
@@ -168,7 +327,9 @@ def open_short_url(url_hash: str):
     Redirects user to long redirect url.
     Collects IP address, referer and user agents for statistics.
     """
-    short_url = validate_short_url(crud.redirect_url.get_by_hash(url_hash=url_hash))
+    short_url = validate_short_url(
+        crud.redirect_url.get_snapshot_by_hash(url_hash=url_hash)
+    )
     collect_stats_and_add_view(db=db, short_url=short_url)
     return redirect(short_url.redirect)
 
@@ -182,7 +343,9 @@ def clear_short_url_stats(auth_data: AuthData, url_hash: str):
     """
     short_url = validate_short_url(crud.redirect_url.get_by_hash(url_hash=url_hash))
     validate_url_owner(short_url, owner_id=auth_data.user_id)
-    crud.url_view.delete_by_url_id(db=db, url_id=short_url.id)
+    crud.url_view.delete_by_url_id(
+        db=db, url_id=short_url.id, since=short_url.created_at
+    )
     return Response(status=204)
 
 
@@ -196,7 +359,9 @@ def get_short_url_stats(url_hash: str):
      - str `dates_views_value_as` - how to represent dates views.
         May be `percent`, `number`. Defaults to `percent`.
     """
-    short_url = validate_short_url(crud.redirect_url.get_by_hash(url_hash=url_hash))
+    short_url = validate_short_url(
+        crud.redirect_url.get_snapshot_by_hash(url_hash=url_hash)
+    )
 
     is_authorized, auth_data = try_query_auth_data_from_request(db=db)
     is_accessed_to_stats(
@@ -213,3 +378,16 @@ def get_short_url_stats(url_hash: str):
         short_url, referer_views_value_as, dates_views_value_as
     )
     return api_success(response)
+
+
+def _get_qr_code_text(url_hash: str) -> str:
+    """
+    Returns text encoded in QR code of short url.
+    :rtype: str
+    """
+    return url_for(
+        "urls.open_short_url",
+        url_hash=url_hash,
+        _external=True,
+        _scheme="https",
+    )
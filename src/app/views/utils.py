@@ -17,9 +17,15 @@
 """
 from time import time
 
-from flask import Blueprint
+from flask import Blueprint, abort, current_app
 
+from app.database import db
+from app.database.pool import get_pool_stats
+from app.database.replicas import get_replica_router
 from app.services.api.response import api_success
+from app.services.cache import get_dimensions_cache, get_token_cache, get_url_cache
+from app.services.expiry import get_expiry_sweeper
+from app.services.qr import get_qr_prerenderer, get_qr_render_cache, get_qr_render_pool
 
 bp_utils = Blueprint("utils", __name__)
 
@@ -30,3 +36,33 @@ def get_server_time():
     Returns current time at the server, used for debugging.
     """
     return api_success({"server_time": time()})
+
+
+@bp_utils.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Returns metrics of current worker (caches, QR codes rendering, expiry sweeper,
+    database pools). Available only if enabled in config, should not be exposed
+    to the internet.
+    """
+    if not current_app.config["METRICS_ENABLED"]:
+        abort(404)
+    metrics = {
+        "database_pool": get_pool_stats(db.engine),
+        "qr_render_pool": get_qr_render_pool().get_stats(),
+        "qr_render_cache": get_qr_render_cache().get_stats(),
+        "qr_prerenderer": get_qr_prerenderer().get_stats(),
+        "url_cache": get_url_cache().get_stats(),
+        "dimensions_cache": get_dimensions_cache().get_stats(),
+        "token_cache": get_token_cache().get_stats(),
+        "expiry_sweeper": get_expiry_sweeper().get_stats(),
+    }
+    if replica_router := get_replica_router():
+        metrics["database_replica"] = {
+            **replica_router.get_stats(),
+            "pool": get_pool_stats(replica_router.engine),
+        }
+    if async_engine := current_app.extensions.get("async_database_engine"):
+        # Served in async mode (`app.asgi`).
+        metrics["async_database_pool"] = get_pool_stats(async_engine.sync_engine)
+    return api_success(metrics)
@@ -0,0 +1,111 @@
+"""
+    Microbenchmark of url hashes encoding on list endpoints (GET /urls/).
+    Compares per-call Hashids construction (as it was before HashidsCodec)
+    with the app codec (cold and warm memo).
+
+    Usage (from src/ directory):
+        python -m benchmarks.bench_hashids_codec [urls count] [rounds]
+
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from hashids import Hashids
+
+# Database is not queried by this benchmark.
+os.environ.setdefault("DATABASE_DSN", "sqlite://")
+
+from app.app import _create_app  # pylint: disable=wrong-import-position
+from app.database.models.url import RedirectUrl  # pylint: disable=wrong-import-position
+from app.serializers.url import serialize_urls  # pylint: disable=wrong-import-position
+from app.services.hashids_codec import (  # pylint: disable=wrong-import-position
+    HashidsCodec,
+)
+
+
+def _measure(
+    name: str, func: Callable[[], object], rounds: int, urls_count: int
+) -> float:
+    """
+    Runs func `rounds` times and prints throughput in urls per second.
+    """
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    elapsed = time.perf_counter() - started_at
+    throughput = urls_count * rounds / elapsed
+    print(
+        f"{name:<45} {elapsed / rounds * 1000:>9.2f} ms/list {throughput:>12.0f} urls/s"
+    )
+    return throughput
+
+
+def main(urls_count: int = 1000, rounds: int = 20) -> None:
+    """
+    Runs benchmark.
+    """
+    app = _create_app()
+    salt = app.config["HASHIDS_SALT"]
+    expiration_date = datetime.utcnow() + timedelta(days=14)
+    urls = [
+        RedirectUrl(
+            id=url_id,
+            redirect="https://florgon.com",
+            expiration_date=expiration_date,
+            is_deleted=False,
+            stats_is_public=False,
+        )
+        for url_id in range(1, urls_count + 1)
+    ]
+
+    def legacy_hashes() -> None:
+        # Serializer encoded url hash 3 times, building new Hashids every time.
+        for url in urls:
+            for _ in range(3):
+                Hashids(salt=salt, min_length=6).encode(url.id)
+
+    def codec_hashes_cold() -> None:
+        HashidsCodec(salt=salt).encode_many(url.id for url in urls)
+
+    codec = HashidsCodec(salt=salt)
+
+    def codec_hashes_warm() -> None:
+        codec.encode_many(url.id for url in urls)
+
+    print(f"Encoding hashes of {urls_count} urls, {rounds} rounds:")
+    legacy = _measure("Hashids per call (3 per url)", legacy_hashes, rounds, urls_count)
+    cold = _measure(
+        "HashidsCodec.encode_many (cold memo)", codec_hashes_cold, rounds, urls_count
+    )
+    warm = _measure(
+        "HashidsCodec.encode_many (warm memo)", codec_hashes_warm, rounds, urls_count
+    )
+    print(f"Speedup: x{cold / legacy:.1f} (cold), x{warm / legacy:.1f} (warm)")
+
+    print(
+        f"\nserialize_urls() of {urls_count} urls (whole list endpoint serialization):"
+    )
+    with app.test_request_context():
+        _measure("serialize_urls", lambda: serialize_urls(urls), rounds, urls_count)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
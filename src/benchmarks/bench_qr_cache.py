@@ -0,0 +1,76 @@
+"""
+    Benchmark of QR codes rendering (GET /urls/<url_hash>/qr) with and without render cache.
+
+    Usage (from src/ directory):
+        python -m benchmarks.bench_qr_cache [urls count] [rounds]
+
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import sys
+import time
+from functools import partial
+from typing import Callable
+
+# Database is not queried by this benchmark.
+os.environ.setdefault("DATABASE_DSN", "sqlite://")
+
+from app.app import _create_app  # pylint: disable=wrong-import-position
+from app.services.qr import (  # pylint: disable=wrong-import-position
+    generate_qr_code,
+    get_qr_render_cache,
+    render_qr_code,
+)
+
+# (result type, scale) of QR codes requested by clients.
+VARIANTS = (("svg", 3), ("png", 3), ("png", 8))
+
+
+def _measure(name: str, func: Callable[[str], object], texts: list[str]) -> None:
+    """
+    Calls func for all texts and prints renders per second.
+    """
+    started_at = time.perf_counter()
+    for text in texts:
+        func(text)
+    elapsed = time.perf_counter() - started_at
+    print(f"  {name:<30} {len(texts) / elapsed:>12.0f} renders/s")
+
+
+def main(urls_count: int = 20, rounds: int = 10) -> None:
+    """
+    Runs benchmark.
+    Every url QR code is requested `rounds` times (as by clients without browser cache).
+    """
+    app = _create_app()
+    texts = [f"https://cc.florgon.com/o/{i:06d}" for i in range(urls_count)] * rounds
+    with app.app_context():
+        for result_type, scale in VARIANTS:
+            print(f"{result_type}, scale={scale}, {len(texts)} requests:")
+            render = partial(render_qr_code, result_type=result_type, scale=scale)
+            generate = partial(generate_qr_code, result_type=result_type, scale=scale)
+            if result_type == "png":
+                _measure(
+                    "without cache (pypng)", partial(render, png_backend="pypng"), texts
+                )
+            _measure("without cache", render, texts)
+            _measure("with cache (cold)", generate, texts)
+            _measure("with cache (warm)", generate, texts)
+        print(f"Cache: {get_qr_render_cache().get_stats()}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
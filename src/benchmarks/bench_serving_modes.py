@@ -0,0 +1,165 @@
+"""
+    Load test of sync (gunicorn) and async (uvicorn, `app.asgi`) serving modes.
+    Starts server in every mode with the same database and count of workers, and sends
+    redirect and url info requests from many concurrent keep-alive connections.
+
+    Usage (from src/ directory, database is dropped and filled by the benchmark!):
+        BENCH_DATABASE_DSN=postgresql://... python -m benchmarks.bench_serving_modes [concurrency] [seconds] [workers]
+
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+# Benchmark must never run against the app database.
+os.environ["DATABASE_DSN"] = os.environ.get(
+    "BENCH_DATABASE_DSN", "sqlite:////tmp/cc-api-bench.db"
+)
+# Views are written by background flusher in both modes.
+os.environ["VIEWS_INGESTION_ENABLED"] = "1"
+
+from app.app import _create_app  # pylint: disable=wrong-import-position
+from app.database import crud, db  # pylint: disable=wrong-import-position
+
+URLS_COUNT = 1000
+HOST = "127.0.0.1"
+PORT = 8765
+# Commands of servers in every serving mode.
+MODES = {
+    "sync (gunicorn)": "gunicorn -b {host}:{port} -w {workers} app.app:app",
+    "async (uvicorn)": "uvicorn --host {host} --port {port} --workers {workers} "
+    "--log-level warning app.asgi:app",
+}
+
+
+def seed() -> list[str]:
+    """
+    Creates urls, returns their hashes.
+    """
+    app = _create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        crud.redirect_url.create_urls(
+            db=db,
+            redirect_urls=[
+                (f"https://florgon.com/{i}", False) for i in range(URLS_COUNT)
+            ],
+        )
+        return [url.hash for url in crud.redirect_url.get_all()]
+
+
+async def _wait_for_server() -> None:
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection(HOST, PORT)
+        except OSError:
+            await asyncio.sleep(0.1)
+            continue
+        writer.close()
+        return
+    raise RuntimeError("Server is not started!")
+
+
+async def _client(paths: list[str], deadline: float, latencies: list[float]) -> int:
+    """
+    Sends requests over keep-alive connection until deadline
+    (reconnects if server closes connection, sync workers do not keep connections).
+    :return: count of failed requests
+    """
+    errors = 0
+    rng = random.Random()
+    connection = None
+    while time.perf_counter() < deadline:
+        started_at = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(HOST, PORT)
+            reader, writer = connection
+            request = f"GET {rng.choice(paths)} HTTP/1.1\r\nHost: {HOST}\r\n\r\n"
+            writer.write(request.encode())
+            status = (await reader.readline()).split(b" ")[1]
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                headers[name.lower()] = value.strip()
+            await reader.readexactly(int(headers.get("content-length", 0)))
+        except (OSError, IndexError, asyncio.IncompleteReadError):
+            errors += 1
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - started_at)
+        if status not in (b"200", b"302"):
+            errors += 1
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+    return errors
+
+
+async def load(paths: list[str], concurrency: int, seconds: float) -> dict[str, float]:
+    """
+    Sends requests from `concurrency` connections for `seconds`.
+    :return: throughput (requests per second), latencies (ms) and errors
+    """
+    await _wait_for_server()
+    latencies: list[float] = []
+    deadline = time.perf_counter() + seconds
+    errors = await asyncio.gather(
+        *(_client(paths, deadline, latencies) for _ in range(concurrency))
+    )
+    latencies.sort()
+    return {
+        "rps": len(latencies) / seconds,
+        "p50": latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        "errors": sum(errors),
+    }
+
+
+def main(concurrency: int = 200, seconds: int = 10, workers: int = 4) -> None:
+    """
+    Runs benchmark.
+    """
+    hashes = seed()
+    paths = [f"/v1/urls/{url_hash}/open" for url_hash in hashes] + [
+        f"/v1/urls/{url_hash}/" for url_hash in hashes
+    ]
+
+    print(f"{concurrency} connections, {seconds}s, {workers} workers:")
+    for mode, command in MODES.items():
+        command = command.format(host=HOST, port=PORT, workers=workers)
+        with subprocess.Popen(command.split()) as server:
+            try:
+                results = asyncio.run(load(paths, concurrency, seconds))
+            finally:
+                server.terminate()
+                server.wait()
+        print(
+            f"  {mode:<16} {results['rps']:>9.0f} rps  p50 {results['p50']:>8.2f} ms"
+            f"  p99 {results['p99']:>8.2f} ms  errors {results['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,213 @@
+"""
+    Benchmark of url views indexes.
+    Seeds synthetic url views into empty database, then reports query plans
+    and latencies of stats and ingestion queries without and with indexes.
+
+    Usage (from src/ directory, database is dropped and filled by the benchmark!):
+        BENCH_DATABASE_DSN=postgresql://... python -m benchmarks.bench_stats_indexes [views count]
+
+    Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import Index, func, insert, select, text
+
+# Benchmark must never run against the app database.
+os.environ["DATABASE_DSN"] = os.environ.get(
+    "BENCH_DATABASE_DSN", "sqlite:////tmp/cc-api-bench.db"
+)
+
+from app.app import _create_app  # pylint: disable=wrong-import-position
+from app.database import crud, db  # pylint: disable=wrong-import-position
+from app.database.models.referer import Referer  # pylint: disable=wrong-import-position
+from app.database.models.url import RedirectUrl  # pylint: disable=wrong-import-position
+from app.database.models.url_view import UrlView  # pylint: disable=wrong-import-position
+from app.database.models.user_agent import (  # pylint: disable=wrong-import-position
+    UserAgent,
+)
+
+URLS_COUNT = 100
+USER_AGENTS_COUNT = 2000
+REFERERS_COUNT = 5000
+DAYS_COUNT = 90
+CHUNK_SIZE = 5000
+ROUNDS = 20
+
+INDEXES: list[Index] = [
+    index
+    for model in (UrlView, Referer, UserAgent)
+    for index in model.__table__.indexes
+]
+
+
+def seed(views_count: int) -> None:
+    """
+    Fills database with urls, user agents, referers and url views.
+    Views are skewed, so the first url is "hot" and has most views.
+    """
+    db.session.execute(
+        insert(RedirectUrl),
+        [{"redirect": f"https://florgon.com/{i}"} for i in range(URLS_COUNT)],
+    )
+    db.session.execute(
+        insert(UserAgent),
+        [
+            {"user_agent_value": value, "value_digest": crud.dimension.get_digest(value)}
+            for value in (f"Mozilla/5.0 bench/{i}" for i in range(USER_AGENTS_COUNT))
+        ],
+    )
+    db.session.execute(
+        insert(Referer),
+        [
+            {"referer_value": value, "value_digest": crud.dimension.get_digest(value)}
+            for value in (f"https://example.com/{i}" for i in range(REFERERS_COUNT))
+        ],
+    )
+
+    now = datetime.utcnow()
+    rng = random.Random(0)
+    for offset in range(0, views_count, CHUNK_SIZE):
+        rows = []
+        for _ in range(min(CHUNK_SIZE, views_count - offset)):
+            created_at = now - timedelta(seconds=rng.randrange(DAYS_COUNT * 86400))
+            rows.append(
+                {
+                    "url_id": min(int(rng.paretovariate(1.2)), URLS_COUNT),
+                    "ip": "127.0.0.1",
+                    "user_agent_id": rng.randint(1, USER_AGENTS_COUNT),
+                    "referer_id": rng.choice((None, rng.randint(1, REFERERS_COUNT))),
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+            )
+        db.session.execute(insert(UrlView), rows)
+    db.session.commit()
+
+
+def explain(statement) -> str:
+    """
+    Returns query plan of statement.
+    """
+    compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    prefix = (
+        "EXPLAIN QUERY PLAN"
+        if db.engine.dialect.name == "sqlite"
+        else "EXPLAIN (ANALYZE, BUFFERS)"
+    )
+    rows = db.session.execute(text(f"{prefix} {compiled}")).all()
+    return "\n".join("    " + " ".join(str(column) for column in row) for row in rows)
+
+
+def measure(func_: Callable[[], object]) -> float:
+    """
+    Returns average latency of call in milliseconds.
+    """
+    func_()  # Warm up.
+    started_at = time.perf_counter()
+    for _ in range(ROUNDS):
+        func_()
+    return (time.perf_counter() - started_at) / ROUNDS * 1000
+
+
+def report() -> dict[str, float]:
+    """
+    Prints query plans and latencies of stats and ingestion queries.
+    """
+    view_date = func.date(UrlView.created_at)
+    user_agent = f"Mozilla/5.0 bench/{USER_AGENTS_COUNT // 2}"
+    referer = f"https://example.com/{REFERERS_COUNT // 2}"
+
+    def views_by(column, url_id: int):
+        # Stats are read from daily rollups, raw views are grouped like rollups rebuild does.
+        return (
+            select(column, func.count())
+            .where(UrlView.url_id == url_id)
+            .group_by(column)
+        )
+
+    plans = {
+        "stats by dates": views_by(view_date, url_id=1),
+        "user agent lookup": select(UserAgent.id).where(
+            UserAgent.user_agent_value == user_agent
+        ),
+    }
+    for name, statement in plans.items():
+        print(f"  plan of {name}:\n{explain(statement)}")
+
+    latencies = {
+        "stats: views by dates (hot url)": lambda: db.session.execute(
+            views_by(view_date, url_id=1)
+        ).all(),
+        "stats: views by referers (hot url)": lambda: db.session.execute(
+            views_by(UrlView.referer_id, url_id=1)
+        ).all(),
+        "stats: views by dates (cold url)": lambda: db.session.execute(
+            views_by(view_date, url_id=URLS_COUNT - 1)
+        ).all(),
+        "ingestion: user agent lookup": lambda: UserAgent.query.filter_by(
+            user_agent_value=user_agent
+        ).first(),
+        "ingestion: referer lookup": lambda: Referer.query.filter_by(
+            referer_value=referer
+        ).first(),
+    }
+    results = {name: measure(func_) for name, func_ in latencies.items()}
+    for name, latency in results.items():
+        print(f"  {name:<35} {latency:>9.2f} ms")
+    return results
+
+
+def main(views_count: int = 200_000) -> None:
+    """
+    Runs benchmark.
+    """
+    app = _create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for index in INDEXES:
+            index.drop(db.engine)
+
+        print(f"Seeding {views_count} url views...")
+        seed(views_count)
+
+        print("\nWithout indexes:")
+        before = report()
+
+        for index in INDEXES:
+            index.create(db.engine)
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+
+        print("\nWith indexes:")
+        after = report()
+
+        print("\nSpeedup:")
+        for name, latency in before.items():
+            print(f"  {name:<35} x{latency / after[name]:.1f}")
+
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
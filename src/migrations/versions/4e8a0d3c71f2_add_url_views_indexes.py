@@ -0,0 +1,49 @@
+"""Add url_views indexes
+
+Revision ID: 4e8a0d3c71f2
+Revises: 9c2f5e1ab4d7
+Create Date: 2023-09-27 10:42:08.913574
+
+Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4e8a0d3c71f2"
+down_revision = "9c2f5e1ab4d7"
+branch_labels = None
+depends_on = None
+
+# (index name, table name, columns). User agents and referers are looked up
+# by unique digests of values (see b61f7c2d93ae), so values are not indexed.
+INDEXES = (
+    ("ix_url_views_url_id_created_at", "url_views", ["url_id", "created_at"]),
+    ("ix_url_views_paste_id_created_at", "url_views", ["paste_id", "created_at"]),
+)
+
+
+def upgrade():
+    # Indexes are built concurrently (outside of transaction),
+    # so views are not blocked while indexes of large tables are built.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,48 @@
+"""Add owner_id, id indexes to urls and pastes
+
+Revision ID: 7d1a9b3e5c20
+Revises: b61f7c2d93ae
+Create Date: 2023-10-02 11:18:37.405129
+
+Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7d1a9b3e5c20"
+down_revision = "b61f7c2d93ae"
+branch_labels = None
+depends_on = None
+
+# (index name, table name, columns).
+INDEXES = (
+    ("ix_redirect_urls_owner_id_id", "redirect_urls", ["owner_id", "id"]),
+    ("ix_paste_urls_owner_id_id", "paste_urls", ["owner_id", "id"]),
+)
+
+
+def upgrade():
+    # Indexes are built concurrently (outside of transaction),
+    # so urls and pastes are not blocked while indexes are built.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
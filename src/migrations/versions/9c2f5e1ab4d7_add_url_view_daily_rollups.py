@@ -0,0 +1,71 @@
+"""Add url_view_daily rollups
+
+Revision ID: 9c2f5e1ab4d7
+Revises: e3facbdd6e2d
+Create Date: 2023-09-25 12:14:31.508211
+
+Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9c2f5e1ab4d7"
+down_revision = "e3facbdd6e2d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "url_view_daily",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("url_id", sa.Integer(), nullable=True),
+        sa.Column("paste_id", sa.Integer(), nullable=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("referer_id", sa.Integer(), nullable=True),
+        sa.Column("views_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["paste_id"],
+            ["paste_urls.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["referer_id"],
+            ["referers.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["url_id"],
+            ["redirect_urls.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_url_view_daily_key",
+        "url_view_daily",
+        [
+            sa.text("coalesce(url_id, 0)"),
+            sa.text("coalesce(paste_id, 0)"),
+            "day",
+            sa.text("coalesce(referer_id, 0)"),
+        ],
+        unique=True,
+    )
+    # Rollups of existing views are filled by `flask views rollup` command.
+
+
+def downgrade():
+    op.drop_index("ix_url_view_daily_key", table_name="url_view_daily")
+    op.drop_table("url_view_daily")
@@ -0,0 +1,151 @@
+"""Partition url_views by month
+
+Revision ID: a3c5e7f90b12
+Revises: 7d1a9b3e5c20
+Create Date: 2023-10-04 09:51:12.602318
+
+Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3c5e7f90b12"
+down_revision = "7d1a9b3e5c20"
+branch_labels = None
+depends_on = None
+
+# Partitions are created for months of existing views and for these months ahead
+# (next ones are created by `flask views partitions`).
+MONTHS_AHEAD = 3
+COLUMNS = "id, created_at, updated_at, url_id, paste_id, ip, user_agent_id, referer_id"
+INDEXES = (
+    ("ix_url_views_url_id_created_at", ["url_id", "created_at"]),
+    ("ix_url_views_paste_id_created_at", ["paste_id", "created_at"]),
+)
+# Views are copied to new table in batches of this size (ordered by id),
+# statement returns id of last copied view (NULL when all views are copied).
+COPY_BATCH_SIZE = 50000
+COPY_BATCH = sa.text(
+    f"WITH copied AS (INSERT INTO url_views ({COLUMNS}) SELECT {COLUMNS} "
+    "FROM url_views_old WHERE id > :last_id ORDER BY id LIMIT :batch_size "
+    "RETURNING id) SELECT max(id) FROM copied"
+)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_table(**kwargs) -> None:
+    op.create_table(
+        "url_views",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('url_views_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("url_id", sa.Integer(), nullable=True),
+        sa.Column("paste_id", sa.Integer(), nullable=True),
+        sa.Column("ip", sa.String(length=15), nullable=False),
+        sa.Column("user_agent_id", sa.Integer(), nullable=False),
+        sa.Column("referer_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["paste_id"], ["paste_urls.id"]),
+        sa.ForeignKeyConstraint(["referer_id"], ["referers.id"]),
+        sa.ForeignKeyConstraint(["url_id"], ["redirect_urls.id"]),
+        sa.ForeignKeyConstraint(["user_agent_id"], ["user_agents.id"]),
+        **kwargs,
+    )
+
+
+def _replace_table(create_new_table) -> None:
+    """
+    Replaces url_views table with new one, keeping views and ids sequence.
+    New (empty) table is committed first, so new views are written to it
+    while old views are copied in batches, every batch in its own transaction.
+    """
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name="url_views")
+    op.rename_table("url_views", "url_views_old")
+    op.execute("ALTER INDEX url_views_pkey RENAME TO url_views_old_pkey")
+
+    create_new_table()
+    # Sequence is owned by old table and would be dropped with it.
+    op.execute("ALTER SEQUENCE url_views_id_seq OWNED BY url_views.id")
+    # Indexes are created while table is empty, so writes are never blocked by build.
+    for name, columns in INDEXES:
+        op.create_index(name, "url_views", columns)
+
+    with op.get_context().autocommit_block():
+        last_id = 0
+        while last_id is not None:
+            last_id = (
+                op.get_bind()
+                .execute(COPY_BATCH, {"last_id": last_id, "batch_size": COPY_BATCH_SIZE})
+                .scalar()
+            )
+    op.drop_table("url_views_old")
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        # Partitioning is supported only by PostgreSQL.
+        return
+
+    def create_partitioned_table():
+        # Primary key of partitioned table must include partition key.
+        _create_table(
+            sa.PrimaryKeyConstraint("id", "created_at", name="url_views_pkey"),
+            postgresql_partition_by="RANGE (created_at)",
+        )
+        # Views out of created partitions are never lost.
+        op.execute("CREATE TABLE url_views_default PARTITION OF url_views DEFAULT")
+
+        first_view_at = (
+            op.get_bind()
+            .execute(sa.text("SELECT min(created_at) FROM url_views_old"))
+            .scalar()
+        )
+        # Views are created in UTC.
+        current_month = datetime.utcnow().date().replace(day=1)
+        month = first_view_at.date().replace(day=1) if first_view_at else current_month
+        while month <= _add_months(current_month, MONTHS_AHEAD):
+            next_month = _add_months(month, 1)
+            op.execute(
+                f"CREATE TABLE url_views_y{month.year:04d}m{month.month:02d} "
+                f"PARTITION OF url_views FOR VALUES FROM ('{month.isoformat()}') "
+                f"TO ('{next_month.isoformat()}')"
+            )
+            month = next_month
+
+    _replace_table(create_partitioned_table)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    def create_table():
+        _create_table(sa.PrimaryKeyConstraint("id", name="url_views_pkey"))
+
+    # Partitions are dropped with old partitioned table.
+    _replace_table(create_table)
@@ -0,0 +1,85 @@
+"""Add value_digest to user_agents and referers
+
+Revision ID: b61f7c2d93ae
+Revises: 4e8a0d3c71f2
+Create Date: 2023-09-29 16:05:47.221904
+
+Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b61f7c2d93ae"
+down_revision = "4e8a0d3c71f2"
+branch_labels = None
+depends_on = None
+
+# (table name, value column, foreign key column in url_views).
+DIMENSIONS = (
+    ("user_agents", "user_agent_value", "user_agent_id"),
+    ("referers", "referer_value", "referer_id"),
+)
+
+
+def upgrade():
+    for table, value_column, foreign_key in DIMENSIONS:
+        op.add_column(table, sa.Column("value_digest", sa.String(64), nullable=True))
+        op.execute(
+            f"UPDATE {table} "
+            f"SET value_digest = encode(sha256(convert_to({value_column}, 'UTF8')), 'hex')"
+        )
+
+        # Values were not unique before, so duplicates are merged into the first row.
+        op.execute(
+            f"CREATE TEMPORARY TABLE {table}_duplicates AS "
+            f"SELECT id, keep_id FROM ("
+            f"SELECT id, min(id) OVER (PARTITION BY value_digest) AS keep_id FROM {table}"
+            f") AS dimension WHERE id <> keep_id"
+        )
+        op.execute(
+            f"UPDATE url_views SET {foreign_key} = duplicates.keep_id "
+            f"FROM {table}_duplicates AS duplicates "
+            f"WHERE url_views.{foreign_key} = duplicates.id"
+        )
+        if table == "referers":
+            # Rollups of merged referers are recomputed from views.
+            op.execute(
+                "DELETE FROM url_view_daily WHERE referer_id IN ("
+                "SELECT id FROM referers_duplicates "
+                "UNION SELECT keep_id FROM referers_duplicates)"
+            )
+            op.execute(
+                "INSERT INTO url_view_daily "
+                "(url_id, paste_id, day, referer_id, views_count) "
+                "SELECT url_id, paste_id, date(created_at), referer_id, count(*) "
+                "FROM url_views "
+                "WHERE referer_id IN (SELECT keep_id FROM referers_duplicates) "
+                "GROUP BY url_id, paste_id, date(created_at), referer_id"
+            )
+        op.execute(
+            f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table}_duplicates)"
+        )
+        op.execute(f"DROP TABLE {table}_duplicates")
+
+        op.alter_column(table, "value_digest", nullable=False)
+        op.create_unique_constraint(f"{table}_value_digest_key", table, ["value_digest"])
+
+
+def downgrade():
+    for table, _, _ in DIMENSIONS:
+        op.drop_constraint(f"{table}_value_digest_key", table, type_="unique")
+        op.drop_column(table, "value_digest")
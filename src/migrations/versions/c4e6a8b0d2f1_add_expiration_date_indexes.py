@@ -0,0 +1,63 @@
+"""Add is_swept flag to urls and pastes, partial expiration_date indexes
+
+Revision ID: c4e6a8b0d2f1
+Revises: a3c5e7f90b12
+Create Date: 2023-10-09 18:24:37.115902
+
+Copyright (C) 2022-2023 Stepan Zubkov <stepanzubkov@florgon.com>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4e6a8b0d2f1"
+down_revision = "a3c5e7f90b12"
+branch_labels = None
+depends_on = None
+
+# (index name, table name). Only not swept urls (that may expire) are indexed.
+INDEXES = (
+    ("ix_redirect_urls_expiration_date", "redirect_urls"),
+    ("ix_paste_urls_expiration_date", "paste_urls"),
+)
+
+
+def upgrade():
+    for _, table in INDEXES:
+        # Column with constant default is added without rewrite of table.
+        op.add_column(
+            table, sa.Column("is_swept", sa.Boolean(), server_default=sa.false())
+        )
+
+    # Indexes are built concurrently (outside of transaction),
+    # so urls and pastes are not blocked while indexes are built.
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(
+                name,
+                table,
+                ["expiration_date"],
+                postgresql_where=sa.text("is_swept IS NOT true"),
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    for _, table in INDEXES:
+        op.drop_column(table, "is_swept")